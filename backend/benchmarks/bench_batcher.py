@@ -0,0 +1,74 @@
+"""
+Query embedding throughput with and without micro-batching
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_batcher --levels 1,8,32,128 --queries 512
+"""
+import argparse
+import asyncio
+import time
+
+from rag.batcher import EmbeddingBatcher
+from rag.embedder import Embedder
+
+def make_queries(count: int):
+    """Distinct queries so the query cache never answers"""
+    topics = ["leave", "travel expense", "overtime", "badge access", "insurance claim", "form HR-102"]
+    return [f"What is the policy on {topics[i % len(topics)]} for case {i}?" for i in range(count)]
+
+async def run_direct(embedder: Embedder, queries, concurrency: int) -> float:
+    """One forward pass per query, each in the threadpool (the unbatched path)"""
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def one(text):
+        async with semaphore:
+            await loop.run_in_executor(None, embedder.embed, text)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(one(text) for text in queries))
+    return time.perf_counter() - start
+
+async def run_batched(batcher: EmbeddingBatcher, queries, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def one(text):
+        async with semaphore:
+            await batcher.embed(text)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(one(text) for text in queries))
+    return time.perf_counter() - start
+
+async def main_async(args):
+    # No query cache: every query must be encoded
+    embedder = Embedder(query_cache_size=0)
+    embedder.embed("warm up")
+    
+    print(f"max batch {args.max_batch}, max wait {args.max_wait_ms} ms")
+    print(f"{'concurrency':>11} {'direct emb/s':>13} {'batched emb/s':>14} {'avg batch':>10}")
+    for concurrency in args.levels:
+        queries = make_queries(args.queries)
+        direct = await run_direct(embedder, queries, concurrency)
+        
+        batcher = EmbeddingBatcher(embedder, max_batch_size=args.max_batch, max_wait_ms=args.max_wait_ms)
+        batched = await run_batched(batcher, queries, concurrency)
+        stats = batcher.stats()
+        await batcher.close()
+        
+        print(
+            f"{concurrency:>11} {len(queries) / direct:>13.1f} "
+            f"{len(queries) / batched:>14.1f} {stats['avg_batch_size']:>10.1f}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the query embedding micro-batcher")
+    parser.add_argument("--levels", type=lambda s: [int(x) for x in s.split(",")], default=[1, 8, 32, 128])
+    parser.add_argument("--queries", type=int, default=512, help="Queries per concurrency level")
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Embedding runtimes: accuracy vs speed against the fp32 PyTorch model
+
+For each backend (torch, torch-int8, onnx, onnx-int8) this reports model
+load time, single-query latency, embed_batch throughput with length
+buckets and with the previous single encode call, and accuracy against
+torch: cosine similarity of the chunk vectors and top-k retrieval overlap
+for a set of queries over a synthetic policy corpus. Backends whose
+runtime is not installed are reported as errors and skipped.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_embedding_backends --backends torch,torch-int8,onnx,onnx-int8
+    python -m benchmarks.bench_embedding_backends --pages 40 --threads 4
+"""
+import argparse
+import random
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks.bench_chunker import make_document
+from rag.chunker import DocumentChunker
+
+def make_corpus(pages: int, seed: int):
+    """Chunk texts of a synthetic document plus queries drawn from them"""
+    chunker = DocumentChunker()
+    texts = [chunk["text"] for chunk in chunker.chunk(make_document(pages, seed=seed))]
+    rng = random.Random(seed)
+    queries = []
+    for text in rng.sample(texts, min(len(texts), 50)):
+        words = text.split()
+        begin = rng.randrange(max(1, len(words) - 12))
+        queries.append(" ".join(words[begin:begin + 12]))
+    return texts, queries
+
+def percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def top_k(chunks: np.ndarray, queries: np.ndarray, k: int) -> List[set]:
+    scores = normalize(queries) @ normalize(chunks).T
+    return [set(row) for row in np.argsort(-scores, axis=1)[:, :k]]
+
+def run_backend(backend: str, texts: List[str], queries: List[str], args) -> Dict:
+    from rag.embedder import Embedder
+    
+    start = time.perf_counter()
+    embedder = Embedder(
+        query_cache_size=0,
+        embedding_cache_dir="",
+        backend=backend,
+        threads=args.threads
+    )
+    load_s = time.perf_counter() - start
+    
+    embedder.embed_array(queries[0])
+    latencies = []
+    for query in queries:
+        query_start = time.perf_counter()
+        embedder.embed_array(query)
+        latencies.append((time.perf_counter() - query_start) * 1000)
+    
+    start = time.perf_counter()
+    chunk_vectors = np.asarray(embedder.embed_batch(texts), dtype=np.float32)
+    bucketed_s = time.perf_counter() - start
+    
+    # Previous path: one encode call with the library's fixed batch size
+    start = time.perf_counter()
+    embedder.model.encode(texts, convert_to_numpy=True, show_progress_bar=False)
+    plain_s = time.perf_counter() - start
+    
+    return {
+        "backend": backend,
+        "load_s": load_s,
+        "query_p50_ms": percentile(latencies, 50),
+        "query_p95_ms": percentile(latencies, 95),
+        "bucketed_per_s": len(texts) / bucketed_s,
+        "plain_per_s": len(texts) / plain_s,
+        "chunks": chunk_vectors,
+        "queries": np.asarray(embedder.embed_queries(queries), dtype=np.float32)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare embedding runtimes")
+    parser.add_argument("--backends", default="torch,torch-int8,onnx,onnx-int8", help="Comma-separated backends")
+    parser.add_argument("--pages", type=int, default=20, help="Pages in the synthetic corpus")
+    parser.add_argument("--threads", type=int, help="Intra-op threads per runtime")
+    parser.add_argument("--top-k", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    texts, queries = make_corpus(args.pages, args.seed)
+    print(f"{len(texts)} chunks, {len(queries)} queries")
+    print(
+        f"{'backend':>10} {'load s':>7} {'p50 ms':>7} {'p95 ms':>7} {'bucket/s':>9} {'plain/s':>8} "
+        f"{'cos mean':>8} {'cos min':>8} {'overlap':>7}"
+    )
+    
+    backends = args.backends.split(",")
+    if "torch" not in backends:
+        backends.insert(0, "torch")
+    baseline = None
+    for backend in backends:
+        try:
+            row = run_backend(backend, texts, queries, args)
+        except Exception as e:
+            print(f"{backend:>10} error: {e}")
+            continue
+        if backend == "torch":
+            baseline = row
+        
+        cos_mean = cos_min = overlap = float("nan")
+        if baseline is not None:
+            cosines = np.sum(normalize(row["chunks"]) * normalize(baseline["chunks"]), axis=1)
+            cos_mean, cos_min = float(cosines.mean()), float(cosines.min())
+            expected = top_k(baseline["chunks"], baseline["queries"], args.top_k)
+            found = top_k(row["chunks"], row["queries"], args.top_k)
+            overlap = float(np.mean([len(a & b) / args.top_k for a, b in zip(found, expected)]))
+        print(
+            f"{backend:>10} {row['load_s']:>7.2f} {row['query_p50_ms']:>7.2f} {row['query_p95_ms']:>7.2f} "
+            f"{row['bucketed_per_s']:>9.1f} {row['plain_per_s']:>8.1f} "
+            f"{cos_mean:>8.4f} {cos_min:>8.4f} {overlap:>7.3f}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Lexical index latency and dense / BM25 / hybrid retrieval recall
+
+Latency is measured on a synthetic corpus with a Zipf-distributed
+vocabulary (no model needed). Recall@k uses the real embedding model on a
+smaller corpus where a few chunks carry unique policy codes and each query
+asks about one of them.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_hybrid --chunks 100000
+    python -m benchmarks.bench_hybrid --recall-chunks 2000 --top-k 4
+"""
+import argparse
+import random
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+from rag.lexical_index import LexicalIndex
+
+SYLLABLES = "ka lo mi re su ta ne po vi da ge ru ba to li sa me no ki fu".split()
+
+def make_vocabulary(size: int, rng: random.Random) -> List[str]:
+    """Distinct pseudo-words"""
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+def make_corpus(chunks: int, words_per_chunk: int, seed: int) -> Tuple[List[str], List[str]]:
+    """Chunk texts with Zipfian word frequencies, plus one code per 50 chunks"""
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(20000, rng)
+    weights = 1.0 / np.arange(1, len(vocabulary) + 1)
+    np_rng = np.random.default_rng(seed)
+    indices = np_rng.choice(len(vocabulary), size=(chunks, words_per_chunk), p=weights / weights.sum())
+    
+    texts, codes = [], []
+    for i, row in enumerate(indices):
+        words = [vocabulary[j] for j in row]
+        if i % 50 == 0:
+            code = f"POL-{i:06d}"
+            words.insert(rng.randrange(len(words)), code)
+            codes.append(code)
+        texts.append(" ".join(words))
+    return texts, codes
+
+def percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+def run_latency(args):
+    texts, codes = make_corpus(args.chunks, args.words, args.seed)
+    index = LexicalIndex()
+    
+    start = time.perf_counter()
+    for begin in range(0, len(texts), 1000):
+        batch = list(range(begin, min(begin + 1000, len(texts))))
+        index.add([f"c{i}" for i in batch], [f"d{i // 100}" for i in batch], [texts[i] for i in batch])
+    index.compact()
+    build = time.perf_counter() - start
+    
+    rng = random.Random(args.seed)
+    queries = []
+    for _ in range(args.queries):
+        words = texts[rng.randrange(len(texts))].split()
+        queries.append(" ".join(rng.sample(words, 5)))
+        queries.append(f"what does {rng.choice(codes)} say about {rng.choice(words)}")
+    
+    for query in queries[:20]:
+        index.search(query, top_k=args.candidates)
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, top_k=args.candidates)
+        timings.append((time.perf_counter() - start) * 1000)
+    
+    print(f"lexical index: {args.chunks} chunks, {index.stats()['terms']} terms, built in {build:.1f}s")
+    print(
+        f"search ms  p50 {percentile(timings, 50):.3f}  p95 {percentile(timings, 95):.3f}  "
+        f"p99 {percentile(timings, 99):.3f}  mean {np.mean(timings):.3f}"
+    )
+
+def run_recall(args):
+    from rag.embedder import Embedder
+    from rag.retriever import Retriever
+    
+    # Recall corpus reads like the policy documents the app stores
+    from benchmarks.bench_chunker import WORDS
+    rng = random.Random(args.seed)
+    texts, targets = [], {}
+    for i in range(args.recall_chunks):
+        words = [rng.choice(WORDS) for _ in range(120)]
+        if i % 10 == 0:
+            code = f"Form {rng.choice(['HR', 'FIN', 'SEC'])}-{rng.randint(1000, 9999)}{chr(65 + i % 26)}"
+            words.insert(rng.randrange(len(words)), code)
+            targets[code] = f"c{i}"
+        texts.append(" ".join(words))
+    
+    embedder = Embedder(query_cache_size=0, embedding_cache_dir="")
+    matrix = np.asarray(embedder.embed_batch(texts), dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    index = LexicalIndex()
+    index.add([f"c{i}" for i in range(len(texts))], ["doc"] * len(texts), texts)
+    
+    class _ChunkLookup:
+        def get_chunks(self, ids):
+            return [{"id": chunk_id} for chunk_id in ids]
+    
+    retriever = Retriever(_ChunkLookup(), embedder=embedder, hybrid=True, candidates=args.candidates)
+    hits = {"dense": 0, "bm25": 0, "hybrid": 0}
+    for code, target in targets.items():
+        query = f"What is {code} used for?"
+        vector = embedder.embed_array(query)
+        order = np.argsort(-(matrix @ (vector / np.linalg.norm(vector))))[:args.candidates]
+        dense = [{"id": f"c{i}"} for i in order]
+        lexical = index.search(query, top_k=args.candidates)
+        hits["dense"] += target in [chunk["id"] for chunk in dense[:args.top_k]]
+        hits["bm25"] += target in [chunk_id for chunk_id, _ in lexical[:args.top_k]]
+        hits["hybrid"] += target in [chunk["id"] for chunk in retriever.fuse(dense, lexical, args.top_k)]
+    
+    print(f"\nrecall@{args.top_k} over {len(targets)} code lookups ({len(texts)} chunks):")
+    for name, count in hits.items():
+        print(f"{name:>8} {count / len(targets):.3f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark lexical and hybrid retrieval")
+    parser.add_argument("--chunks", type=int, default=100000, help="Chunks in the latency corpus")
+    parser.add_argument("--words", type=int, default=180, help="Words per latency chunk")
+    parser.add_argument("--queries", type=int, default=500, help="Query pairs timed")
+    parser.add_argument("--candidates", type=int, default=20, help="Results per retriever before fusion")
+    parser.add_argument("--recall-chunks", type=int, default=2000, help="Chunks in the recall corpus (0 skips)")
+    parser.add_argument("--top-k", type=int, default=4, help="k for recall@k")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    run_latency(args)
+    if args.recall_chunks:
+        run_recall(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+PDF ingestion throughput: whole-text extraction vs streaming vs parallel page ranges
+
+Builds a corpus of synthetic text PDFs (no extra dependencies) and measures
+extract + chunk throughput three ways:
+  legacy    - concatenate every page into one string, then chunk it
+  streaming - feed pages to DocumentChunker.chunk_segments in one process
+  parallel  - IngestionPipeline page ranges across the process pool
+
+It then reports the peak resident memory (this process and its extraction
+workers, Linux) of parallel extraction when the file's bytes are read into
+the job and sent with every task, and when tasks carry only its path.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_pdf --docs 4 --pages 200 --workers 4
+"""
+import argparse
+import os
+import tempfile
+import time
+from typing import List
+
+from pypdf import PdfReader
+
+from benchmarks.bench_chunker import make_document
+from benchmarks.memory import MemorySampler, memory_mb
+from rag.chunker import DocumentChunker
+from rag.ingest import IngestionPipeline
+from utils.jobs import JobManager
+from utils.pdf_reader import PDFReader
+
+LINE_CHARS = 95
+LINES_PER_PAGE = 60
+
+def _escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def _wrap(text: str) -> List[str]:
+    lines = []
+    for paragraph in text.split("\n"):
+        current = ""
+        for word in paragraph.split():
+            if current and len(current) + len(word) + 1 > LINE_CHARS:
+                lines.append(current)
+                current = word
+            else:
+                current = f"{current} {word}" if current else word
+        lines.append(current)
+    return lines
+
+def write_pdf(path: str, page_texts: List[str]):
+    """
+    Write a minimal text-only PDF, one Helvetica page per text
+    
+    Args:
+        path: Output file
+        page_texts: Text of each page (wrapped and cut to fit the page)
+    """
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_refs = []
+    for text in page_texts:
+        lines = _wrap(text)[:LINES_PER_PAGE]
+        body = "BT /F1 9 Tf 11 TL 40 760 Td " + " ".join(f"({_escape(line)}) '" for line in lines) + " ET"
+        stream = body.encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content
+        )
+        page_refs.append(len(objects))
+    kids = " ".join(f"{ref} 0 R" for ref in page_refs).encode()
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_refs))
+    
+    data = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(data))
+        data += b"%d 0 obj\n%s\nendobj\n" % (number, obj)
+    xref = len(data)
+    data += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    data += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    data += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(data)
+
+def make_corpus(directory: str, docs: int, pages: int, seed: int = 42) -> List[str]:
+    """Synthetic PDFs of `pages` pages each"""
+    paths = []
+    for i in range(docs):
+        text = make_document(pages, words_per_page=380, seed=seed + i)
+        page_texts = text.split("\nPage ")
+        page_texts = [page_texts[0]] + ["Page " + page for page in page_texts[1:]]
+        path = os.path.join(directory, f"synthetic_{i}.pdf")
+        write_pdf(path, page_texts)
+        paths.append(path)
+    return paths
+
+def legacy_extract_chunk(chunker: DocumentChunker, path: str) -> int:
+    """The previous PDFReader.extract_text followed by one chunk() call"""
+    reader = PdfReader(path)
+    text = ""
+    for page in reader.pages:
+        text += page.extract_text() + "\n"
+    return len(chunker.chunk(text.strip()))
+
+def streaming_extract_chunk(chunker: DocumentChunker, path: str) -> int:
+    pages = ((text, {"page": page}) for page, text in PDFReader.iter_pages(path))
+    return sum(1 for _ in chunker.chunk_segments(pages))
+
+def parallel_extract_chunk(pipeline: IngestionPipeline, source) -> int:
+    """Parallel page ranges; source is a path, or bytes as ingestion used to send"""
+    job_id = pipeline.jobs.create(pipeline.STAGES)
+    return sum(1 for _ in pipeline.chunker.chunk_segments(pipeline._pdf_segments(job_id, source)))
+
+def peak_extract_mb(args, paths: List[str], by_path: bool) -> float:
+    """Peak memory above idle while extracting every PDF with a fresh pool"""
+    pipeline = IngestionPipeline(
+        DocumentChunker(), None, None, JobManager(),
+        process_workers=args.workers,
+        pdf_pages_per_task=args.pages_per_task
+    )
+    for _ in range(args.workers):
+        pipeline.process_pool.submit(int).result()
+    idle = memory_mb(os.getpid()).get("rss", 0.0)
+    with MemorySampler(os.getpid(), interval=0.02) as sampler:
+        for path in paths:
+            if by_path:
+                parallel_extract_chunk(pipeline, path)
+            else:
+                with open(path, "rb") as f:
+                    data = f.read()
+                parallel_extract_chunk(pipeline, data)
+                del data
+    pipeline.shutdown()
+    return sampler.max_rss - idle
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF extraction and chunking")
+    parser.add_argument("--docs", type=int, default=4, help="PDFs in the corpus")
+    parser.add_argument("--pages", type=int, default=200, help="Pages per PDF")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Extraction processes")
+    parser.add_argument("--pages-per-task", type=int, default=16, help="Pages per parallel extraction task")
+    args = parser.parse_args()
+    
+    chunker = DocumentChunker()
+    pipeline = IngestionPipeline(
+        chunker, None, None, JobManager(),
+        process_workers=args.workers,
+        pdf_pages_per_task=args.pages_per_task
+    )
+    
+    with tempfile.TemporaryDirectory() as directory:
+        paths = make_corpus(directory, args.docs, args.pages)
+        size_mb = sum(os.path.getsize(path) for path in paths) / 1e6
+        total_pages = args.docs * args.pages
+        print(f"corpus: {args.docs} PDFs x {args.pages} pages ({size_mb:.1f} MB), {args.workers} workers")
+        
+        # Start the worker processes outside the timed region
+        pipeline.process_pool.submit(int).result()
+        
+        modes = [
+            ("legacy", lambda path: legacy_extract_chunk(chunker, path)),
+            ("streaming", lambda path: streaming_extract_chunk(chunker, path)),
+            ("parallel", lambda path: parallel_extract_chunk(pipeline, path)),
+        ]
+        baseline = None
+        for name, run in modes:
+            start = time.perf_counter()
+            chunks = sum(run(path) for path in paths)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(
+                f"{name:>10}: {elapsed:6.2f}s  {total_pages / elapsed:7.1f} pages/s  "
+                f"{chunks} chunks  {baseline / elapsed:4.2f}x"
+            )
+        pipeline.shutdown()
+        
+        if memory_mb(os.getpid()):
+            largest = max(os.path.getsize(path) for path in paths) / 1e6
+            print(f"peak memory above idle (largest file {largest:.1f} MB):")
+            for name, by_path in (("bytes", False), ("path", True)):
+                print(f"{name:>10}: {peak_extract_mb(args, paths, by_path):7.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Cross-encoder reranking cost by candidate count and batch size
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_rerank --candidates 10,20,40 --batch-sizes 4,8,16,32
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.bench_chunker import make_document
+from rag.reranker import Reranker
+
+def make_candidates(count: int):
+    """Chunk-sized passages from the synthetic policy document"""
+    paragraphs = [p for p in make_document(max(1, count // 3 + 1)).split("\n\n") if len(p) > 100]
+    return [{"id": str(i), "text": paragraphs[i % len(paragraphs)]} for i in range(count)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cross-encoder reranking latency")
+    parser.add_argument("--candidates", default="10,20,40", help="Comma-separated candidate counts")
+    parser.add_argument("--batch-sizes", default="4,8,16,32", help="Comma-separated batch sizes")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per setting")
+    parser.add_argument("--top-k", type=int, default=4)
+    args = parser.parse_args()
+    
+    query = "How many days of annual leave need manager approval?"
+    print(f"{'candidates':>10} {'batch':>6} {'p50 ms':>8} {'p95 ms':>8} {'ms/pair':>8}")
+    for count in [int(n) for n in args.candidates.split(",")]:
+        chunks = make_candidates(count)
+        for batch_size in [int(n) for n in args.batch_sizes.split(",")]:
+            # Unbounded budget: measure the full cost
+            reranker = Reranker(candidates=count, batch_size=batch_size, budget_ms=1e9)
+            reranker.rerank(query, chunks, args.top_k)
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                reranker.rerank(query, chunks, args.top_k)
+                timings.append((time.perf_counter() - start) * 1000)
+            p50 = np.percentile(timings, 50)
+            print(f"{count:>10} {batch_size:>6} {p50:>8.1f} {np.percentile(timings, 95):>8.1f} {p50 / count:>8.2f}")
+
+if __name__ == "__main__":
+    main()
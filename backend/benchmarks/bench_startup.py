@@ -0,0 +1,124 @@
+"""
+Startup time and memory of the embedding components
+
+Compares the old wiring (main.py and Retriever each loading their own
+SentenceTransformer) with the shared model registry, and optionally
+reports how much memory forked workers share with a preloaded parent.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --fork 4
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict
+
+MODEL_NAME = "sentence-transformers/all-mpnet-base-v2"
+
+def rss_mb() -> float:
+    """Current resident set size in MB"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Non-Linux fallback: peak RSS (KB on Linux, bytes on macOS)
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def smaps_mb() -> Dict[str, float]:
+    """Shared/private memory split of this process (Linux only)"""
+    values = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Pss:", "Shared_Clean:", "Shared_Dirty:", "Private_Clean:", "Private_Dirty:"):
+                values[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return values
+
+def run_scenario(scenario: str) -> Dict:
+    """Build the embedding components the given way and measure them"""
+    base_rss = rss_mb()
+    start = time.perf_counter()
+    
+    if scenario == "separate":
+        # What main.py + Retriever used to do: two independent loads
+        from sentence_transformers import SentenceTransformer
+        models = [SentenceTransformer(MODEL_NAME), SentenceTransformer(MODEL_NAME)]
+    else:
+        from rag.embedder import Embedder
+        from rag.retriever import Retriever
+        
+        class _NoStore:
+            pass
+        
+        embedder = Embedder(MODEL_NAME)
+        retriever = Retriever(_NoStore(), embedder=embedder)
+        models = [embedder.model, retriever.embedder.model]
+    
+    elapsed = time.perf_counter() - start
+    models[0].encode("warm up")
+    return {
+        "scenario": scenario,
+        "startup_seconds": round(elapsed, 2),
+        "rss_mb": round(rss_mb() - base_rss, 1),
+        "distinct_models": len({id(m) for m in models}),
+    }
+
+def run_fork(workers: int) -> None:
+    """Preload the model, fork workers and report what they keep shared"""
+    from rag import model_registry
+    from rag.embedder import Embedder
+    
+    embedder = Embedder(MODEL_NAME)
+    model_registry.freeze_for_fork()
+    
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            embedder.embed("what is the leave policy?")
+            print(json.dumps({"pid": os.getpid(), **{k: round(v, 1) for k, v in smaps_mb().items()}}))
+            sys.stdout.flush()
+            os._exit(0)
+        children.append(pid)
+    
+    for pid in children:
+        os.waitpid(pid, 0)
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure embedding model startup cost")
+    parser.add_argument("--scenario", choices=["separate", "shared"], help=argparse.SUPPRESS)
+    parser.add_argument("--fork", type=int, default=0, help="Also fork N preloaded workers and report shared memory")
+    args = parser.parse_args()
+    
+    if args.scenario:
+        print(json.dumps(run_scenario(args.scenario)))
+        return
+    
+    print(f"{'scenario':>10} {'startup s':>10} {'RSS MB':>8} {'models':>7}")
+    for scenario in ("separate", "shared"):
+        # Fresh interpreter per scenario so import and RSS numbers are comparable
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_startup", "--scenario", scenario],
+            capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{scenario:>10} {result['startup_seconds']:>10} {result['rss_mb']:>8} {result['distinct_models']:>7}")
+    
+    if args.fork:
+        if not hasattr(os, "fork"):
+            print("Fork measurement is not available on this platform")
+            return
+        print("\nForked workers (MB, Shared_* pages come from the preloaded parent):")
+        run_fork(args.fork)
+
+if __name__ == "__main__":
+    main()
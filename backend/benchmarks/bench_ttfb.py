@@ -0,0 +1,61 @@
+"""
+Time-to-first-byte of /query vs /query_stream
+
+Start the stub LLM (benchmarks.stub_llm) and the backend pointed at it,
+upload at least one document, then run (from the backend directory):
+    python -m benchmarks.bench_ttfb --runs 20
+"""
+import argparse
+import statistics
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.load_query import QUESTIONS
+
+def measure(client: httpx.Client, path: str, token: str, query: str) -> Dict[str, float]:
+    """Time to first body byte, first answer token and completion for one request"""
+    start = time.perf_counter()
+    first_byte = first_token = None
+    with client.stream(
+        "POST", path,
+        json={"query": query, "username": token},
+        headers={"Authorization": f"Bearer {token}"}
+    ) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            now = time.perf_counter() - start
+            if first_byte is None:
+                first_byte = now
+            if first_token is None and (line.startswith("event: token") or path == "/query"):
+                first_token = now
+    total = time.perf_counter() - start
+    return {"ttfb": first_byte or total, "first_token": first_token or total, "total": total}
+
+def summarize(samples: List[Dict[str, float]], key: str) -> str:
+    values = sorted(sample[key] * 1000 for sample in samples)
+    p95 = values[max(0, int(len(values) * 0.95) - 1)]
+    return f"{statistics.median(values):8.0f} {p95:8.0f}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure time-to-first-byte of the query endpoints")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--token", default="employer1")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+    
+    print(f"{'endpoint':>14} {'ttfb p50':>8} {'p95':>8} {'tok p50':>8} {'p95':>8} {'all p50':>8} {'p95':>8}")
+    with httpx.Client(base_url=args.url, timeout=120) as client:
+        for path in ("/query", "/query_stream"):
+            samples = [
+                measure(client, path, args.token, QUESTIONS[i % len(QUESTIONS)])
+                for i in range(args.runs)
+            ]
+            print(
+                f"{path:>14} {summarize(samples, 'ttfb')} "
+                f"{summarize(samples, 'first_token')} {summarize(samples, 'total')}"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Vector backend comparison: Chroma vs the in-process numpy backend (float32 / int8)
+
+Each (backend, size) pair runs in a fresh process on its own directory and
+reports ingest throughput, query latency (top-k, with and without a doc_id
+filter), resident memory after loading, on-disk size, and recall@k against
+exact float32 search. Vectors are synthetic (clustered, 768-d like
+all-mpnet-base-v2) and generated batch by batch so 1M rows never sit in
+memory at once.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_vector_store --sizes 10000,100000,1000000
+    python -m benchmarks.bench_vector_store --sizes 100000 --backends numpy-int8,chroma
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+DIM = 768
+BATCH = 1000
+CHUNKS_PER_DOC = 100
+CLUSTERS = 256
+
+def rss_mb() -> float:
+    """Current resident set size (peak size where /proc is unavailable)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def make_batch(begin: int, size: int, seed: int) -> np.ndarray:
+    """Normalized vectors begin..begin+size, identical on every call"""
+    centers = np.random.default_rng(seed).normal(size=(CLUSTERS, DIM)).astype(np.float32)
+    rng = np.random.default_rng(seed + 1 + begin // BATCH)
+    vectors = centers[rng.integers(0, CLUSTERS, size)] + 0.8 * rng.normal(size=(size, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def make_queries(count: int, total: int, seed: int) -> np.ndarray:
+    """Noisy copies of random stored vectors"""
+    rng = np.random.default_rng(seed + 7)
+    queries = []
+    for row in rng.integers(0, total, count):
+        begin = int(row) // BATCH * BATCH
+        vector = make_batch(begin, min(BATCH, total - begin), seed)[int(row) - begin]
+        queries.append(vector + 0.05 * rng.normal(size=DIM).astype(np.float32))
+    return np.asarray(queries, dtype=np.float32)
+
+def exact_top_k(queries: np.ndarray, total: int, k: int, seed: int) -> List[set]:
+    """Ground-truth neighbours by brute-force float32 search"""
+    normalized = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    best_rows = np.zeros((len(queries), k), dtype=np.int64)
+    for begin in range(0, total, BATCH * 10):
+        size = min(BATCH * 10, total - begin)
+        block = np.concatenate([
+            make_batch(b, min(BATCH, begin + size - b), seed) for b in range(begin, begin + size, BATCH)
+        ])
+        scores = normalized @ block.T
+        merged_scores = np.concatenate([best_scores, scores], axis=1)
+        merged_rows = np.concatenate([best_rows, np.arange(begin, begin + size)[None, :].repeat(len(queries), 0)], axis=1)
+        order = np.argsort(-merged_scores, axis=1)[:, :k]
+        best_scores = np.take_along_axis(merged_scores, order, axis=1)
+        best_rows = np.take_along_axis(merged_rows, order, axis=1)
+    return [{f"c{row}" for row in rows} for rows in best_rows]
+
+def percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+def run_one(backend: str, size: int, args, results):
+    """Benchmark one backend at one size (runs in a child process)"""
+    from rag.vector_store import VectorStore
+    
+    directory = tempfile.mkdtemp(prefix="bench_vectors_")
+    try:
+        baseline_mb = rss_mb()
+        name, _, dtype = backend.partition("-")
+        store = VectorStore(persist_directory=directory, backend=name, dtype=dtype or None)
+        
+        start = time.perf_counter()
+        for begin in range(0, size, BATCH):
+            count = min(BATCH, size - begin)
+            rows = range(begin, begin + count)
+            vectors = make_batch(begin, count, args.seed)
+            # Same call as ingestion, minus the lexical index
+            store.collection.add(
+                ids=[f"c{i}" for i in rows],
+                embeddings=vectors if name == "numpy" else vectors.tolist(),
+                documents=[f"chunk {i}" for i in rows],
+                metadatas=[{"doc_id": f"d{i // CHUNKS_PER_DOC}", "chunk_hash": f"h{i}", "chunk_index": i % CHUNKS_PER_DOC} for i in rows]
+            )
+        ingest_s = time.perf_counter() - start
+        store.rebuild_lexical_index()
+        
+        # Reopen so memory reflects a server starting on an existing index
+        del store
+        reopened_start = time.perf_counter()
+        store = VectorStore(persist_directory=directory, backend=name, dtype=dtype or None)
+        open_s = time.perf_counter() - reopened_start
+        
+        queries = make_queries(args.queries, size, args.seed)
+        embeddings = [query.tolist() for query in queries]
+        store.query(embeddings[0], top_k=args.top_k)
+        latencies, hits = [], []
+        for embedding in embeddings:
+            query_start = time.perf_counter()
+            hits.append({result["id"] for result in store.query(embedding, top_k=args.top_k)})
+            latencies.append((time.perf_counter() - query_start) * 1000)
+        loaded_mb = rss_mb() - baseline_mb
+        
+        filtered = []
+        rng = np.random.default_rng(args.seed)
+        for embedding in embeddings:
+            doc_id = f"d{rng.integers(0, max(1, size // CHUNKS_PER_DOC))}"
+            query_start = time.perf_counter()
+            store.query(embedding, top_k=args.top_k, doc_id=doc_id)
+            filtered.append((time.perf_counter() - query_start) * 1000)
+        
+        truth = exact_top_k(queries[:args.recall_queries], size, args.top_k, args.seed)
+        recall = float(np.mean([len(found & expected) / args.top_k for found, expected in zip(hits, truth)]))
+        disk_mb = sum(
+            os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(directory) for f in files
+        ) / 1e6
+        
+        results.put({
+            "backend": backend,
+            "size": size,
+            "ingest_per_s": size / ingest_s,
+            "open_s": open_s,
+            "query_p50_ms": percentile(latencies, 50),
+            "query_p95_ms": percentile(latencies, 95),
+            "filtered_p50_ms": percentile(filtered, 50),
+            "rss_mb": loaded_mb,
+            "disk_mb": disk_mb,
+            "recall": recall
+        })
+    except Exception as e:
+        results.put({"backend": backend, "size": size, "error": str(e)})
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare vector backends")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated collection sizes")
+    parser.add_argument("--backends", default="numpy-float32,numpy-int8,chroma", help="Comma-separated backends")
+    parser.add_argument("--queries", type=int, default=100, help="Timed queries per run")
+    parser.add_argument("--recall-queries", type=int, default=50, help="Queries checked against exact search")
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+    
+    context = multiprocessing.get_context("spawn")
+    rows: List[Dict] = []
+    print(
+        f"{'backend':>14} {'size':>8} {'ingest/s':>9} {'open s':>7} {'p50 ms':>7} {'p95 ms':>7} "
+        f"{'filt ms':>7} {'rss MB':>7} {'disk MB':>8} {'recall':>6}"
+    )
+    for size in [int(n) for n in args.sizes.split(",")]:
+        for backend in args.backends.split(","):
+            results = context.Queue()
+            process = context.Process(target=run_one, args=(backend, size, args, results))
+            process.start()
+            row = results.get()
+            process.join()
+            rows.append(row)
+            if "error" in row:
+                print(f"{backend:>14} {size:>8} error: {row['error']}")
+                continue
+            print(
+                f"{backend:>14} {size:>8} {row['ingest_per_s']:>9.0f} {row['open_s']:>7.2f} "
+                f"{row['query_p50_ms']:>7.2f} {row['query_p95_ms']:>7.2f} {row['filtered_p50_ms']:>7.2f} "
+                f"{row['rss_mb']:>7.0f} {row['disk_mb']:>8.1f} {row['recall']:>6.3f}"
+            )
+    
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Compare two end-to-end benchmark results and flag regressions
+
+Each metric in the baseline is checked against the current run. Throughput
+metrics (names ending in _per_s, and rps) regress when they drop, everything
+else (latencies, memory, errors) when it grows. A metric fails when it is
+worse than the baseline by more than its threshold, a fraction of the
+baseline value; a metric whose baseline is zero fails on any increase.
+
+Usage (from the backend directory):
+    python -m benchmarks.compare baseline.json current.json
+    python -m benchmarks.compare baseline.json current.json --threshold query_p99_ms=0.5 --default-threshold 0.1
+
+Exits with status 1 if any metric regressed.
+"""
+import argparse
+import json
+import sys
+from typing import Dict, List, Optional
+
+# Allowed relative regression per metric; tail latencies are noisier than medians
+DEFAULT_THRESHOLDS = {
+    "query_p95_ms": 0.20,
+    "query_p99_ms": 0.30,
+    "query_errors": 0.0,
+}
+
+def higher_is_better(name: str) -> bool:
+    return name.endswith("_per_s") or name.endswith("rps")
+
+def parse_thresholds(items: List[str]) -> Dict[str, float]:
+    """NAME=FRACTION pairs from the command line"""
+    thresholds = {}
+    for item in items:
+        name, value = item.split("=", 1)
+        thresholds[name.strip()] = float(value)
+    return thresholds
+
+def compare(
+    baseline: Dict,
+    current: Dict,
+    thresholds: Optional[Dict[str, float]] = None,
+    default_threshold: float = 0.10
+) -> List[Dict]:
+    """
+    Check every baseline metric against the current run
+    
+    Args:
+        baseline: Result written by benchmarks.e2e
+        current: Result written by benchmarks.e2e
+        thresholds: Allowed relative regression by metric name
+        default_threshold: Allowed relative regression of other metrics
+    
+    Returns:
+        One row per metric with baseline, current, relative change
+        (positive is better), threshold and whether it regressed
+    """
+    limits = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+    rows = []
+    for name, before in sorted(baseline["metrics"].items()):
+        after = current["metrics"].get(name)
+        if before is None or after is None:
+            continue
+        threshold = limits.get(name, default_threshold)
+        sign = 1 if higher_is_better(name) else -1
+        if before:
+            change = sign * (after - before) / abs(before)
+        else:
+            change = 0.0 if after == before else sign * float("inf")
+        rows.append({
+            "metric": name,
+            "baseline": before,
+            "current": after,
+            "change": change,
+            "threshold": threshold,
+            "regressed": change < -threshold
+        })
+    return rows
+
+def print_report(rows: List[Dict]):
+    print(f"{'metric':<24} {'baseline':>12} {'current':>12} {'change':>8} {'limit':>6}")
+    for row in rows:
+        print(
+            f"{row['metric']:<24} {row['baseline']:>12.2f} {row['current']:>12.2f} "
+            f"{row['change']:>+7.1%} {row['threshold']:>6.0%}{'  REGRESSED' if row['regressed'] else ''}"
+        )
+
+def check(baseline_path: str, current: Dict, thresholds: Dict[str, float], default_threshold: float) -> bool:
+    """Print the comparison with a baseline file; True if nothing regressed"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    if baseline.get("config") != current.get("config"):
+        print("Warning: baseline was run with a different configuration")
+    rows = compare(baseline, current, thresholds, default_threshold)
+    print_report(rows)
+    return not any(row["regressed"] for row in rows)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare benchmark results against a baseline")
+    parser.add_argument("baseline", help="Baseline result JSON")
+    parser.add_argument("current", help="Current result JSON")
+    parser.add_argument("--threshold", action="append", default=[], help="NAME=FRACTION, e.g. query_p95_ms=0.2")
+    parser.add_argument("--default-threshold", type=float, default=0.10)
+    args = parser.parse_args()
+    
+    with open(args.current) as f:
+        current = json.load(f)
+    if not check(args.baseline, current, parse_thresholds(args.threshold), args.default_threshold):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+End-to-end benchmark: ingest throughput, /query latency and memory
+
+Generates a seeded corpus of synthetic PDF and DOCX documents, starts the
+stub LLM and a backend on fresh data directories, then:
+  ingest - uploads the whole corpus at once and times it until every job
+           has finished (documents, pages, chunks and MB per second)
+  query  - after a warm-up, runs /query at a fixed concurrency and reports
+           req/s and p50/p95/p99 latency
+  memory - samples the backend's resident memory throughout (Linux)
+Mean per-stage durations are read from the backend's /metrics.
+
+The stub answers deterministically and the answer and query embedding
+caches are off, so the same options give the same work on every run.
+Results are written as JSON; with --baseline they are compared against an
+earlier result (see benchmarks.compare) and the exit status is 1 on a
+regression.
+
+Usage (from the backend directory):
+    python -m benchmarks.e2e --output baseline.json
+    python -m benchmarks.e2e --output current.json --baseline baseline.json
+    python -m benchmarks.e2e --pdf-docs 8 --docx-docs 8 --pages 40 --env VECTOR_BACKEND=numpy
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.bench_pdf import make_corpus as make_pdf_corpus
+from benchmarks.compare import check, parse_thresholds
+from benchmarks.load_query import make_docx, run_level
+from benchmarks.load_workers import backend_env, server_command, wait_until_up
+from benchmarks.memory import MemorySampler, memory_mb
+
+RESULT_SCHEMA = 1
+
+def make_corpus(directory: str, pdf_docs: int, docx_docs: int, pages: int, seed: int) -> List[Tuple[str, int]]:
+    """
+    Write synthetic documents
+    
+    Returns:
+        (path, page count) of each document
+    """
+    paths = make_pdf_corpus(directory, pdf_docs, pages, seed=seed)
+    for i in range(docx_docs):
+        path = os.path.join(directory, f"synthetic_{i}.docx")
+        with open(path, "wb") as f:
+            f.write(make_docx(pages, seed=seed + pdf_docs + i))
+        paths.append(path)
+    return [(path, pages) for path in paths]
+
+async def ingest(client: httpx.AsyncClient, corpus: List[Tuple[str, int]], admin_token: str, timeout: float) -> Dict:
+    """Upload every document at once and wait for all ingestion jobs"""
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    
+    async def upload(path: str) -> str:
+        with open(path, "rb") as f:
+            response = await client.post("/upload", files={"file": (os.path.basename(path), f.read())}, headers=headers)
+        response.raise_for_status()
+        return response.json()["job_id"]
+    
+    start = time.perf_counter()
+    pending = set(await asyncio.gather(*(upload(path) for path, _ in corpus)))
+    chunks = failed = 0
+    deadline = time.time() + timeout
+    while pending:
+        if time.time() > deadline:
+            raise RuntimeError(f"{len(pending)} ingestion jobs did not finish in time")
+        await asyncio.sleep(0.1)
+        for job_id in list(pending):
+            job = (await client.get(f"/jobs/{job_id}", headers=headers)).json()
+            if job["status"] == "completed":
+                chunks += job["result"]["chunk_count"]
+            elif job["status"] == "failed":
+                failed += 1
+            else:
+                continue
+            pending.discard(job_id)
+    elapsed = time.perf_counter() - start
+    
+    megabytes = sum(os.path.getsize(path) for path, _ in corpus) / (1024 * 1024)
+    return {
+        "ingest_s": elapsed,
+        "ingest_docs_per_s": len(corpus) / elapsed,
+        "ingest_pages_per_s": sum(pages for _, pages in corpus) / elapsed,
+        "ingest_chunks_per_s": chunks / elapsed,
+        "ingest_mb_per_s": megabytes / elapsed,
+        "ingest_errors": failed,
+        "chunks": chunks,
+        "corpus_mb": megabytes
+    }
+
+def stage_means(exposition: str) -> Dict[str, float]:
+    """Mean milliseconds per stage from the /metrics stage histogram"""
+    sums: Dict[str, float] = {}
+    counts: Dict[str, float] = {}
+    for line in exposition.splitlines():
+        if not line.startswith("clarifyai_stage_duration_seconds_") or "_bucket" in line:
+            continue
+        series, value = line.rsplit(" ", 1)
+        labels = dict(
+            pair.split("=", 1) for pair in series[series.index("{") + 1:-1].split(",")
+        )
+        # Keep the stage and its qualifier (provider, kind, file type) apart
+        stage = labels.pop("stage")
+        name = "/".join(value.strip('"') for value in [stage] + [labels[key] for key in sorted(labels)])
+        target = sums if series.startswith("clarifyai_stage_duration_seconds_sum") else counts
+        target[name] = target.get(name, 0.0) + float(value)
+    return {name: sums[name] / counts[name] * 1000 for name in sorted(sums) if counts.get(name)}
+
+async def run_workload(url: str, corpus: List[Tuple[str, int]], pid: int, args) -> Dict:
+    limits = httpx.Limits(max_connections=args.concurrency + 4, max_keepalive_connections=args.concurrency + 4)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=120) as client:
+        results = {"rss_start_mb": memory_mb(pid).get("rss")}
+        with MemorySampler(pid) as sampler:
+            results.update(await ingest(client, corpus, args.admin_token, args.ingest_timeout))
+            results["rss_after_ingest_mb"] = memory_mb(pid).get("rss")
+            
+            await run_level(client, args.token, args.concurrency, args.warmup)
+            query = await run_level(client, args.token, args.concurrency, args.queries)
+        results.update({
+            "query_rps": query["rps"],
+            "query_p50_ms": query["p50_ms"],
+            "query_p95_ms": query["p95_ms"],
+            "query_p99_ms": query["p99_ms"],
+            "query_errors": query["errors"],
+            "rss_max_mb": sampler.max_rss or None,
+            "rss_peak_mb": memory_mb(pid).get("peak")
+        })
+        
+        response = await client.get("/metrics")
+        results["stages_ms"] = stage_means(response.text) if response.status_code == 200 else {}
+        return results
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end ingest and query benchmark")
+    parser.add_argument("--pdf-docs", type=int, default=4, help="Synthetic PDF documents")
+    parser.add_argument("--docx-docs", type=int, default=4, help="Synthetic DOCX documents")
+    parser.add_argument("--pages", type=int, default=20, help="Pages per document")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--queries", type=int, default=200, help="Timed /query requests")
+    parser.add_argument("--warmup", type=int, default=20, help="Untimed /query requests first")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--llm-delay", type=float, default=0.05, help="Stub LLM latency in seconds")
+    parser.add_argument("--workers", type=int, default=1, help="Backend worker processes")
+    parser.add_argument("--server", choices=["gunicorn", "uvicorn"], default="uvicorn")
+    parser.add_argument("--env", action="append", default=[], help="KEY=VALUE passed to the backend, repeatable")
+    parser.add_argument("--port", type=int, default=8300)
+    parser.add_argument("--llm-port", type=int, default=9300)
+    parser.add_argument("--token", default="employer1")
+    parser.add_argument("--admin-token", default="admin")
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    parser.add_argument("--ingest-timeout", type=float, default=1800)
+    parser.add_argument("--output", default="benchmark_results.json", help="Result JSON file")
+    parser.add_argument("--baseline", help="Earlier result JSON to compare against")
+    parser.add_argument("--threshold", action="append", default=[], help="NAME=FRACTION, e.g. query_p95_ms=0.2")
+    parser.add_argument("--default-threshold", type=float, default=0.10)
+    parser.add_argument("--keep-data", action="store_true", help="Keep the corpus and data directories")
+    args = parser.parse_args()
+    
+    overrides = dict(item.split("=", 1) for item in args.env)
+    # Only options that change the work done; runs with equal configs are comparable
+    config = {
+        "pdf_docs": args.pdf_docs,
+        "docx_docs": args.docx_docs,
+        "pages": args.pages,
+        "seed": args.seed,
+        "queries": args.queries,
+        "warmup": args.warmup,
+        "concurrency": args.concurrency,
+        "llm_delay": args.llm_delay,
+        "workers": args.workers,
+        "server": args.server,
+        "env": overrides
+    }
+    
+    data = tempfile.mkdtemp(prefix="e2e_benchmark_")
+    corpus_directory = os.path.join(data, "corpus")
+    os.makedirs(corpus_directory)
+    corpus = make_corpus(corpus_directory, args.pdf_docs, args.docx_docs, args.pages, args.seed)
+    print(f"{len(corpus)} documents, {args.pages} pages each, in {data}")
+    
+    stub = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.stub_llm", "--port", str(args.llm_port), "--delay", str(args.llm_delay)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    backend_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if args.server == "gunicorn":
+        shutil.copy(os.path.join(backend_directory, "gunicorn.conf.py"), data)
+    env = {**backend_env(data, args.port, args.llm_port, args.workers), "METRICS_ENABLED": "true", **overrides}
+    url = f"http://127.0.0.1:{args.port}"
+    process = subprocess.Popen(
+        server_command(args.server, args.workers, args.port), cwd=data, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        startup = time.perf_counter()
+        wait_until_up(url, process, args.startup_timeout)
+        startup_s = time.perf_counter() - startup
+        results = asyncio.run(run_workload(url, corpus, process.pid, args))
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        stub.terminate()
+        if not args.keep_data:
+            shutil.rmtree(data, ignore_errors=True)
+    
+    stages = results.pop("stages_ms")
+    # Describe the workload rather than its speed, so they are not compared
+    workload = {"documents": len(corpus), "chunks": results.pop("chunks"), "corpus_mb": results.pop("corpus_mb")}
+    output = {
+        "schema": RESULT_SCHEMA,
+        "created_at": datetime.now().isoformat(),
+        "environment": {
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count()
+        },
+        "config": config,
+        "workload": workload,
+        "metrics": {"startup_s": startup_s, **results},
+        "stages_ms": stages
+    }
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+    
+    metrics = output["metrics"]
+    print(
+        f"ingest: {metrics['ingest_s']:.1f}s, {metrics['ingest_docs_per_s']:.2f} docs/s, "
+        f"{metrics['ingest_pages_per_s']:.1f} pages/s, {metrics['ingest_chunks_per_s']:.1f} chunks/s, "
+        f"{metrics['ingest_errors']} failed"
+    )
+    print(
+        f"query:  {metrics['query_rps']:.1f} req/s, p50 {metrics['query_p50_ms']:.0f} ms, "
+        f"p95 {metrics['query_p95_ms']:.0f} ms, p99 {metrics['query_p99_ms']:.0f} ms, {metrics['query_errors']} errors"
+    )
+    if metrics.get("rss_max_mb"):
+        print(f"memory: {metrics['rss_start_mb']:.0f} MB at start, {metrics['rss_max_mb']:.0f} MB max")
+    for name, ms in stages.items():
+        print(f"  {name:<36} {ms:>9.2f} ms")
+    print(f"Results written to {args.output}")
+    
+    if args.baseline and not check(args.baseline, output, parse_thresholds(args.threshold), args.default_threshold):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
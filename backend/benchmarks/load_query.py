@@ -0,0 +1,111 @@
+"""
+/query load test: throughput at increasing concurrency
+
+Start the stub LLM (benchmarks.stub_llm) and the backend pointed at it,
+then run (from the backend directory):
+    python -m benchmarks.load_query --levels 1,4,16,64 --requests 200 --upload
+
+With a non-blocking LLM client throughput should grow with concurrency
+until the stub's delay, not the event loop, is the limit.
+"""
+import argparse
+import asyncio
+import io
+import statistics
+import time
+from typing import List, Dict
+
+import httpx
+
+QUESTIONS = [
+    "What is the leave policy?",
+    "How do I submit a travel expense?",
+    "Who approves overtime requests?",
+    "What is form HR-102 used for?",
+]
+
+def make_docx(pages: int, seed: int = 42) -> bytes:
+    """Synthetic policy document as DOCX bytes"""
+    from docx import Document
+    from benchmarks.bench_chunker import make_document
+    
+    document = Document()
+    for paragraph in make_document(pages, seed=seed).split("\n\n"):
+        document.add_paragraph(paragraph)
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+async def upload_corpus(client: httpx.AsyncClient, admin_token: str, pages: int):
+    """Upload a synthetic document so /query has something to retrieve"""
+    response = await client.post(
+        "/upload",
+        files={"file": ("load_test_policy.docx", make_docx(pages))},
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    response.raise_for_status()
+    print(f"Uploaded synthetic document: {response.json()}")
+
+async def run_level(client: httpx.AsyncClient, token: str, concurrency: int, total: int) -> Dict:
+    """Fire `total` queries with at most `concurrency` in flight"""
+    latencies: List[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def one(i: int):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.post(
+                    "/query",
+                    json={"query": QUESTIONS[i % len(QUESTIONS)], "username": token},
+                    headers={"Authorization": f"Bearer {token}"}
+                )
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+            except httpx.HTTPError:
+                errors += 1
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+    
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0.0,
+        "p99_ms": latencies[max(0, int(len(latencies) * 0.99) - 1)] * 1000 if latencies else 0.0,
+        "errors": errors,
+    }
+
+async def main_async(args):
+    limits = httpx.Limits(max_connections=max(args.levels), max_keepalive_connections=max(args.levels))
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=120) as client:
+        if args.upload:
+            await upload_corpus(client, args.admin_token, args.pages)
+        
+        print(f"{'concurrency':>11} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>6}")
+        for concurrency in args.levels:
+            result = await run_level(client, args.token, concurrency, args.requests)
+            print(
+                f"{result['concurrency']:>11} {result['rps']:>8.1f} "
+                f"{result['p50_ms']:>8.0f} {result['p95_ms']:>8.0f} {result['errors']:>6}"
+            )
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the /query endpoint")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--token", default="employer1", help="User token for /query")
+    parser.add_argument("--admin-token", default="admin", help="Admin token for --upload")
+    parser.add_argument("--levels", type=lambda s: [int(x) for x in s.split(",")], default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per concurrency level")
+    parser.add_argument("--upload", action="store_true", help="Upload a synthetic document first")
+    parser.add_argument("--pages", type=int, default=20, help="Pages in the uploaded document")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Requests per second by worker count
+
+Starts the stub LLM, then for each worker count a fresh backend (gunicorn
+with preloading, or uvicorn --workers where gunicorn is unavailable) on
+its own data directories, uploads a synthetic document, and runs the
+/query load test at a fixed concurrency. The semantic and query embedding
+caches are off so every request embeds, retrieves and reranks.
+
+Usage (from the backend directory):
+    python -m benchmarks.load_workers --workers 1,2,4 --concurrency 32 --requests 400
+    python -m benchmarks.load_workers --workers 1,4 --server uvicorn --llm-delay 0.05
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.load_query import QUESTIONS, run_level, upload_corpus
+
+def wait_until_up(url: str, process: subprocess.Popen, timeout: float):
+    """Poll url until it answers or the process exits"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            httpx.get(url, timeout=1).raise_for_status()
+            return
+        except httpx.HTTPError:
+            time.sleep(0.5)
+    raise RuntimeError(f"Server did not start within {timeout:.0f}s")
+
+def server_command(server: str, workers: int, port: int):
+    if server == "gunicorn":
+        return [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app"]
+    return [
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers)
+    ]
+
+def backend_env(data: str, port: int, llm_port: int, workers: int = 1) -> dict:
+    """
+    Environment for a backend run on its own data directories
+    
+    Generation goes to the stub LLM, and the answer and query embedding
+    caches and summaries are off so every request does the full work.
+    """
+    backend_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return {
+        **os.environ,
+        "SERVER_WORKERS": str(workers),
+        "HOST": "127.0.0.1",
+        "PORT": str(port),
+        "GROQ_API_KEY": "stub",
+        "GROQ_BASE_URL": f"http://127.0.0.1:{llm_port}",
+        "SEMANTIC_CACHE_ENABLED": "false",
+        "QUERY_EMBEDDING_CACHE_SIZE": "0",
+        "SUMMARIZE_ON_INGEST": "false",
+        "APP_DB_PATH": os.path.join(data, "app_data.sqlite3"),
+        "EMBEDDING_CACHE_DIR": os.path.join(data, "embedding_cache"),
+        "SUMMARY_CACHE_DIR": os.path.join(data, "summary_cache"),
+        "PYTHONPATH": os.pathsep.join(filter(None, [backend_directory, os.environ.get("PYTHONPATH")])),
+    }
+
+async def wait_for_ingestion(client: httpx.AsyncClient, admin_token: str, timeout: float):
+    """Wait until the uploaded document is listed"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        response = await client.get("/list_docs", headers={"Authorization": f"Bearer {admin_token}"})
+        if response.status_code == 200 and response.json():
+            return
+        await asyncio.sleep(0.5)
+    raise RuntimeError("Document was not ingested in time")
+
+async def measure(url: str, args) -> dict:
+    async with httpx.AsyncClient(base_url=url, timeout=120) as client:
+        await upload_corpus(client, args.admin_token, args.pages)
+        await wait_for_ingestion(client, args.admin_token, args.startup_timeout)
+        # Warm every worker before timing
+        await run_level(client, args.token, args.concurrency, args.concurrency * 2)
+        return await run_level(client, args.token, args.concurrency, args.requests)
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure /query throughput by worker count")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts")
+    parser.add_argument("--server", choices=["gunicorn", "uvicorn"], help="Defaults to gunicorn if installed")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--llm-port", type=int, default=9100)
+    parser.add_argument("--llm-delay", type=float, default=0.05, help="Stub LLM latency in seconds")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--pages", type=int, default=20, help="Pages in the uploaded document")
+    parser.add_argument("--token", default="employer1")
+    parser.add_argument("--admin-token", default="admin")
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    parser.add_argument("--keep-data", action="store_true", help="Keep the per-run data directories")
+    args = parser.parse_args()
+    
+    server = args.server
+    if server is None:
+        try:
+            import gunicorn  # noqa: F401
+            server = "gunicorn"
+        except ImportError:
+            server = "uvicorn"
+    
+    stub = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.stub_llm", "--port", str(args.llm_port), "--delay", str(args.llm_delay)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    backend_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    url = f"http://127.0.0.1:{args.port}"
+    print(f"server: {server}, {os.cpu_count()} CPUs, {len(QUESTIONS)} distinct questions")
+    print(f"{'workers':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>6} {'speedup':>7}")
+    baseline = None
+    try:
+        for workers in [int(n) for n in args.workers.split(",")]:
+            data = tempfile.mkdtemp(prefix=f"load_workers_{workers}_")
+            # The vector store lives in ./chroma_db, so each run gets its own working directory
+            shutil.copy(os.path.join(backend_directory, "gunicorn.conf.py"), data)
+            process = subprocess.Popen(
+                server_command(server, workers, args.port), cwd=data,
+                env=backend_env(data, args.port, args.llm_port, workers),
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            try:
+                wait_until_up(url, process, args.startup_timeout)
+                result = asyncio.run(measure(url, args))
+            except Exception as e:
+                print(f"{workers:>7} error: {e}")
+                continue
+            finally:
+                process.terminate()
+                try:
+                    process.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                if not args.keep_data:
+                    shutil.rmtree(data, ignore_errors=True)
+            baseline = baseline or result["rps"]
+            print(
+                f"{workers:>7} {result['rps']:>8.1f} {result['p50_ms']:>8.0f} {result['p95_ms']:>8.0f} "
+                f"{result['errors']:>6} {result['rps'] / baseline:>6.2f}x"
+            )
+    finally:
+        stub.terminate()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Resident memory of a process and its children, for the benchmarks (Linux)
+"""
+import os
+import threading
+from typing import Dict, List
+
+def process_tree(pid: int) -> List[int]:
+    """pid and its descendants"""
+    pids = [pid]
+    for parent in pids:
+        try:
+            for task in os.listdir(f"/proc/{parent}/task"):
+                with open(f"/proc/{parent}/task/{task}/children") as f:
+                    pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            continue
+    return pids
+
+def memory_mb(pid: int) -> Dict[str, float]:
+    """Resident and peak resident memory of a process tree in MB (empty where /proc is missing)"""
+    totals = {}
+    for process in process_tree(pid):
+        try:
+            with open(f"/proc/{process}/status") as f:
+                for line in f:
+                    if line.startswith(("VmRSS:", "VmHWM:")):
+                        key = line.split(":")[0]
+                        totals[key] = totals.get(key, 0.0) + int(line.split()[1]) / 1024
+        except OSError:
+            continue
+    return {"rss": totals["VmRSS"], "peak": totals["VmHWM"]} if "VmRSS" in totals else {}
+
+class MemorySampler:
+    """Largest resident size of a process tree seen while running"""
+    
+    def __init__(self, pid: int, interval: float = 0.2):
+        self.pid = pid
+        self.interval = interval
+        self.max_rss = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+    
+    def _run(self):
+        while not self._stop.is_set():
+            self.max_rss = max(self.max_rss, memory_mb(self.pid).get("rss", 0.0))
+            self._stop.wait(self.interval)
+    
+    def __enter__(self):
+        self._thread.start()
+        return self
+    
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        # Catch a peak reached after the last sample
+        self.max_rss = max(self.max_rss, memory_mb(self.pid).get("rss", 0.0))
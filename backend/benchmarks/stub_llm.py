@@ -0,0 +1,89 @@
+"""
+Deterministic local stand-in for the Groq chat completions API
+
+Usage (from the backend directory):
+    python -m benchmarks.stub_llm --port 9000 --delay 0.5
+
+Then start the backend with GROQ_API_KEY=stub GROQ_BASE_URL=http://127.0.0.1:9000
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+app = FastAPI(title="Stub LLM")
+app.state.delay = 0.5
+
+def stub_answer(prompt: str) -> str:
+    """Same prompt, same answer"""
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+    return f"Stub answer {digest}: the requested policy is described in the provided context."
+
+async def stream_chunks(completion_id: str, model: str, answer: str):
+    """Emit the answer word by word, spreading the delay across the words"""
+    words = answer.split(" ")
+    for i, word in enumerate(words):
+        await asyncio.sleep(app.state.delay / len(words))
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "delta": {"content": word if i == 0 else " " + word},
+                "finish_reason": None if i < len(words) - 1 else "stop"
+            }]
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+    yield "data: [DONE]\n\n"
+
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    """OpenAI-compatible chat completion with a fixed simulated latency"""
+    body = await request.json()
+    prompt = body["messages"][-1]["content"]
+    answer = stub_answer(prompt)
+    completion_id = "stub-" + hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+    
+    if body.get("stream"):
+        return StreamingResponse(
+            stream_chunks(completion_id, body.get("model", "stub"), answer),
+            media_type="text/event-stream"
+        )
+    
+    await asyncio.sleep(app.state.delay)
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": answer},
+            "finish_reason": "stop"
+        }],
+        "usage": {
+            "prompt_tokens": len(prompt) // 4,
+            "completion_tokens": len(answer) // 4,
+            "total_tokens": (len(prompt) + len(answer)) // 4
+        }
+    }
+
+def main():
+    import uvicorn
+    
+    parser = argparse.ArgumentParser(description="Run the stub LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--delay", type=float, default=0.5, help="Simulated generation time in seconds")
+    args = parser.parse_args()
+    
+    app.state.delay = args.delay
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
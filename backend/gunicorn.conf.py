@@ -0,0 +1,26 @@
+"""
+Multi-worker serving with models loaded once and shared by the workers
+
+Usage (from the backend directory, Linux/macOS):
+    SERVER_WORKERS=4 gunicorn -c gunicorn.conf.py main:app
+
+The app is imported in the master process (preload_app), which loads the
+embedding and reranking models and freezes them (SHARE_MODELS_ACROSS_WORKERS),
+then forked; the workers share those memory pages copy-on-write. Each
+worker reopens its SQLite and vector store handles on startup. Documents,
+chat history and job status live in APP_DB_PATH, and changes to the vector
+store are serialized with a file lock and picked up by the other workers
+before their next request.
+"""
+import os
+
+workers = int(os.getenv("SERVER_WORKERS", "4"))
+# main.py reads this to enable cross-worker coordination
+os.environ["SERVER_WORKERS"] = str(workers)
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+# First requests after a document change reopen the index
+timeout = int(os.getenv("SERVER_TIMEOUT", "120"))
+graceful_timeout = 30
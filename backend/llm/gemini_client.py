@@ -1,26 +1,45 @@
 """
 Gemini API client for LLM interactions
 """
+import asyncio
 import os
+import time
 import google.generativeai as genai
-from typing import Optional
+from typing import AsyncIterator, Optional
+
+from utils.metrics import metrics
 
 class GeminiClient:
-    """Client for Google Gemini API"""
+    """Async client for Google Gemini API"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+        timeout: Optional[float] = None
+    ):
         """
         Initialize Gemini client
         
+        Requests go through the SDK's async gRPC transport, which multiplexes
+        them over a single long-lived HTTP/2 connection.
+        
         Args:
             api_key: Gemini API key (defaults to GEMINI_API_KEY env var)
+            max_concurrency: Maximum in-flight requests (defaults to LLM_MAX_CONCURRENCY or 16)
+            timeout: Request timeout in seconds (defaults to LLM_TIMEOUT_SECONDS or 30)
         """
         self.api_key = api_key or os.getenv("GEMINI_API_KEY")
         if not self.api_key:
             raise ValueError("GEMINI_API_KEY not found in environment variables")
         
+        self.max_concurrency = max_concurrency or int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+        self.timeout = timeout or float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        
         genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel("gemini-1.5-flash")
+        self.model_name = "gemini-1.5-flash"
+        self.model = genai.GenerativeModel(self.model_name)
     
     async def generate(self, prompt: str, max_tokens: int = 1000) -> str:
         """
@@ -34,17 +53,76 @@ class GeminiClient:
             Generated text
         """
         try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config={
-                    "max_output_tokens": max_tokens,
-                    "temperature": 0.7
-                }
-            )
+            async with self.semaphore:
+                with metrics.stage("llm_generate", provider="gemini"):
+                    response = await self.model.generate_content_async(
+                        prompt,
+                        generation_config={
+                            "max_output_tokens": max_tokens,
+                            "temperature": 0.7
+                        },
+                        request_options={"timeout": self.timeout}
+                    )
             
+            self._record_usage(getattr(response, "usage_metadata", None))
             return response.text
         except Exception as e:
+            metrics.inc("clarifyai_llm_requests_total", provider="gemini", outcome="error")
+            raise Exception(f"Gemini API error: {str(e)}")
+    
+    async def stream(self, prompt: str, max_tokens: int = 1000) -> AsyncIterator[str]:
+        """
+        Stream generated text from Gemini API as it is produced
+        
+        Args:
+            prompt: Input prompt
+            max_tokens: Maximum tokens to generate
+            
+        Yields:
+            Text deltas in generation order
+        """
+        try:
+            async with self.semaphore:
+                start = time.perf_counter()
+                first_token = True
+                response = await self.model.generate_content_async(
+                    prompt,
+                    generation_config={
+                        "max_output_tokens": max_tokens,
+                        "temperature": 0.7
+                    },
+                    stream=True,
+                    request_options={"timeout": self.timeout}
+                )
+                async for chunk in response:
+                    if chunk.parts:
+                        if first_token:
+                            metrics.observe_stage("llm_first_token", time.perf_counter() - start, provider="gemini")
+                            first_token = False
+                        yield chunk.text
+                metrics.observe_stage("llm_stream", time.perf_counter() - start, provider="gemini")
+                # Usage metadata is complete once the stream has been consumed
+                self._record_usage(getattr(response, "usage_metadata", None))
+        except Exception as e:
+            metrics.inc("clarifyai_llm_requests_total", provider="gemini", outcome="error")
             raise Exception(f"Gemini API error: {str(e)}")
+    
+    def _record_usage(self, usage):
+        """Count a finished request and the tokens it used"""
+        metrics.inc("clarifyai_llm_requests_total", provider="gemini", outcome="ok")
+        if usage is None:
+            return
+        metrics.inc(
+            "clarifyai_llm_tokens_total", getattr(usage, "prompt_token_count", 0) or 0,
+            provider="gemini", kind="prompt"
+        )
+        metrics.inc(
+            "clarifyai_llm_tokens_total", getattr(usage, "candidates_token_count", 0) or 0,
+            provider="gemini", kind="completion"
+        )
+    
+    async def aclose(self):
+        """Release client resources (the gRPC channel is owned by the SDK)"""
 
 
 
@@ -1,26 +1,67 @@
 """
 Groq API client for LLM interactions
 """
+import asyncio
 import os
-from groq import Groq
-from typing import Optional
+import time
+import httpx
+from groq import AsyncGroq
+from typing import AsyncIterator, Optional
+
+from utils.metrics import metrics
 
 class GroqClient:
-    """Client for Groq API"""
+    """Async client for Groq API with a pooled keep-alive connection set"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+        max_connections: Optional[int] = None,
+        timeout: Optional[float] = None,
+        max_retries: Optional[int] = None
+    ):
         """
         Initialize Groq client
         
         Args:
             api_key: Groq API key (defaults to GROQ_API_KEY env var)
+            base_url: API base URL (defaults to GROQ_BASE_URL env var or the Groq cloud)
+            max_concurrency: Maximum in-flight requests (defaults to LLM_MAX_CONCURRENCY or 16)
+            max_connections: Connection pool size (defaults to LLM_MAX_CONNECTIONS or 20)
+            timeout: Request timeout in seconds (defaults to LLM_TIMEOUT_SECONDS or 30)
+            max_retries: Retries of failed requests (defaults to LLM_MAX_RETRIES or 2,
+                the SDK default)
         """
         self.api_key = api_key or os.getenv("GROQ_API_KEY")
         if not self.api_key:
             raise ValueError("GROQ_API_KEY not found in environment variables")
         
-        self.client = Groq(api_key=self.api_key)
+        self.max_concurrency = max_concurrency or int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+        max_connections = max_connections or int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+        self.timeout = timeout or float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("LLM_MAX_RETRIES", "2"))
+        
+        # One pooled HTTP client for the process: connections are kept alive
+        # and reused instead of paying a TLS handshake per request
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections
+            ),
+            timeout=httpx.Timeout(self.timeout)
+        )
+        self.client = AsyncGroq(
+            api_key=self.api_key,
+            base_url=base_url or os.getenv("GROQ_BASE_URL") or None,
+            timeout=self.timeout,
+            max_retries=self.max_retries,
+            http_client=self.http_client
+        )
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
         self.model = "llama-3.1-8b-instant"  # Fast and efficient model
+        self.model_name = self.model
     
     async def generate(self, prompt: str, max_tokens: int = 1000) -> str:
         """
@@ -34,21 +75,82 @@ class GroqClient:
             Generated text
         """
         try:
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                model=self.model,
-                max_tokens=max_tokens,
-                temperature=0.7
-            )
+            async with self.semaphore:
+                with metrics.stage("llm_generate", provider="groq"):
+                    chat_completion = await self.client.chat.completions.create(
+                        messages=[
+                            {
+                                "role": "user",
+                                "content": prompt
+                            }
+                        ],
+                        model=self.model,
+                        max_tokens=max_tokens,
+                        temperature=0.7
+                    )
             
+            self._record_usage(getattr(chat_completion, "usage", None))
             return chat_completion.choices[0].message.content
         except Exception as e:
+            metrics.inc("clarifyai_llm_requests_total", provider="groq", outcome="error")
             raise Exception(f"Groq API error: {str(e)}")
+    
+    async def stream(self, prompt: str, max_tokens: int = 1000) -> AsyncIterator[str]:
+        """
+        Stream generated text from Groq API as it is produced
+        
+        Args:
+            prompt: Input prompt
+            max_tokens: Maximum tokens to generate
+            
+        Yields:
+            Text deltas in generation order
+        """
+        try:
+            async with self.semaphore:
+                start = time.perf_counter()
+                first_token = True
+                stream = await self.client.chat.completions.create(
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ],
+                    model=self.model,
+                    max_tokens=max_tokens,
+                    temperature=0.7,
+                    stream=True
+                )
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        if first_token:
+                            metrics.observe_stage("llm_first_token", time.perf_counter() - start, provider="groq")
+                            first_token = False
+                        yield chunk.choices[0].delta.content
+                    # Groq reports usage on the last chunk of a stream
+                    self._record_usage(getattr(getattr(chunk, "x_groq", None), "usage", None), count_request=False)
+                metrics.observe_stage("llm_stream", time.perf_counter() - start, provider="groq")
+                metrics.inc("clarifyai_llm_requests_total", provider="groq", outcome="ok")
+        except Exception as e:
+            metrics.inc("clarifyai_llm_requests_total", provider="groq", outcome="error")
+            raise Exception(f"Groq API error: {str(e)}")
+    
+    def _record_usage(self, usage, count_request: bool = True):
+        """Count a finished request and the tokens it used"""
+        if count_request:
+            metrics.inc("clarifyai_llm_requests_total", provider="groq", outcome="ok")
+        if usage is None:
+            return
+        metrics.inc("clarifyai_llm_tokens_total", getattr(usage, "prompt_tokens", 0) or 0, provider="groq", kind="prompt")
+        metrics.inc(
+            "clarifyai_llm_tokens_total", getattr(usage, "completion_tokens", 0) or 0,
+            provider="groq", kind="completion"
+        )
+    
+    async def aclose(self):
+        """Close pooled connections"""
+        await self.client.close()
 
 
 
@@ -1,21 +1,36 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, status
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Depends, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 import os
+import sys
 from dotenv import load_dotenv
 import uuid
+import json
+import asyncio
+import time
 from datetime import datetime
 
 from rag.chunker import DocumentChunker
 from rag.embedder import Embedder
 from rag.vector_store import VectorStore
 from rag.retriever import Retriever
+from rag.reranker import Reranker
+from rag.context_packer import ContextPacker
+from rag.summarizer import Summarizer
+from rag.semantic_cache import SemanticCache
+from rag.batcher import EmbeddingBatcher
+from rag import model_registry
 from llm.groq_client import GroqClient
 from llm.gemini_client import GeminiClient
-from utils.pdf_reader import PDFReader
-from utils.doc_reader import DOCXReader
+from rag.ingest import IngestionPipeline
+from utils.jobs import JobManager
+from utils.uploads import UploadReader, UploadTooLarge
+from utils.storage import ChatHistoryStore, DocumentStore
+from utils.metrics import RequestMetricsMiddleware, metrics
 
 load_dotenv()
 
@@ -28,15 +43,43 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Paged listings report their size here
+    expose_headers=["X-Total-Count"],
 )
 
 security = HTTPBearer()
 
+# Worker processes serving this app (see gunicorn.conf.py); with more than
+# one, index changes are coordinated through the vector store directory
+server_workers = int(os.getenv("SERVER_WORKERS", "1"))
+loaded_in_pid = os.getpid()
+
+if __name__ == "__main__" and server_workers > 1:
+    # Hand over to the uvicorn CLI before any model is loaded: its
+    # supervisor never imports the app, so only the workers hold models,
+    # each its own copy (gunicorn -c gunicorn.conf.py main:app loads them
+    # once and forks, so the workers share that memory)
+    os.execv(sys.executable, [
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--app-dir", os.path.dirname(os.path.abspath(__file__)),
+        "--host", "0.0.0.0", "--port", "8000", "--workers", str(server_workers)
+    ])
+
 # Initialize components
 chunker = DocumentChunker()
 embedder = Embedder()
-vector_store = VectorStore()
-retriever = Retriever(vector_store)
+vector_store = VectorStore(multiprocess=server_workers > 1)
+reranker = Reranker() if os.getenv("RERANK_ENABLED", "false").lower() == "true" else None
+retriever = Retriever(vector_store, embedder=embedder, reranker=reranker)
+embedding_batcher = EmbeddingBatcher(embedder)
+semantic_cache = SemanticCache() if os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true" else None
+context_packer = ContextPacker(chunker)
+jobs = JobManager(db_path=os.getenv("APP_DB_PATH", "./app_data.sqlite3") if server_workers > 1 else None)
+ingestion = IngestionPipeline(chunker, embedder, vector_store, jobs)
+upload_reader = UploadReader()
+# Shared by every worker process and kept across restarts
+documents_db = DocumentStore()
+chat_history_db = ChatHistoryStore()
 
 # Initialize LLM clients (with fallback)
 groq_client = None
@@ -55,6 +98,166 @@ except Exception as e:
 if not groq_client and not gemini_client:
     raise ValueError("At least one LLM API key (GROQ_API_KEY or GEMINI_API_KEY) must be set")
 
+# Prompts are sized for the first model generate_with_fallback tries
+primary_model = (groq_client or gemini_client).model_name
+context_budget = context_packer.budget_for(primary_model)
+# Section-aligned chunks are more precise, so fewer may be enough
+retrieval_top_k = int(os.getenv("RETRIEVAL_TOP_K", "4"))
+batch_query_max_items = int(os.getenv("BATCH_QUERY_MAX_ITEMS", "32"))
+batch_query_concurrency = int(os.getenv("BATCH_QUERY_CONCURRENCY", "4"))
+
+# Share preloaded models with forked workers (e.g. gunicorn --preload)
+if os.getenv("SHARE_MODELS_ACROSS_WORKERS", "true" if server_workers > 1 else "false").lower() == "true":
+    model_registry.freeze_for_fork()
+
+@app.on_event("startup")
+def reopen_after_fork():
+    """Give a worker forked from a preloading parent its own file and database handles"""
+    if os.getpid() != loaded_in_pid:
+        # SQLite and Chroma handles must not be shared across fork; the
+        # inherited ones are left untouched and replaced
+        vector_store.reopen()
+        documents_db.reopen()
+        chat_history_db.reopen()
+        jobs.reopen()
+
+async def sync_worker_state(request: Request, call_next):
+    """Pick up documents other workers indexed or deleted before serving a request"""
+    if vector_store.is_stale():
+        with metrics.stage("index_refresh"):
+            reloaded = await run_in_threadpool(vector_store.refresh)
+        # Cached answers may rest on chunks that changed
+        if reloaded and semantic_cache:
+            semantic_cache.clear()
+    return await call_next(request)
+
+# A single worker makes every change itself, so there is nothing to pick up
+if server_workers > 1:
+    app.middleware("http")(sync_worker_state)
+
+# Stage timings of each request in a Server-Timing header (browser dev tools show them)
+timing_headers = os.getenv("TIMING_HEADERS", "false").lower() == "true"
+
+# Registered last so it wraps the other middleware; left out entirely when unused
+if metrics.enabled or timing_headers:
+    app.add_middleware(RequestMetricsMiddleware, registry=metrics, timing_headers=timing_headers)
+
+@app.on_event("shutdown")
+async def close_llm_clients():
+    """Close pooled LLM connections"""
+    for client in (groq_client, gemini_client):
+        if client:
+            await client.aclose()
+
+@app.on_event("shutdown")
+async def stop_embedding_batcher():
+    """Stop the query embedding micro-batcher"""
+    await embedding_batcher.close()
+
+@app.on_event("shutdown")
+async def cancel_summaries():
+    """Stop background summary generation"""
+    for task in list(summary_tasks):
+        task.cancel()
+
+@app.on_event("shutdown")
+def stop_ingestion():
+    """Release ingestion worker pools"""
+    ingestion.shutdown()
+
+@app.on_event("shutdown")
+def close_storage():
+    documents_db.close()
+    chat_history_db.close()
+
+@app.on_event("shutdown")
+def save_query_embedding_cache():
+    """Persist memoized query embeddings (when QUERY_EMBEDDING_CACHE_PATH is set)"""
+    if embedder.query_cache:
+        embedder.query_cache.save()
+
+async def generate_with_fallback(prompt: str) -> Optional[str]:
+    """Generate with Groq, falling back to Gemini; None if both fail"""
+    for name, client in (("Groq", groq_client), ("Gemini", gemini_client)):
+        if not client:
+            continue
+        try:
+            text = await client.generate(prompt)
+            if text:
+                return text
+        except Exception as e:
+            print(f"Warning: {name} generation failed: {e}")
+    
+    return None
+
+summarizer = Summarizer(generate_with_fallback, context_packer)
+summarize_on_ingest = os.getenv("SUMMARIZE_ON_INGEST", "true").lower() == "true"
+summary_tasks = set()
+summary_pending_timeout = float(os.getenv("SUMMARY_PENDING_TIMEOUT", "600"))
+
+async def generate_document_summary(doc_id: str, content_hash: str):
+    """Summarize a document's current content and store it with its entry"""
+    try:
+        doc_chunks = await run_in_threadpool(vector_store.get_document_chunk_records, doc_id)
+        summary = await summarizer.summarize(doc_id, doc_chunks)
+    except Exception as e:
+        print(f"Warning: summary of {doc_id} failed: {e}")
+        summary = None
+    
+    # Not stored if a newer revision or a delete superseded this result
+    documents_db.set_summary(doc_id, content_hash, {
+        "status": "ready" if summary else "failed",
+        "content_hash": content_hash,
+        "text": summary,
+        "generated_at": datetime.now().isoformat()
+    })
+
+def start_document_summary(doc_id: str):
+    """Mark a document's summary pending and generate it in the background"""
+    doc = documents_db.get(doc_id)
+    if not doc:
+        return
+    documents_db.set_summary(doc_id, doc["content_hash"], {
+        "status": "pending",
+        "content_hash": doc["content_hash"],
+        "started_at": time.time()
+    })
+    task = asyncio.create_task(generate_document_summary(doc_id, doc["content_hash"]))
+    summary_tasks.add(task)
+    task.add_done_callback(summary_tasks.discard)
+
+def summary_status(doc: dict) -> str:
+    """ready, pending or failed for the current content; missing otherwise"""
+    summary = doc.get("summary")
+    if not summary or summary.get("content_hash") != doc.get("content_hash"):
+        return "missing"
+    # A summary left pending by a worker that stopped is started again
+    if summary["status"] == "pending" and time.time() - summary.get("started_at", 0) > summary_pending_timeout:
+        return "missing"
+    return summary["status"]
+
+async def stream_with_fallback(prompt: str) -> AsyncIterator[str]:
+    """
+    Stream from Groq, falling back to Gemini if nothing was produced yet
+    
+    Once text has been sent a failure cannot be retried elsewhere, so the
+    stream just ends.
+    """
+    for name, client in (("Groq", groq_client), ("Gemini", gemini_client)):
+        if not client:
+            continue
+        produced = False
+        try:
+            async for text in client.stream(prompt):
+                produced = True
+                yield text
+            if produced:
+                return
+        except Exception as e:
+            print(f"Warning: {name} streaming failed: {e}")
+            if produced:
+                return
+
 # Simple in-memory auth (replace with proper DB in production)
 users_db = {
     "admin": {"password": "admin123", "role": "admin"},
@@ -62,10 +265,6 @@ users_db = {
     "employer2": {"password": "emp123", "role": "employer"},
 }
 
-# In-memory storage (replace with DB in production)
-documents_db = {}
-chat_history_db = {}
-
 # Request/Response Models
 class LoginRequest(BaseModel):
     username: str
@@ -85,17 +284,37 @@ class QueryResponse(BaseModel):
     context_used: List[str]
     sources: List[str]
 
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+    username: str
+    generate: bool = True
+    max_concurrency: Optional[int] = None
+
+class BatchQueryItem(BaseModel):
+    query: str
+    answer: Optional[str] = None
+    context_used: List[str]
+    sources: List[str]
+    cached: bool = False
+    timings: Dict[str, float]
+
+class BatchQueryResponse(BaseModel):
+    results: List[BatchQueryItem]
+    timings: Dict[str, float]
+
 class DocumentInfo(BaseModel):
     doc_id: str
     filename: str
     upload_date: str
     chunk_count: int
+    summary_status: str = "missing"
 
 class SummaryRequest(BaseModel):
     doc_id: str
 
 class SummaryResponse(BaseModel):
-    summary: str
+    summary: Optional[str] = None
+    status: str = "ready"
 
 # Authentication
 def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
@@ -160,130 +379,239 @@ async def user_login(login: LoginRequest):
 @app.post("/upload")
 async def upload_document(
     file: UploadFile = File(...),
+    doc_id: Optional[str] = Form(None),
     admin: dict = Depends(verify_admin)
 ):
-    """Upload and process a document"""
+    """Upload a document, or a revision of one given its doc_id, and queue it for background processing"""
+    file_ext = file.filename.split(".")[-1].lower()
+    if file_ext not in ["pdf", "docx"]:
+        raise HTTPException(status_code=400, detail="Only PDF and DOCX files are supported")
+    if doc_id and not documents_db.get(doc_id):
+        raise HTTPException(status_code=404, detail="Document not found")
+    
     try:
-        # Save uploaded file temporarily
-        file_ext = file.filename.split(".")[-1].lower()
-        if file_ext not in ["pdf", "docx"]:
-            raise HTTPException(status_code=400, detail="Only PDF and DOCX files are supported")
-        
-        temp_path = f"temp_{uuid.uuid4()}.{file_ext}"
-        with open(temp_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
-        
-        # Extract text
-        if file_ext == "pdf":
-            text = PDFReader.extract_text(temp_path)
-        else:
-            text = DOCXReader.extract_text(temp_path)
-        
-        # Clean up temp file
-        os.remove(temp_path)
-        
-        if not text:
-            raise HTTPException(status_code=400, detail="Could not extract text from document")
-        
-        # Chunk document
-        chunks = chunker.chunk(text)
-        
-        # Generate embeddings and store
-        doc_id = str(uuid.uuid4())
-        embeddings = embedder.embed_batch([chunk["text"] for chunk in chunks])
+        buffer, content_hash, _ = await upload_reader.read(file)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    
+    # Exact duplicates are detected before any extraction work
+    doc = documents_db.find_by_hash(content_hash)
+    if doc:
+        buffer.close()
+        return {
+            "message": "Document already uploaded",
+            "doc_id": doc["doc_id"],
+            "chunk_count": doc["chunk_count"],
+            "duplicate": True
+        }
+    active_job = jobs.find_active(content_hash=content_hash)
+    if active_job:
+        buffer.close()
+        return {
+            "message": "Document is already being processed",
+            "job_id": active_job["job_id"],
+            "doc_id": active_job["doc_id"],
+            "status": active_job["status"],
+            "duplicate": True
+        }
+    
+    # Two jobs syncing the same document would each diff against a stale view
+    if doc_id and jobs.find_active(doc_id=doc_id):
+        buffer.close()
+        raise HTTPException(status_code=409, detail="A revision of this document is already being processed")
+    
+    # A revision keeps its doc_id, so only its changed chunks are embedded;
+    # files that merely share a name stay separate documents
+    revision = doc_id is not None
+    doc_id = doc_id or str(uuid.uuid4())
+    filename = file.filename
+    username = admin["username"]
+    
+    loop = asyncio.get_running_loop()
+    try:
+        def register_document(result: dict):
+            # New content may answer questions differently
+            if semantic_cache:
+                semantic_cache.clear()
+            
+            # Store document info once its chunks are searchable
+            documents_db.put({
+                "doc_id": doc_id,
+                "filename": filename,
+                "upload_date": datetime.now().isoformat(),
+                "chunk_count": result["chunk_count"],
+                "content_hash": content_hash,
+                "username": username
+            })
+            
+            # Summarize right away so /summarize is a lookup
+            if summarize_on_ingest:
+                loop.call_soon_threadsafe(start_document_summary, doc_id)
         
-        # Store in ChromaDB
-        vector_store.add_documents(
-            doc_id=doc_id,
-            chunks=[chunk["text"] for chunk in chunks],
-            embeddings=embeddings,
-            metadata=[{"filename": file.filename, "chunk_index": i} for i in range(len(chunks))]
+        # The ingestion job parses straight from the buffer and closes it
+        job_id = ingestion.submit(
+            buffer, file_ext, filename, doc_id, content_hash, on_complete=register_document
         )
         
-        # Store document info
-        documents_db[doc_id] = {
-            "doc_id": doc_id,
-            "filename": file.filename,
-            "upload_date": datetime.now().isoformat(),
-            "chunk_count": len(chunks),
-            "username": admin["username"]
-        }
-        
         return {
-            "message": "Document uploaded successfully",
+            "message": "Document upload accepted",
+            "job_id": job_id,
             "doc_id": doc_id,
-            "chunk_count": len(chunks)
+            "status": "queued",
+            "revision": revision
         }
     
     except Exception as e:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+        buffer.close()
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/jobs/{job_id}")
+async def get_job_status(
+    job_id: str,
+    admin: dict = Depends(verify_admin)
+):
+    """Get the status and per-stage progress of an ingestion job"""
+    job = jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 @app.delete("/delete_doc/{doc_id}")
 async def delete_document(
     doc_id: str,
     admin: dict = Depends(verify_admin)
 ):
     """Delete a document"""
-    if doc_id not in documents_db:
+    if not documents_db.get(doc_id):
         raise HTTPException(status_code=404, detail="Document not found")
     
     # Remove from ChromaDB
     vector_store.delete_document(doc_id)
+    if semantic_cache:
+        semantic_cache.invalidate_document(doc_id)
+    summarizer.invalidate(doc_id)
     
     # Remove from database
-    del documents_db[doc_id]
+    documents_db.delete(doc_id)
     
     return {"message": "Document deleted successfully"}
 
 @app.get("/list_docs", response_model=List[DocumentInfo])
-async def list_documents(admin: dict = Depends(verify_admin)):
-    """List all documents"""
+async def list_documents(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    admin: dict = Depends(verify_admin)
+):
+    """List documents in upload order, a page at a time (X-Total-Count gives the total)"""
+    response.headers["X-Total-Count"] = str(documents_db.count())
     return [
         DocumentInfo(
             doc_id=doc["doc_id"],
             filename=doc["filename"],
             upload_date=doc["upload_date"],
-            chunk_count=doc["chunk_count"]
+            chunk_count=doc["chunk_count"],
+            summary_status=summary_status(doc)
         )
-        for doc in documents_db.values()
+        for doc in documents_db.list(limit=limit, offset=offset)
     ]
 
 @app.post("/summarize", response_model=SummaryResponse)
 async def summarize_document(
     request: SummaryRequest,
+    response: Response,
     admin: dict = Depends(verify_admin)
 ):
-    """Generate summary of a document"""
-    if request.doc_id not in documents_db:
+    """
+    Get the summary of a document
+    
+    Summaries are generated in the background after ingestion. While one
+    is being generated this returns 202 with status "pending"; a missing
+    or failed summary is (re)started the same way.
+    """
+    doc = documents_db.get(request.doc_id)
+    if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    # Retrieve all chunks for the document
-    doc_chunks = vector_store.get_document_chunks(request.doc_id)
-    full_text = "\n\n".join(doc_chunks)
+    current = summary_status(doc)
+    if current == "ready":
+        return SummaryResponse(summary=doc["summary"]["text"])
     
-    # Generate summary using LLM
-    summary_prompt = f"Please provide a concise summary of the following document:\n\n{full_text[:4000]}"
+    if current != "pending":
+        start_document_summary(request.doc_id)
+    response.status_code = status.HTTP_202_ACCEPTED
+    return SummaryResponse(status="pending")
+
+# RAG helpers
+NOT_FOUND_ANSWER = "I could not find information related to your question in the uploaded documents."
+UNAVAILABLE_ANSWER = "I apologize, but I'm currently unable to process your request. Please try again later."
+
+def build_rag_prompt(query: str, context: str) -> str:
+    """Build the RAG prompt around packed context"""
+    return f"""You are ClarifyAI. Use ONLY the provided context to answer.
+
+Context:
+{context}
+
+User Question:
+{query}
+
+If answer not found in context, say:
+"{NOT_FOUND_ANSWER}"
+"""
+
+def chunk_sources(retrieved_chunks: List[dict]) -> List[str]:
+    """Source filename of each retrieved chunk"""
+    return [chunk.get("metadata", {}).get("filename", "Unknown") for chunk in retrieved_chunks]
+
+def record_chat_history(username: str, query: str, answer: str, retrieved_chunks: List[dict]):
+    """Append a question/answer pair to the user's chat history"""
+    # Context is stored by chunk id; /history looks the text up again
+    chat_history_db.append(
+        username,
+        query,
+        answer,
+        [chunk["id"] for chunk in retrieved_chunks if chunk.get("id")],
+        chunk_sources(retrieved_chunks)
+    )
+
+async def prepare_query(query: str) -> Tuple[List[float], List[dict], Optional[str]]:
+    """
+    Embed a query and find its context, consulting the semantic cache first
     
-    summary = None
-    if groq_client:
-        try:
-            summary = await groq_client.generate(summary_prompt)
-        except:
-            pass
+    Returns:
+        Tuple of (query embedding, retrieved chunks, cached answer or None)
+    """
+    # Concurrent queries share one forward pass; vector search runs off the event loop
+    with metrics.stage("embed_query"):
+        query_embedding = await embedding_batcher.embed(query)
     
-    if not summary and gemini_client:
-        try:
-            summary = await gemini_client.generate(summary_prompt)
-        except:
-            pass
+    if semantic_cache:
+        with metrics.stage("semantic_cache"):
+            cached = semantic_cache.lookup(query_embedding)
+        if cached:
+            return query_embedding, cached["chunks"], cached["answer"]
     
-    if not summary:
-        raise HTTPException(status_code=500, detail="LLM service unavailable")
+    with metrics.stage("retrieve"):
+        retrieved_chunks = await run_in_threadpool(
+            retriever.retrieve_by_embedding, query_embedding, retrieval_top_k, query
+        )
+    return query_embedding, retrieved_chunks, None
+
+def build_context_prompt(query: str, retrieved_chunks: List[dict]) -> Tuple[str, List[dict]]:
+    """
+    Pack retrieved chunks into the context budget and build the prompt
     
-    return SummaryResponse(summary=summary)
+    Returns:
+        Tuple of (prompt, chunks included in the context)
+    """
+    with metrics.stage("build_prompt"):
+        context, retrieved_chunks = context_packer.pack(retrieved_chunks, budget=context_budget)
+        return build_rag_prompt(query, context), retrieved_chunks
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 # User Routes
 @app.post("/query", response_model=QueryResponse)
@@ -293,71 +621,281 @@ async def query_rag(
 ):
     """Query the RAG system"""
     # Retrieve relevant chunks
-    retrieved_chunks = retriever.retrieve(request.query, top_k=4)
+    query_embedding, retrieved_chunks, answer = await prepare_query(request.query)
     
     if not retrieved_chunks:
         return QueryResponse(
-            answer="I could not find information related to your question in the uploaded documents.",
+            answer=NOT_FOUND_ANSWER,
             context_used=[],
             sources=[]
         )
     
-    # Build context
-    context = "\n\n".join([chunk["text"] for chunk in retrieved_chunks])
-    
-    # RAG prompt template
-    rag_prompt = f"""You are ClarifyAI. Use ONLY the provided context to answer.
-
-Context:
-{context}
-
-User Question:
-{request.query}
-
-If answer not found in context, say:
-"I could not find information related to your question in the uploaded documents."
-"""
-    
-    # Generate answer
-    answer = None
-    if groq_client:
-        try:
-            answer = await groq_client.generate(rag_prompt)
-        except:
-            pass
-    
-    if not answer and gemini_client:
-        try:
-            answer = await gemini_client.generate(rag_prompt)
-        except:
-            pass
+    # Generate answer unless a similar question was already answered
+    if not answer:
+        prompt, retrieved_chunks = build_context_prompt(request.query, retrieved_chunks)
+        answer = await generate_with_fallback(prompt)
+        if answer and semantic_cache:
+            semantic_cache.store(request.query, query_embedding, answer, retrieved_chunks)
     
     if not answer:
-        answer = "I apologize, but I'm currently unable to process your request. Please try again later."
+        answer = UNAVAILABLE_ANSWER
     
     # Store chat history
-    if request.username not in chat_history_db:
-        chat_history_db[request.username] = []
-    
-    chat_history_db[request.username].append({
-        "query": request.query,
-        "answer": answer,
-        "timestamp": datetime.now().isoformat(),
-        "context_used": [chunk["text"] for chunk in retrieved_chunks],
-        "sources": [chunk.get("metadata", {}).get("filename", "Unknown") for chunk in retrieved_chunks]
-    })
+    record_chat_history(request.username, request.query, answer, retrieved_chunks)
     
     return QueryResponse(
         answer=answer,
         context_used=[chunk["text"] for chunk in retrieved_chunks],
-        sources=[chunk.get("metadata", {}).get("filename", "Unknown") for chunk in retrieved_chunks]
+        sources=chunk_sources(retrieved_chunks)
+    )
+
+@app.post("/query_batch", response_model=BatchQueryResponse)
+async def query_rag_batch(
+    request: BatchQueryRequest,
+    user: dict = Depends(verify_token)
+):
+    """
+    Answer several questions in one request
+    
+    All questions are embedded in one forward pass and searched with one
+    vector query; answers are then generated concurrently, at most
+    BATCH_QUERY_CONCURRENCY (or max_concurrency, if lower) at a time. With
+    generate=false only the retrieved context is returned. Timings are in
+    milliseconds: batch-wide embed/retrieve, and per item the generation
+    time and the time from the start of the batch until the item finished.
+    """
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="No queries given")
+    if len(request.queries) > batch_query_max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {batch_query_max_items} queries per batch"
+        )
+    
+    start = time.perf_counter()
+    
+    def elapsed_ms(since: float) -> float:
+        return round((time.perf_counter() - since) * 1000, 2)
+    
+    query_embeddings = await run_in_threadpool(embedder.embed_queries, request.queries)
+    embed_ms = elapsed_ms(start)
+    metrics.observe_stage("embed_query", embed_ms / 1000)
+    
+    cached = [semantic_cache.lookup(embedding) if semantic_cache else None for embedding in query_embeddings]
+    to_retrieve = [i for i, hit in enumerate(cached) if not hit]
+    retrieve_start = time.perf_counter()
+    retrieved = await run_in_threadpool(
+        retriever.retrieve_many_by_embedding,
+        [query_embeddings[i].tolist() for i in to_retrieve],
+        retrieval_top_k,
+        [request.queries[i] for i in to_retrieve]
+    )
+    retrieve_ms = elapsed_ms(retrieve_start)
+    metrics.observe_stage("retrieve", retrieve_ms / 1000)
+    chunks_by_item = {i: chunks for i, chunks in zip(to_retrieve, retrieved)}
+    
+    limit = min(request.max_concurrency or batch_query_concurrency, batch_query_concurrency)
+    semaphore = asyncio.Semaphore(max(1, limit))
+    
+    async def answer_item(i: int) -> BatchQueryItem:
+        query = request.queries[i]
+        timings = {"generate_ms": 0.0}
+        if cached[i]:
+            answer, chunks = cached[i]["answer"], cached[i]["chunks"]
+        else:
+            answer, chunks = None, chunks_by_item[i]
+            if not chunks:
+                answer = NOT_FOUND_ANSWER
+            elif request.generate:
+                prompt, chunks = build_context_prompt(query, chunks)
+                async with semaphore:
+                    generate_start = time.perf_counter()
+                    answer = await generate_with_fallback(prompt)
+                    timings["generate_ms"] = elapsed_ms(generate_start)
+                if answer and semantic_cache:
+                    semantic_cache.store(query, query_embeddings[i], answer, chunks)
+                answer = answer or UNAVAILABLE_ANSWER
+        
+        if answer is not None:
+            record_chat_history(request.username, query, answer, chunks)
+        timings["total_ms"] = elapsed_ms(start)
+        return BatchQueryItem(
+            query=query,
+            answer=answer,
+            context_used=[chunk["text"] for chunk in chunks],
+            sources=chunk_sources(chunks),
+            cached=bool(cached[i]),
+            timings=timings
+        )
+    
+    results = await asyncio.gather(*(answer_item(i) for i in range(len(request.queries))))
+    return BatchQueryResponse(
+        results=results,
+        timings={"embed_ms": embed_ms, "retrieve_ms": retrieve_ms, "total_ms": elapsed_ms(start)}
     )
 
+@app.post("/query_stream")
+async def query_rag_stream(
+    request: QueryRequest,
+    user: dict = Depends(verify_token)
+):
+    """
+    Query the RAG system, streaming the answer as server-sent events
+    
+    Events: `sources` (retrieved context, sent before generation starts),
+    `token` (answer text deltas) and `done` (the complete answer).
+    """
+    query_embedding, retrieved_chunks, cached_answer = await prepare_query(request.query)
+    prompt = ""
+    if retrieved_chunks and not cached_answer:
+        prompt, retrieved_chunks = build_context_prompt(request.query, retrieved_chunks)
+    
+    async def event_stream():
+        yield sse_event("sources", {
+            "context_used": [chunk["text"] for chunk in retrieved_chunks],
+            "sources": chunk_sources(retrieved_chunks)
+        })
+        
+        if not retrieved_chunks:
+            yield sse_event("token", {"text": NOT_FOUND_ANSWER})
+            yield sse_event("done", {"answer": NOT_FOUND_ANSWER})
+            return
+        
+        if cached_answer:
+            answer = cached_answer
+            yield sse_event("token", {"text": answer})
+        else:
+            parts = []
+            async for text in stream_with_fallback(prompt):
+                parts.append(text)
+                yield sse_event("token", {"text": text})
+            
+            answer = "".join(parts)
+            if answer and semantic_cache:
+                semantic_cache.store(request.query, query_embedding, answer, retrieved_chunks)
+        
+        if not answer:
+            answer = UNAVAILABLE_ANSWER
+            yield sse_event("token", {"text": answer})
+        
+        record_chat_history(request.username, request.query, answer, retrieved_chunks)
+        yield sse_event("done", {"answer": answer})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/cache/stats")
+async def get_cache_stats(admin: dict = Depends(verify_admin)):
+    """Cache, batching, lexical index and reranking statistics"""
+    summaries = [summary_status(doc) for doc in documents_db.list()]
+    return {
+        "semantic_cache": {"enabled": True, **semantic_cache.stats()} if semantic_cache else {"enabled": False},
+        "query_embedding_cache": (
+            {"enabled": True, **embedder.query_cache.stats()} if embedder.query_cache else {"enabled": False}
+        ),
+        "embedding_store": (
+            {"enabled": True, **embedder.embedding_store.stats()}
+            if embedder.embedding_store is not None else {"enabled": False}
+        ),
+        "embedding_batcher": {"backend": embedder.backend, **embedding_batcher.stats()},
+        "vector_store": {
+            "backend": vector_store.backend,
+            "chunks": vector_store.collection.count(),
+            "reloads": vector_store.reloads,
+            **(vector_store.collection.stats() if vector_store.backend == "numpy" else {})
+        },
+        "lexical_index": vector_store.lexical_index.stats(),
+        "reranker": {"enabled": True, **reranker.stats()} if reranker else {"enabled": False},
+        "summarizer": summarizer.stats(),
+        "summaries": {
+            state: summaries.count(state)
+            for state in ("ready", "pending", "failed", "missing")
+        },
+        "chat_history": chat_history_db.stats()
+    }
+
+def cache_figures(field: str) -> Dict[str, float]:
+    """One stats() field of every enabled cache, keyed by cache name"""
+    caches = {
+        "semantic": semantic_cache.stats() if semantic_cache else None,
+        "query_embedding": embedder.query_cache.stats() if embedder.query_cache else None,
+        "summary_group": {
+            "hits": summarizer.group_hits,
+            "misses": summarizer.group_misses,
+            "hit_rate": summarizer.stats()["group_hit_rate"]
+        }
+    }
+    return {name: stats[field] for name, stats in caches.items() if stats and field in stats}
+
+metrics.collect("clarifyai_cache_hits_total", "Cache hits by cache", lambda: cache_figures("hits"), "cache", "counter")
+metrics.collect("clarifyai_cache_misses_total", "Cache misses by cache", lambda: cache_figures("misses"), "cache", "counter")
+metrics.collect("clarifyai_cache_hit_ratio", "Cache hit rate since start by cache", lambda: cache_figures("hit_rate"), "cache")
+metrics.collect("clarifyai_cache_entries", "Entries held by each cache", lambda: {
+    **cache_figures("entries"),
+    **({"embedding_store": len(embedder.embedding_store)} if embedder.embedding_store is not None else {})
+}, "cache")
+metrics.collect("clarifyai_embedding_batcher_queue_depth", "Queries waiting for an embedding batch", embedding_batcher.queue_depth)
+metrics.collect(
+    "clarifyai_embedding_batcher_batches_total", "Query embedding batches run",
+    lambda: embedding_batcher.batches, kind="counter"
+)
+metrics.collect(
+    "clarifyai_embedding_batcher_items_total", "Queries embedded through the batcher",
+    lambda: embedding_batcher.items, kind="counter"
+)
+metrics.collect("clarifyai_ingest_jobs_active", "Queued or running ingestion jobs", jobs.active_count)
+metrics.collect("clarifyai_summary_tasks_active", "Summaries being generated by this worker", lambda: len(summary_tasks))
+metrics.collect("clarifyai_vector_store_chunks", "Chunks in the vector store", lambda: vector_store.collection.count())
+metrics.collect(
+    "clarifyai_vector_store_reloads_total", "Index reloads after other workers wrote",
+    lambda: vector_store.reloads, kind="counter"
+)
+if reranker:
+    metrics.collect(
+        "clarifyai_reranker_fallbacks_total", "Queries only partly reranked because scoring would exceed the budget",
+        lambda: reranker.fallbacks, kind="counter"
+    )
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Latency histograms, token counts, cache hit rates and queue depths in Prometheus text format
+    
+    Figures are per worker process; with SERVER_WORKERS > 1 each scrape
+    reaches one worker (scrape the workers individually, or use one worker
+    per container). Disabled with METRICS_ENABLED=false.
+    """
+    if not metrics.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/history")
-async def get_chat_history(user: dict = Depends(verify_token)):
-    """Get chat history for the user"""
+async def get_chat_history(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    user: dict = Depends(verify_token)
+):
+    """
+    Get chat history for the user, oldest first
+    
+    Returns the latest `limit` entries, skipping the `offset` most recent
+    ones (X-Total-Count gives the total). context_used holds the text of
+    the referenced chunks that still exist; chunks of deleted or revised
+    documents are left out.
+    """
     username = user["username"]
-    return chat_history_db.get(username, [])
+    response.headers["X-Total-Count"] = str(chat_history_db.count(username))
+    entries = chat_history_db.list(username, limit=limit, offset=offset)
+    
+    chunk_ids = list(dict.fromkeys(chunk_id for entry in entries for chunk_id in entry["chunk_ids"]))
+    texts = {chunk["id"]: chunk["text"] for chunk in await run_in_threadpool(vector_store.get_chunks, chunk_ids)}
+    for entry in entries:
+        entry["context_used"] = [texts[chunk_id] for chunk_id in entry["chunk_ids"] if chunk_id in texts]
+    return entries
 
 if __name__ == "__main__":
     import uvicorn
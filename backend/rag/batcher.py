@@ -0,0 +1,129 @@
+"""
+Async micro-batching in front of the embedder
+"""
+import asyncio
+import os
+from typing import Dict, List, Optional, Tuple
+
+class EmbeddingBatcher:
+    """Coalesces concurrent query embeddings into one model.encode call"""
+    
+    def __init__(self, embedder, max_batch_size: Optional[int] = None, max_wait_ms: Optional[float] = None):
+        """
+        Initialize batcher
+        
+        A batch is encoded as soon as it holds max_batch_size queries or
+        max_wait_ms after its first query arrived, whichever comes first.
+        Larger values raise throughput under load at the cost of latency.
+        The wait only applies while traffic is concurrent (the previous
+        batch held more than one query), so a lone query is never delayed.
+        
+        Args:
+            embedder: Embedder instance
+            max_batch_size: Queries per forward pass (defaults to EMBED_BATCH_MAX_SIZE or 32)
+            max_wait_ms: Time to wait for a batch to fill (defaults to EMBED_BATCH_MAX_WAIT_MS or 5)
+        """
+        self.embedder = embedder
+        self.max_batch_size = max_batch_size or int(os.getenv("EMBED_BATCH_MAX_SIZE", "32"))
+        if max_wait_ms is None:
+            max_wait_ms = float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", "5"))
+        self.max_wait = max_wait_ms / 1000
+        
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        
+        self._last_batch_size = 0
+        
+        self.batches = 0
+        self.items = 0
+        self.cache_hits = 0
+    
+    async def embed(self, text: str) -> List[float]:
+        """
+        Embed a query, sharing a forward pass with concurrent callers
+        
+        Args:
+            text: Query text
+            
+        Returns:
+            Embedding vector as list of floats
+        """
+        # Repeated queries skip the queue entirely
+        if self.embedder.query_cache:
+            cached = self.embedder.query_cache.get(text)
+            if cached is not None:
+                self.cache_hits += 1
+                return cached.tolist()
+        
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+        
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+    
+    async def _collect(self) -> List[Tuple[str, asyncio.Future]]:
+        """Wait for the first query, then gather more until the batch is full or the wait is over"""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + (self.max_wait if self._last_batch_size > 1 else 0)
+        
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+    
+    async def _run(self):
+        """Worker loop: encode each collected batch off the event loop"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            texts = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                # Every queued text already missed the query cache in embed()
+                vectors = await loop.run_in_executor(None, self.embedder.embed_queries, texts, False)
+                by_text = {text: vector.tolist() for text, vector in zip(texts, vectors)}
+                for text, future in batch:
+                    if not future.done():
+                        future.set_result(by_text[text])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            self._last_batch_size = len(batch)
+            self.batches += 1
+            self.items += len(batch)
+    
+    def queue_depth(self) -> int:
+        """Queries waiting for a batch"""
+        return self._queue.qsize() if self._queue else 0
+    
+    def stats(self) -> Dict:
+        """Batching counters"""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "cache_hits": self.cache_hits,
+            "queue_depth": self.queue_depth()
+        }
+    
+    async def close(self):
+        """Stop the worker task"""
+        if self._worker and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
@@ -1,9 +1,18 @@
 """
 Document chunker for splitting text into manageable chunks
 """
-from typing import List, Dict
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import re
+import numpy as np
 import tiktoken
 
+# Token tables shared by all chunkers, keyed by encoding name
+_TOKEN_TABLES: Dict[str, Dict[str, np.ndarray]] = {}
+
+# Fallback pseudo-tokens: up to 4 non-space characters with their leading whitespace
+_FALLBACK_TOKEN_PATTERN = re.compile(r"\s*\S{1,4}")
+
 class DocumentChunker:
     """Chunks documents into overlapping segments"""
     
@@ -31,78 +40,268 @@ class DocumentChunker:
         # Fallback: approximate 1 token = 4 characters
         return len(text) // 4
     
-    def chunk(self, text: str) -> List[Dict[str, any]]:
+    def _token_table(self) -> Dict[str, np.ndarray]:
         """
-        Chunk text into overlapping segments
+        Per-token-id byte lengths and whitespace flags for the encoding
+        
+        Built once per encoding and shared by every chunker in the process.
+        """
+        table = _TOKEN_TABLES.get(self.encoding.name)
+        if table is None:
+            n_vocab = self.encoding.n_vocab
+            lengths = np.zeros(n_vocab, dtype=np.int64)
+            leading_space = np.zeros(n_vocab, dtype=bool)
+            trailing_space = np.zeros(n_vocab, dtype=bool)
+            for token_id in range(n_vocab):
+                try:
+                    token_bytes = self.encoding.decode_single_token_bytes(token_id)
+                except KeyError:
+                    continue
+                lengths[token_id] = len(token_bytes)
+                if token_bytes:
+                    leading_space[token_id] = token_bytes[:1].isspace()
+                    trailing_space[token_id] = token_bytes[-1:].isspace()
+            table = {"lengths": lengths, "leading_space": leading_space, "trailing_space": trailing_space}
+            _TOKEN_TABLES[self.encoding.name] = table
+        return table
+    
+    def _tokenize(self, text: str) -> Tuple[List[int], List[int]]:
+        """
+        Encode text once and locate every token in the original string
         
         Args:
-            text: Input text to chunk
+            text: Input text
+        
+        Returns:
+            Tuple of (character offset where each token starts,
+            sorted indices of tokens that start a whitespace-delimited word)
+        """
+        if not self.encoding:
+            # Fallback: approximate 1 token = 4 characters
+            offsets = [match.start() for match in _FALLBACK_TOKEN_PATTERN.finditer(text)]
+            boundaries = [
+                i for i, offset in enumerate(offsets)
+                if i == 0 or text[offset].isspace() or text[offset - 1].isspace()
+            ]
+            return offsets, boundaries
+        
+        table = self._token_table()
+        tokens = np.asarray(self.encoding.encode_ordinary(text), dtype=np.int64)
+        if len(tokens) == 0:
+            return [], []
+        
+        # Byte offset of each token from the cumulative token byte lengths
+        byte_offsets = np.zeros(len(tokens), dtype=np.int64)
+        np.cumsum(table["lengths"][tokens[:-1]], out=byte_offsets[1:])
+        
+        if text.isascii():
+            offsets = byte_offsets
+        else:
+            # Character index of a byte = UTF-8 lead bytes before it, less one
+            # when the token starts inside a multi-byte character
+            data = np.frombuffer(text.encode("utf-8"), dtype=np.uint8)
+            continuation = (data & 0xC0) == 0x80
+            lead_bytes = np.zeros(len(data) + 1, dtype=np.int64)
+            np.cumsum(~continuation, out=lead_bytes[1:])
+            offsets = lead_bytes[byte_offsets] - continuation[byte_offsets]
+        
+        word_start = table["leading_space"][tokens]
+        word_start[1:] |= table["trailing_space"][tokens[:-1]]
+        word_start[0] = True
+        
+        return offsets.tolist(), np.flatnonzero(word_start).tolist()
+    
+    def _window_spans(self, token_count: int, boundaries: List[int]) -> List[Tuple[int, int]]:
+        """
+        Slide a chunk_size window with overlap over the token array
+        
+        Window edges are snapped to word boundaries so that, like the previous
+        word-by-word loop, no word is split between chunks and the overlap
+        never exceeds self.overlap tokens.
+        
+        Args:
+            token_count: Number of tokens in the document
+            boundaries: Sorted token indices where words start
+        
+        Returns:
+            List of (start_token, end_token) spans
+        """
+        spans = []
+        start = 0
+        while start < token_count:
+            end = min(start + self.chunk_size, token_count)
+            if end < token_count:
+                # Pull the end back so the last word is not cut in half
+                k = bisect_right(boundaries, end) - 1
+                if k >= 0 and boundaries[k] > start:
+                    end = boundaries[k]
+            spans.append((start, end))
             
+            if end >= token_count:
+                break
+            
+            if self.overlap > 0:
+                # Start the next window on the first word inside the overlap region
+                k = bisect_left(boundaries, max(end - self.overlap, start + 1))
+                start = boundaries[k] if k < len(boundaries) and boundaries[k] < end else end
+            else:
+                start = end
+        
+        return spans
+    
+    def _spans_to_chunks(
+        self,
+        text: str,
+        offsets: List[int],
+        spans: List[Tuple[int, int]],
+        base: int = 0,
+        first_index: int = 0
+    ) -> List[Dict[str, any]]:
+        """
+        Turn token spans into chunk dictionaries
+        
+        Args:
+            text: Text the offsets refer to
+            offsets: Character offset where each token starts
+            spans: (start_token, end_token) windows
+            base: Offset of text within the whole document
+            first_index: chunk_index of the first chunk
+        
         Returns:
             List of chunk dictionaries with 'text' and 'metadata'
         """
-        if not text or not text.strip():
-            return []
-        
         chunks = []
-        words = text.split()
-        current_chunk = []
-        current_tokens = 0
-        
-        i = 0
-        while i < len(words):
-            word = words[i]
-            word_tokens = self._count_tokens(word)
+        for start, end in spans:
+            start_char = offsets[start]
+            end_char = offsets[end] if end < len(offsets) else len(text)
+            raw_text = text[start_char:end_char]
+            chunk_text = raw_text.strip()
+            if not chunk_text:
+                continue
             
-            if current_tokens + word_tokens <= self.chunk_size:
-                current_chunk.append(word)
-                current_tokens += word_tokens
-                i += 1
-            else:
-                # Save current chunk
-                if current_chunk:
-                    chunk_text = " ".join(current_chunk)
-                    chunks.append({
-                        "text": chunk_text,
-                        "metadata": {
-                            "chunk_index": len(chunks),
-                            "token_count": current_tokens
-                        }
-                    })
-                
-                # Start new chunk with overlap
-                if self.overlap > 0 and chunks:
-                    # Take last overlap tokens from previous chunk
-                    overlap_words = []
-                    overlap_tokens = 0
-                    prev_chunk = chunks[-1]["text"].split()
-                    
-                    for j in range(len(prev_chunk) - 1, -1, -1):
-                        word_token_count = self._count_tokens(prev_chunk[j])
-                        if overlap_tokens + word_token_count <= self.overlap:
-                            overlap_words.insert(0, prev_chunk[j])
-                            overlap_tokens += word_token_count
-                        else:
-                            break
-                    
-                    current_chunk = overlap_words
-                    current_tokens = overlap_tokens
-                else:
-                    current_chunk = []
-                    current_tokens = 0
-        
-        # Add final chunk
-        if current_chunk:
-            chunk_text = " ".join(current_chunk)
+            start_char += len(raw_text) - len(raw_text.lstrip())
             chunks.append({
                 "text": chunk_text,
                 "metadata": {
-                    "chunk_index": len(chunks),
-                    "token_count": current_tokens
+                    "chunk_index": first_index + len(chunks),
+                    "token_count": end - start,
+                    "start_char": base + start_char,
+                    "end_char": base + start_char + len(chunk_text)
                 }
             })
         
         return chunks
-
-
-
+    
+    def chunk(self, text: str) -> List[Dict[str, any]]:
+        """
+        Chunk text into overlapping segments
+        
+        The document is encoded once; chunks are token windows over that
+        encoding, mapped back to character spans of the original text.
+        
+        Args:
+            text: Input text to chunk
+        
+        Returns:
+            List of chunk dictionaries with 'text' and 'metadata'
+        """
+        if not text or not text.strip():
+            return []
+        
+        offsets, boundaries = self._tokenize(text)
+        return self._spans_to_chunks(text, offsets, self._window_spans(len(offsets), boundaries))
+    
+    def chunk_segments(
+        self,
+        segments: Iterable[Tuple[str, Dict]],
+        separator: str = "\n",
+        split_on: Optional[str] = None,
+        span_keys: Tuple[str, ...] = ("page",),
+        buffer_chunks: int = 8
+    ) -> Iterator[Dict[str, any]]:
+        """
+        Chunk a stream of text segments (e.g. PDF pages) as they arrive
+        
+        Segments are joined with separator, and chunk offsets refer to that
+        joined text. Only a buffer of roughly buffer_chunks chunks is
+        tokenized at a time: once it is full, every finished window is
+        emitted and the buffer is cut where the unfinished last window
+        starts, so the whole document is never held as one string.
+        
+        Segment metadata is copied onto the chunks. Keys in span_keys are
+        recorded as <key>_start and <key>_end, from the first and last
+        segment the chunk overlaps (e.g. {"page": 3} gives page_start and
+        page_end); other keys come from the chunk's first segment.
+        
+        Args:
+            segments: Iterable of (text, metadata) in document order
+            separator: Text placed between segments
+            split_on: Metadata key (e.g. "section") whose change ends the
+                current chunk, so no chunk spans two values of it
+            span_keys: Metadata keys recorded as ranges
+            buffer_chunks: Approximate chunks tokenized per pass
+        
+        Yields:
+            Chunk dictionaries with 'text' and 'metadata'
+        """
+        flush_chars = self.chunk_size * 4 * buffer_chunks  # about 4 characters per token
+        buffer = ""
+        base = 0  # Offset of buffer[0] in the joined text
+        segment_starts: List[int] = []
+        segment_meta: List[Dict] = []
+        index = 0
+        
+        def annotate(chunks: List[Dict]) -> List[Dict]:
+            for chunk in chunks:
+                meta = chunk["metadata"]
+                first = segment_meta[bisect_right(segment_starts, meta["start_char"]) - 1]
+                last = segment_meta[bisect_right(segment_starts, meta["end_char"] - 1) - 1]
+                for key, value in first.items():
+                    if key in span_keys:
+                        meta[f"{key}_start"] = value
+                        meta[f"{key}_end"] = last.get(key, value)
+                    else:
+                        meta[key] = value
+            return chunks
+        
+        def flush(final: bool) -> List[Dict]:
+            nonlocal buffer, base, index
+            offsets, boundaries = self._tokenize(buffer)
+            spans = self._window_spans(len(offsets), boundaries)
+            if final:
+                cut = len(buffer)
+            elif len(spans) < 2:
+                return []
+            else:
+                # The last window may still grow with the next segment: keep it buffered
+                cut = offsets[spans[-1][0]]
+                spans = spans[:-1]
+            chunks = annotate(self._spans_to_chunks(buffer, offsets, spans, base, index))
+            index += len(chunks)
+            buffer = buffer[cut:]
+            base += cut
+            return chunks
+        
+        for text, metadata in segments:
+            if not text:
+                continue
+            metadata = metadata or {}
+            if (
+                split_on is not None
+                and segment_meta
+                and metadata.get(split_on) != segment_meta[-1].get(split_on)
+                and buffer.strip()
+            ):
+                yield from flush(final=True)
+            
+            if segment_starts:
+                buffer += separator
+            segment_starts.append(base + len(buffer))
+            segment_meta.append(metadata)
+            buffer += text
+            
+            if len(buffer) >= flush_chars:
+                yield from flush(final=False)
+        
+        if buffer.strip():
+            yield from flush(final=True)
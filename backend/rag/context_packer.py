@@ -0,0 +1,150 @@
+"""
+Token-budgeted assembly of retrieved chunks into prompt context
+"""
+import os
+from typing import Dict, List, Optional, Tuple
+from .chunker import DocumentChunker
+from utils.metrics import metrics
+
+# Context tokens per request when no budget is configured for the model
+DEFAULT_MODEL_BUDGETS = {
+    "llama-3.1-8b-instant": 2000,
+    "gemini-1.5-flash": 4000,
+}
+
+class ContextPacker:
+    """Packs chunks into a token budget in document order"""
+    
+    def __init__(
+        self,
+        chunker: DocumentChunker,
+        budgets: Optional[Dict[str, int]] = None,
+        default_budget: Optional[int] = None
+    ):
+        """
+        Initialize context packer
+        
+        Args:
+            chunker: DocumentChunker whose tokenizer measures the context
+            budgets: Token budget per LLM model name (defaults to DEFAULT_MODEL_BUDGETS
+                updated with CONTEXT_TOKEN_BUDGETS, e.g. "llama-3.1-8b-instant=3000,gemini-1.5-flash=6000")
+            default_budget: Budget for other models (defaults to CONTEXT_TOKEN_BUDGET or 2000)
+        """
+        self.chunker = chunker
+        if budgets is None:
+            budgets = dict(DEFAULT_MODEL_BUDGETS)
+            for item in os.getenv("CONTEXT_TOKEN_BUDGETS", "").split(","):
+                if "=" in item:
+                    model, tokens = item.rsplit("=", 1)
+                    budgets[model.strip()] = int(tokens)
+        self.budgets = budgets
+        self.default_budget = default_budget or int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+    
+    def budget_for(self, model_name: Optional[str]) -> int:
+        """Token budget for an LLM model"""
+        return self.budgets.get(model_name, self.default_budget)
+    
+    @staticmethod
+    def _overlap(previous: Dict, chunk: Dict) -> int:
+        """Characters at the start of chunk already present at the end of previous"""
+        prev_meta, meta = previous.get("metadata", {}), chunk.get("metadata", {})
+        if "end_char" in prev_meta and "start_char" in meta:
+            return max(0, min(prev_meta["end_char"] - meta["start_char"], len(chunk["text"])))
+        
+        # Chunks stored before offsets were recorded: match text directly
+        prev_text, text = previous["text"], chunk["text"]
+        probe = text[:32]
+        position = prev_text.find(probe, max(0, len(prev_text) - len(text))) if probe else -1
+        while position != -1:
+            if text.startswith(prev_text[position:]):
+                return len(prev_text) - position
+            position = prev_text.find(probe, position + 1)
+        return 0
+    
+    @staticmethod
+    def _position(chunk: Dict) -> Tuple[str, int]:
+        meta = chunk.get("metadata", {})
+        return meta.get("doc_id", ""), meta.get("chunk_index", 0)
+    
+    def _assemble(self, chunks: List[Dict], doc_order: Dict[str, int]) -> List[str]:
+        """
+        Context pieces for chunks in document order
+        
+        Adjacent chunks of the same document are merged with their shared
+        overlap removed; everything else becomes a separate piece.
+        """
+        ordered = sorted(chunks, key=lambda c: (doc_order[self._position(c)[0]], self._position(c)[1]))
+        pieces: List[str] = []
+        previous = None
+        for chunk in ordered:
+            doc_id, index = self._position(chunk)
+            if previous is not None and self._position(previous) == (doc_id, index - 1):
+                overlap = self._overlap(previous, chunk)
+                pieces[-1] = f"{pieces[-1]} {chunk['text'][overlap:].lstrip()}".rstrip()
+            else:
+                pieces.append(chunk["text"])
+            previous = chunk
+        return pieces
+    
+    def _truncate(self, text: str, budget: int) -> str:
+        """First budget tokens of text"""
+        encoding = self.chunker.encoding
+        if encoding:
+            return encoding.decode(encoding.encode_ordinary(text)[:budget])
+        return text[:budget * 4]
+    
+    def pack(self, chunks: List[Dict], budget: int) -> Tuple[str, List[Dict]]:
+        """
+        Pack chunks into a token budget
+        
+        Chunks are admitted in the order given (most relevant first) while
+        the assembled context still fits; the context itself lists them by
+        document and chunk_index, with overlapping text between adjacent
+        chunks kept once. If even the first chunk is too large it is cut to
+        the budget.
+        
+        Args:
+            chunks: Retrieved chunks with text and metadata, best first
+            budget: Maximum context tokens
+        
+        Returns:
+            Tuple of (context text, chunks included in it)
+        """
+        if not chunks:
+            return "", []
+        
+        doc_order: Dict[str, int] = {}
+        for chunk in chunks:
+            doc_order.setdefault(self._position(chunk)[0], len(doc_order))
+        
+        token_cache: Dict[str, int] = {}
+        
+        def cost(pieces: List[str]) -> int:
+            total = len(pieces) - 1  # "\n\n" separators
+            for piece in pieces:
+                if piece not in token_cache:
+                    token_cache[piece] = self.chunker._count_tokens(piece)
+                total += token_cache[piece]
+            return total
+        
+        selected: List[Dict] = []
+        pieces: List[str] = []
+        for chunk in chunks:
+            candidate = self._assemble(selected + [chunk], doc_order)
+            if cost(candidate) <= budget:
+                selected.append(chunk)
+                pieces = candidate
+        
+        if not selected:
+            first = chunks[0]
+            metrics.inc("clarifyai_context_tokens_total", budget)
+            metrics.inc("clarifyai_context_chunks_total")
+            return self._truncate(first["text"], budget), [first]
+        
+        # Token counts of the chosen pieces are already cached
+        metrics.inc("clarifyai_context_tokens_total", cost(pieces))
+        metrics.inc("clarifyai_context_chunks_total", len(selected))
+        
+        # Report included chunks in context order
+        selected.sort(key=lambda c: (doc_order[self._position(c)[0]], self._position(c)[1]))
+        return "\n\n".join(pieces), selected
@@ -1,23 +1,112 @@
 """
 Embedding generator using Sentence Transformers
 """
-from sentence_transformers import SentenceTransformer
+import os
 import numpy as np
-from typing import List
+from typing import List, Optional
+from .model_registry import get_sentence_transformer
+from .query_cache import QueryEmbeddingCache
+from .embedding_store import EmbeddingStore, cache_key
+from utils.hashing import hash_text
+from utils.metrics import metrics
 
 class Embedder:
     """Generates embeddings using Sentence Transformers"""
     
-    def __init__(self, model_name: str = "sentence-transformers/all-mpnet-base-v2"):
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/all-mpnet-base-v2",
+        query_cache_size: Optional[int] = None,
+        query_cache_path: Optional[str] = None,
+        embedding_cache_dir: Optional[str] = None,
+        backend: Optional[str] = None,
+        threads: Optional[int] = None,
+        batch_tokens: Optional[int] = None,
+        max_batch_size: Optional[int] = None
+    ):
         """
         Initialize embedder
         
+        The underlying model is shared through the model registry, so
+        creating several embedders does not load the weights again.
+        
         Args:
             model_name: Name of the Sentence Transformer model
+            query_cache_size: Query embeddings memoized by embed()
+                (defaults to QUERY_EMBEDDING_CACHE_SIZE or 2048; 0 disables)
+            query_cache_path: File the query cache persists to across restarts
+                (defaults to QUERY_EMBEDDING_CACHE_PATH; unset keeps it in memory)
+            embedding_cache_dir: Directory of the on-disk chunk embedding cache used
+                by embed_batch (defaults to EMBEDDING_CACHE_DIR or ./embedding_cache;
+                an empty value disables it)
+            backend: Runtime: torch, torch-int8, onnx or onnx-int8
+                (defaults to EMBEDDING_BACKEND or torch)
+            threads: Intra-op threads of the runtime (defaults to EMBEDDING_THREADS;
+                unset keeps the runtime default)
+            batch_tokens: Approximate padded tokens per embed_batch forward pass
+                (defaults to EMBEDDING_BATCH_TOKENS or 8192)
+            max_batch_size: Most texts per forward pass (defaults to EMBEDDING_BATCH_SIZE or 64)
+        """
+        self.model_name = model_name
+        self.backend = backend or os.getenv("EMBEDDING_BACKEND", "torch")
+        threads = threads or int(os.getenv("EMBEDDING_THREADS", "0")) or None
+        self.model = get_sentence_transformer(model_name, backend=self.backend, threads=threads)
+        self.cache_key = cache_key(model_name, self.backend)
+        self.batch_tokens = batch_tokens or int(os.getenv("EMBEDDING_BATCH_TOKENS", "8192"))
+        self.max_batch_size = max_batch_size or int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+        
+        if query_cache_size is None:
+            query_cache_size = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048"))
+        self.query_cache = QueryEmbeddingCache(
+            max_entries=query_cache_size,
+            persist_path=query_cache_path or os.getenv("QUERY_EMBEDDING_CACHE_PATH") or None,
+            model_name=self.cache_key
+        ) if query_cache_size > 0 else None
+        
+        if embedding_cache_dir is None:
+            embedding_cache_dir = os.getenv("EMBEDDING_CACHE_DIR", "./embedding_cache")
+        self.embedding_store = EmbeddingStore(embedding_cache_dir, self.cache_key) if embedding_cache_dir else None
+    
+    def embed_array(self, text: str) -> np.ndarray:
+        """
+        Generate embedding for a single text, memoizing repeated queries
+        
+        Args:
+            text: Input text
+            
+        Returns:
+            Embedding vector as a float32 array
         """
-        print(f"Loading embedding model: {model_name}")
-        self.model = SentenceTransformer(model_name)
-        print("Embedding model loaded successfully")
+        return self.embed_queries([text])[0]
+    
+    def embed_queries(self, texts: List[str], check_cache: bool = True) -> np.ndarray:
+        """
+        Generate embeddings for several queries in one forward pass
+        
+        Queries found in the query cache are not re-encoded, and new ones
+        are added to it.
+        
+        Args:
+            texts: List of query texts
+            check_cache: Look queries up first (False when the caller already missed)
+            
+        Returns:
+            Float32 array with one row per query
+        """
+        use_cache = self.query_cache and check_cache
+        cached = [self.query_cache.get(text) if use_cache else None for text in texts]
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        
+        if missing:
+            with metrics.stage("embed_model", kind="query"):
+                encoded = self.model.encode([texts[i] for i in missing], convert_to_numpy=True)
+            metrics.inc("clarifyai_embedded_texts_total", len(missing), kind="query")
+            for i, vector in zip(missing, encoded.astype(np.float32)):
+                cached[i] = vector
+                if self.query_cache:
+                    self.query_cache.put(texts[i], vector)
+        
+        return np.stack(cached)
     
     def embed(self, text: str) -> List[float]:
         """
@@ -29,8 +118,52 @@ class Embedder:
         Returns:
             Embedding vector as list of floats
         """
-        embedding = self.model.encode(text, convert_to_numpy=True)
-        return embedding.tolist()
+        return self.embed_array(text).tolist()
+    
+    def length_buckets(self, texts: List[str]) -> List[List[int]]:
+        """
+        Group texts of similar length into forward passes
+        
+        Texts are sorted by length and cut into batches whose padded size
+        (longest text x batch size, in estimated tokens) stays within
+        batch_tokens, so short chunks go through in large batches and long
+        ones in small batches, with little padding in either.
+        
+        Args:
+            texts: Input texts
+        
+        Returns:
+            Batches of indices into texts
+        """
+        max_tokens = getattr(self.model, "max_seq_length", None) or 512
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        batches: List[List[int]] = []
+        for i in order:
+            # About 4 characters per token, truncated by the model anyway
+            tokens = min(len(texts[i]) // 4 + 2, max_tokens)
+            size = len(batches[-1]) + 1 if batches else 0
+            if batches and size <= self.max_batch_size and tokens * size <= self.batch_tokens:
+                batches[-1].append(i)
+            else:
+                batches.append([i])
+        return batches
+    
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Encode texts in length buckets, returning rows in input order"""
+        embeddings = None
+        with metrics.stage("embed_model", kind="batch"):
+            for batch in self.length_buckets(texts):
+                encoded = self.model.encode(
+                    [texts[i] for i in batch],
+                    batch_size=len(batch),
+                    convert_to_numpy=True,
+                    show_progress_bar=False
+                ).astype(np.float32)
+                if embeddings is None:
+                    embeddings = np.zeros((len(texts), encoded.shape[1]), dtype=np.float32)
+                embeddings[batch] = encoded
+        metrics.inc("clarifyai_embedded_texts_total", len(texts), kind="batch")
+        return embeddings
     
     def embed_batch(self, texts: List[str]) -> List[List[float]]:
         """
@@ -45,8 +178,16 @@ class Embedder:
         if not texts:
             return []
         
-        embeddings = self.model.encode(texts, convert_to_numpy=True, show_progress_bar=True)
-        return embeddings.tolist()
-
-
-
+        if self.embedding_store is None:
+            return self._encode(texts).tolist()
+        
+        # Reuse vectors computed for the same text by this model before
+        hashes = [hash_text(text) for text in texts]
+        stored = self.embedding_store.get_many(hashes)
+        missing = [i for i, h in enumerate(hashes) if h not in stored]
+        if missing:
+            encoded = self._encode([texts[i] for i in missing])
+            self.embedding_store.put_many([hashes[i] for i in missing], encoded)
+            stored.update({hashes[i]: vector for i, vector in zip(missing, encoded)})
+        
+        return [stored[h].tolist() for h in hashes]
@@ -0,0 +1,168 @@
+"""
+Persistent on-disk embedding cache keyed by model and chunk text hash
+"""
+import json
+import os
+import re
+import threading
+import numpy as np
+from typing import Dict, List, Optional
+from utils.locks import FileLock
+
+def cache_key(model_name: str, backend: str = "torch") -> str:
+    """
+    Name embeddings of a model are cached under
+    
+    Quantized and ONNX runtimes produce slightly different vectors than the
+    fp32 PyTorch model, so each runtime other than "torch" gets its own cache.
+    """
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+class EmbeddingStore:
+    """Append-only float32 matrix on disk plus a chunk-hash index, one per model"""
+    
+    def __init__(self, root_directory: str, model_name: str):
+        """
+        Initialize embedding store
+        
+        Layout: {root_directory}/{model}/vectors.f32 holds raw float32 rows,
+        index.tsv maps "chunk_hash<TAB>row" and meta.json records the model
+        and dimension. Rows are read through a memory map, so lookups do
+        not load the whole matrix. Appends hold a file lock and first pick
+        up rows other processes appended, so worker processes can share
+        the directory.
+        
+        Args:
+            root_directory: Directory holding one sub-directory per model
+            model_name: Model the embeddings were produced by
+        """
+        self.model_name = model_name
+        self.directory = os.path.join(root_directory, re.sub(r"[^A-Za-z0-9_.-]+", "__", model_name))
+        self.vectors_path = os.path.join(self.directory, "vectors.f32")
+        self.index_path = os.path.join(self.directory, "index.tsv")
+        self.meta_path = os.path.join(self.directory, "meta.json")
+        os.makedirs(self.directory, exist_ok=True)
+        
+        self.dim: Optional[int] = None
+        self._index: Dict[str, int] = {}
+        self._rows = 0
+        self._memmap: Optional[np.memmap] = None
+        self._index_offset = 0
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(os.path.join(self.directory, "write.lock"))
+        with self._file_lock.exclusive():
+            self._load()
+    
+    def _load(self):
+        """Read the index and metadata written so far"""
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                self.dim = json.load(f)["dim"]
+        if self.dim and os.path.exists(self.vectors_path):
+            # Drop a partial row left by an interrupted write
+            row_bytes = 4 * self.dim
+            size = os.path.getsize(self.vectors_path)
+            self._rows = size // row_bytes
+            if size % row_bytes:
+                with open(self.vectors_path, "r+b") as f:
+                    f.truncate(self._rows * row_bytes)
+        self._read_index()
+    
+    def _read_index(self):
+        """Add index entries appended since the last read"""
+        if not self._rows or not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, "rb") as f:
+            f.seek(self._index_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Partial line still being written
+                self._index_offset += len(line)
+                parts = line.decode("utf-8").rstrip("\n").split("\t")
+                if len(parts) == 2 and int(parts[1]) < self._rows:
+                    self._index[parts[0]] = int(parts[1])
+    
+    def _catch_up(self):
+        """Pick up rows other processes appended (caller holds the lock)"""
+        if self.dim is None and os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                self.dim = json.load(f)["dim"]
+        if self.dim and os.path.exists(self.vectors_path):
+            rows = os.path.getsize(self.vectors_path) // (4 * self.dim)
+            if rows != self._rows:
+                self._rows = rows
+                self._read_index()
+    
+    def _matrix(self) -> np.ndarray:
+        """Memory map covering every row written so far"""
+        if self._memmap is None or self._memmap.shape[0] != self._rows:
+            self._memmap = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(self._rows, self.dim))
+        return self._memmap
+    
+    def __len__(self) -> int:
+        return len(self._index)
+    
+    def get_many(self, chunk_hashes: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Look up stored embeddings
+        
+        Args:
+            chunk_hashes: Chunk text fingerprints
+            
+        Returns:
+            Mapping of chunk hash to embedding for every hash found
+        """
+        with self._lock:
+            if any(h not in self._index for h in chunk_hashes):
+                self._catch_up()
+            found = [(h, self._index[h]) for h in chunk_hashes if h in self._index]
+            if not found:
+                return {}
+            matrix = self._matrix()
+            rows = np.array(matrix[[row for _, row in found]])
+        return {h: rows[i] for i, (h, _) in enumerate(found)}
+    
+    def put_many(self, chunk_hashes: List[str], embeddings: np.ndarray):
+        """
+        Append embeddings for hashes not stored yet
+        
+        Args:
+            chunk_hashes: Chunk text fingerprints
+            embeddings: Matrix with one row per hash
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        with self._lock, self._file_lock.exclusive():
+            self._catch_up()
+            if self.dim is None:
+                self.dim = embeddings.shape[1]
+                with open(self.meta_path, "w") as f:
+                    json.dump({"model_name": self.model_name, "dim": self.dim}, f)
+            
+            new_rows = {}
+            for chunk_hash, vector in zip(chunk_hashes, embeddings):
+                if chunk_hash not in self._index and chunk_hash not in new_rows:
+                    new_rows[chunk_hash] = vector
+            new_hashes = list(new_rows)
+            if not new_rows:
+                return
+            
+            # Vectors first, then the index, so an index entry never points past the data
+            with open(self.vectors_path, "ab") as f:
+                f.write(np.stack(list(new_rows.values())).tobytes())
+            with open(self.index_path, "ab") as f:
+                f.write("".join(f"{h}\t{self._rows + i}\n" for i, h in enumerate(new_hashes)).encode("utf-8"))
+                self._index_offset = f.tell()
+            
+            for i, chunk_hash in enumerate(new_hashes):
+                self._index[chunk_hash] = self._rows + i
+            self._rows += len(new_rows)
+    
+    def stats(self) -> Dict:
+        """Size of the store"""
+        with self._lock:
+            return {
+                "model_name": self.model_name,
+                "entries": len(self._index),
+                "dim": self.dim,
+                "bytes": os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+            }
@@ -0,0 +1,297 @@
+"""
+Background ingestion pipeline: extract, chunk, embed and store uploads
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .chunker import DocumentChunker
+from utils.hashing import hash_text
+from utils.jobs import JobManager
+from utils.metrics import metrics
+from utils.pdf_reader import PDFReader
+from utils.doc_reader import BLOCK_SEPARATOR, DOCXReader
+
+# Workers get the path of the upload and open it themselves, so the
+# file's bytes are never pickled into a task or held by the job thread
+
+def _extract_docx_blocks(path: str) -> List[Tuple[str, Dict]]:
+    """Extract DOCX paragraphs, headings and tables in a worker process"""
+    return list(DOCXReader.iter_blocks(path))
+
+def _pdf_page_count(path: str) -> int:
+    """Count PDF pages in a worker process"""
+    return PDFReader.page_count(path)
+
+def _extract_pdf_pages(path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """Extract one page range of a PDF in a worker process"""
+    return list(PDFReader.iter_pages(path, start, end))
+
+class IngestionPipeline:
+    """Runs document ingestion on bounded worker pools"""
+    
+    STAGES = ["extract", "chunk", "embed", "store"]
+    
+    def __init__(
+        self,
+        chunker: DocumentChunker,
+        embedder,
+        vector_store,
+        jobs: JobManager,
+        max_jobs: Optional[int] = None,
+        process_workers: Optional[int] = None,
+        embed_batch_size: Optional[int] = None,
+        pdf_pages_per_task: Optional[int] = None
+    ):
+        """
+        Initialize ingestion pipeline
+        
+        Extraction runs in a process pool so it never holds the API
+        process's GIL. PDFs are split into page ranges that the workers
+        extract in parallel; pages are fed to the chunker in order as their
+        range finishes, so chunking overlaps extraction. DOCX files are read
+        as paragraphs, headings and tables, and chunked per section.
+        Embedding uses the shared in-process model in small batches (PyTorch
+        releases the GIL), so /query embeddings interleave with ingestion
+        instead of waiting for a whole document.
+        
+        Args:
+            chunker: DocumentChunker whose settings the workers use
+            embedder: Embedder instance
+            vector_store: VectorStore instance
+            jobs: JobManager that records progress
+            max_jobs: Documents ingested in parallel (defaults to INGEST_MAX_JOBS or 2)
+            process_workers: Extraction processes (defaults to INGEST_PROCESS_WORKERS or 2)
+            embed_batch_size: Chunks per embedding batch (defaults to INGEST_EMBED_BATCH_SIZE or 32)
+            pdf_pages_per_task: PDF pages per extraction task (defaults to INGEST_PDF_PAGES_PER_TASK or 16)
+        """
+        self.chunker = chunker
+        self.embedder = embedder
+        self.vector_store = vector_store
+        self.jobs = jobs
+        self.max_jobs = max_jobs or int(os.getenv("INGEST_MAX_JOBS", "2"))
+        self.process_workers = process_workers or int(os.getenv("INGEST_PROCESS_WORKERS", "2"))
+        self.embed_batch_size = embed_batch_size or int(os.getenv("INGEST_EMBED_BATCH_SIZE", "32"))
+        self.pdf_pages_per_task = pdf_pages_per_task or int(os.getenv("INGEST_PDF_PAGES_PER_TASK", "16"))
+        
+        self._job_pool = ThreadPoolExecutor(max_workers=self.max_jobs, thread_name_prefix="ingest")
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        # Jobs revising the same document diff and store one at a time
+        self._doc_locks: "weakref.WeakValueDictionary[str, threading.Lock]" = weakref.WeakValueDictionary()
+        self._doc_locks_guard = threading.Lock()
+    
+    @property
+    def process_pool(self) -> ProcessPoolExecutor:
+        """Extraction process pool, started on first use"""
+        if self._process_pool is None:
+            # Spawn (not fork) so workers never inherit the model or server threads
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=self.process_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._process_pool
+    
+    def submit(
+        self,
+        source: BinaryIO,
+        file_ext: str,
+        filename: str,
+        doc_id: str,
+        content_hash: str,
+        on_complete: Callable[[Dict], None]
+    ) -> str:
+        """
+        Queue an uploaded file for ingestion
+        
+        If doc_id already has chunks stored (a revised upload), only chunks
+        whose text changed are embedded and inserted.
+        
+        Args:
+            source: Buffer holding the uploaded file (the job takes ownership and closes it)
+            file_ext: "pdf" or "docx"
+            filename: Original filename
+            doc_id: Document identifier to store chunks under
+            content_hash: Fingerprint of the uploaded file
+            on_complete: Called with the job result once the chunks are stored
+            
+        Returns:
+            Job identifier
+        """
+        job_id = self.jobs.create(self.STAGES, doc_id=doc_id, filename=filename, content_hash=content_hash)
+        try:
+            self._job_pool.submit(
+                self._run, job_id, source, file_ext, filename, doc_id, content_hash, on_complete
+            )
+        except Exception:
+            source.close()
+            raise
+        return job_id
+    
+    @staticmethod
+    def chunk_ids(doc_id: str, chunk_hashes: List[str]) -> List[str]:
+        """
+        Content-derived chunk identifiers
+        
+        Unchanged text keeps its id across revisions of a document; repeated
+        text within one document gets an occurrence suffix.
+        """
+        seen: Dict[str, int] = {}
+        ids = []
+        for chunk_hash in chunk_hashes:
+            occurrence = seen.get(chunk_hash, 0)
+            seen[chunk_hash] = occurrence + 1
+            chunk_id = f"{doc_id}_{chunk_hash[:16]}"
+            ids.append(chunk_id if occurrence == 0 else f"{chunk_id}_{occurrence}")
+        return ids
+    
+    def _pdf_segments(self, job_id: str, path: str) -> Iterator[Tuple[str, Dict]]:
+        """
+        Page texts of a PDF in page order, extracted range by range
+        
+        At most one more range than there are worker processes is queued
+        at a time, so a long PDF neither holds all of its text in flight nor
+        blocks other jobs' extraction until it is done. Tasks carry only the
+        file's path; each worker reads the pages it needs from disk.
+        """
+        page_count = self.process_pool.submit(_pdf_page_count, path).result()
+        ranges = [
+            (start, min(start + self.pdf_pages_per_task, page_count))
+            for start in range(0, page_count, self.pdf_pages_per_task)
+        ]
+        pending = deque()
+        submitted = 0
+        try:
+            while submitted < len(ranges) or pending:
+                while submitted < len(ranges) and len(pending) <= self.process_workers:
+                    pending.append(self.process_pool.submit(_extract_pdf_pages, path, *ranges[submitted]))
+                    submitted += 1
+                for page, text in pending.popleft().result():
+                    yield text, {"page": page}
+                done = submitted - len(pending)
+                self.jobs.update_stage(job_id, "extract", progress=ranges[done - 1][1] / page_count)
+        finally:
+            for future in pending:
+                future.cancel()
+    
+    def _run(
+        self,
+        job_id: str,
+        source: BinaryIO,
+        file_ext: str,
+        filename: str,
+        doc_id: str,
+        content_hash: str,
+        on_complete: Callable[[Dict], None]
+    ):
+        """Run every stage of one job"""
+        start = time.perf_counter()
+        path = None
+        try:
+            self.jobs.update_stage(job_id, "extract", progress=0.0)
+            # Queued uploads wait in their spooled buffers; a running job
+            # copies its upload to a file the extraction workers can open
+            with source, tempfile.NamedTemporaryFile(suffix=f".{file_ext}", delete=False) as spooled:
+                path = spooled.name
+                source.seek(0)
+                shutil.copyfileobj(source, spooled)
+            
+            self.jobs.update_stage(job_id, "chunk")
+            # Extraction and chunking overlap, so they are timed together
+            with metrics.stage("ingest_extract_chunk", file_type=file_ext):
+                if file_ext == "pdf":
+                    chunks = list(self.chunker.chunk_segments(self._pdf_segments(job_id, path)))
+                else:
+                    # Chunks end at section boundaries and carry their section path
+                    blocks = self.process_pool.submit(_extract_docx_blocks, path).result()
+                    chunks = list(self.chunker.chunk_segments(blocks, separator=BLOCK_SEPARATOR, split_on="section"))
+            if not chunks:
+                raise ValueError("Could not extract text from document")
+            self.jobs.update_stage(job_id, "extract", "completed")
+            self.jobs.update_stage(job_id, "chunk", "completed")
+            
+            self.jobs.update_stage(job_id, "embed", progress=0.0)
+            texts = [chunk["text"] for chunk in chunks]
+            chunk_hashes = [hash_text(text) for text in texts]
+            ids = self.chunk_ids(doc_id, chunk_hashes)
+            
+            # The stored chunks diffed against must not change before the
+            # new ones are stored
+            with self._doc_lock(doc_id):
+                # Only chunks not already stored for this document need vectors;
+                # identical text stored under any document is reused as is
+                stored_ids = set(self.vector_store.get_document_chunk_ids(doc_id))
+                new_positions = [i for i, chunk_id in enumerate(ids) if chunk_id not in stored_ids]
+                reusable = self.vector_store.get_embeddings_by_hash([chunk_hashes[i] for i in new_positions])
+                to_embed = [i for i in new_positions if chunk_hashes[i] not in reusable]
+                
+                new_embeddings = {
+                    ids[i]: reusable[chunk_hashes[i]] for i in new_positions if chunk_hashes[i] in reusable
+                }
+                with metrics.stage("ingest_embed"):
+                    for begin in range(0, len(to_embed), self.embed_batch_size):
+                        batch = to_embed[begin:begin + self.embed_batch_size]
+                        vectors = self.embedder.embed_batch([texts[i] for i in batch])
+                        new_embeddings.update({ids[i]: vector for i, vector in zip(batch, vectors)})
+                        self.jobs.update_stage(job_id, "embed", progress=(begin + len(batch)) / len(to_embed))
+                self.jobs.update_stage(job_id, "embed", "completed")
+                
+                self.jobs.update_stage(job_id, "store")
+                with metrics.stage("ingest_store"):
+                    changes = self.vector_store.sync_document(
+                        doc_id=doc_id,
+                        ids=ids,
+                        chunks=texts,
+                        metadata=[
+                            {**chunk["metadata"], "filename": filename, "chunk_hash": chunk_hash}
+                            for chunk, chunk_hash in zip(chunks, chunk_hashes)
+                        ],
+                        new_embeddings=new_embeddings
+                    )
+                self.jobs.update_stage(job_id, "store", "completed")
+            
+            result = {
+                "doc_id": doc_id,
+                "filename": filename,
+                "content_hash": content_hash,
+                "chunk_count": len(chunks),
+                "embedded": len(to_embed),
+                "reused": len(new_positions) - len(to_embed),
+                "unchanged": changes["updated"],
+                "removed": changes["removed"]
+            }
+            on_complete(result)
+            self.jobs.complete(job_id, result)
+            metrics.observe_stage("ingest_total", time.perf_counter() - start, file_type=file_ext)
+            for source_kind in ("embedded", "reused", "unchanged"):
+                metrics.inc("clarifyai_ingested_chunks_total", result[source_kind], source=source_kind)
+        except Exception as e:
+            print(f"Ingestion job {job_id} failed: {e}")
+            self.jobs.fail(job_id, str(e))
+        finally:
+            source.close()
+            if path:
+                os.remove(path)
+    
+    def _doc_lock(self, doc_id: str) -> threading.Lock:
+        """Lock serializing the jobs of one document (dropped once unused)"""
+        with self._doc_locks_guard:
+            lock = self._doc_locks.get(doc_id)
+            if lock is None:
+                lock = self._doc_locks[doc_id] = threading.Lock()
+            return lock
+    
+    def shutdown(self):
+        """Stop accepting jobs and release worker pools"""
+        self._job_pool.shutdown(wait=False, cancel_futures=True)
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+
+
+
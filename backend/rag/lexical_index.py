@@ -0,0 +1,422 @@
+"""
+Persistent BM25 inverted index over chunk text
+"""
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Words, plus codes such as "HR-104", "form_7b" or "3.2.1" kept whole
+_TOKEN_PATTERN = re.compile(r"[^\W_]+(?:[-_./][^\W_]+)*")
+_CODE_SEPARATORS = re.compile(r"[-_./]")
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how i if in into is it its "
+    "me my no not of on or our so such that the their then there these they this to was we "
+    "were what when where which who will with you your".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased index terms of a text
+    
+    Codes are indexed both whole and by their parts, so "HR-104" matches
+    queries for "hr-104" as well as "HR 104".
+    """
+    terms = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        if _CODE_SEPARATORS.search(token):
+            terms.append(token)
+            terms.extend(part for part in _CODE_SEPARATORS.split(token) if part not in STOPWORDS)
+        elif token not in STOPWORDS:
+            terms.append(token)
+    return terms
+
+class LexicalIndex:
+    """BM25 index kept next to the vector collection"""
+    
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        k1: float = 1.2,
+        b: float = 0.75,
+        compact_after: int = 200,
+        max_postings: Optional[int] = 4096
+    ):
+        """
+        Initialize lexical index
+        
+        Postings live in two tiers: an immutable CSR snapshot loaded from
+        disk (numpy arrays, no per-posting Python objects) and a small
+        in-memory delta for chunks added since. Every change is appended to
+        a journal; the journal is folded into a new snapshot after
+        compact_after operations or once a quarter of the slots are deleted.
+        Compaction also precomputes each posting's BM25 tf weight and sorts
+        every posting list strongest first.
+        
+        Args:
+            directory: Where snapshot.npz and journal.jsonl are kept (None keeps it in memory)
+            k1: BM25 term frequency saturation
+            b: BM25 length normalization
+            compact_after: Journal operations before the snapshot is rewritten
+            max_postings: Postings scored per query term (None scores all)
+        """
+        self.directory = directory
+        self.k1 = k1
+        self.b = b
+        self.compact_after = compact_after
+        self.max_postings = max_postings
+        self._lock = threading.RLock()
+        self._reset()
+        
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.snapshot_path = os.path.join(directory, "snapshot.npz")
+            self.journal_path = os.path.join(directory, "journal.jsonl")
+            self._load()
+    
+    def _reset(self):
+        """Empty every structure"""
+        # Slots: one per added chunk, never reused until compaction
+        self._chunk_ids: List[str] = []
+        self._chunk_docs: List[str] = []
+        self._lengths = np.zeros(0, dtype=np.float32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._slots: Dict[str, int] = {}
+        self._doc_slots: Dict[str, List[int]] = {}
+        self._total_length = 0.0
+        
+        # Snapshot tier (CSR) and delta tier
+        self._vocab: Dict[str, int] = {}
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._post_slots = np.zeros(0, dtype=np.int32)
+        self._post_tfs = np.zeros(0, dtype=np.float32)
+        self._post_weights = np.zeros(0, dtype=np.float32)
+        self._delta: Dict[str, Tuple[List[int], List[float]]] = {}
+        self._delta_arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._journal_ops = 0
+    
+    def __len__(self) -> int:
+        return len(self._slots)
+    
+    # Mutation
+    
+    def _grow(self, extra: int):
+        """Make room for extra slots in the per-slot arrays"""
+        needed = len(self._chunk_ids) + extra
+        if needed > len(self._lengths):
+            capacity = max(needed, 2 * len(self._lengths), 1024)
+            self._lengths = np.resize(self._lengths, capacity)
+            alive = np.zeros(capacity, dtype=bool)
+            alive[:len(self._alive)] = self._alive
+            self._alive = alive
+    
+    def _apply_add(self, chunk_ids: List[str], doc_ids: List[str], term_counts: List[Dict[str, int]]):
+        """Add chunks (replacing any with the same id) without journaling"""
+        self._apply_remove([chunk_id for chunk_id in chunk_ids if chunk_id in self._slots])
+        self._grow(len(chunk_ids))
+        for chunk_id, doc_id, counts in zip(chunk_ids, doc_ids, term_counts):
+            slot = len(self._chunk_ids)
+            self._chunk_ids.append(chunk_id)
+            self._chunk_docs.append(doc_id)
+            length = float(sum(counts.values()))
+            self._lengths[slot] = length
+            self._alive[slot] = True
+            self._total_length += length
+            self._slots[chunk_id] = slot
+            self._doc_slots.setdefault(doc_id, []).append(slot)
+            for term, count in counts.items():
+                slots, tfs = self._delta.setdefault(term, ([], []))
+                slots.append(slot)
+                tfs.append(float(count))
+                self._delta_arrays.pop(term, None)
+    
+    def _apply_remove(self, chunk_ids: Iterable[str]):
+        """Tombstone chunks without journaling"""
+        for chunk_id in chunk_ids:
+            slot = self._slots.pop(chunk_id, None)
+            if slot is None:
+                continue
+            self._alive[slot] = False
+            self._total_length -= float(self._lengths[slot])
+            doc_slots = self._doc_slots.get(self._chunk_docs[slot])
+            if doc_slots is not None:
+                doc_slots.remove(slot)
+                if not doc_slots:
+                    del self._doc_slots[self._chunk_docs[slot]]
+    
+    def _journal(self, entry: Dict):
+        """Record an operation and compact when the journal gets long"""
+        if not self.directory:
+            return
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+        self._journal_ops += 1
+        dead = len(self._chunk_ids) - len(self._slots)
+        if self._journal_ops >= self.compact_after or dead > max(1000, len(self._chunk_ids) // 4):
+            self.compact()
+    
+    def add(self, chunk_ids: List[str], doc_ids: List[str], texts: List[str]):
+        """
+        Index chunks
+        
+        Args:
+            chunk_ids: Chunk identifiers (existing ones are replaced)
+            doc_ids: Owning document of each chunk
+            texts: Chunk texts
+        """
+        if not chunk_ids:
+            return
+        term_counts = [dict(Counter(tokenize(text))) for text in texts]
+        with self._lock:
+            self._apply_add(chunk_ids, doc_ids, term_counts)
+            self._journal({"op": "add", "ids": chunk_ids, "docs": doc_ids, "terms": term_counts})
+    
+    def remove(self, chunk_ids: List[str]):
+        """
+        Drop chunks from the index
+        
+        Args:
+            chunk_ids: Chunk identifiers (unknown ones are ignored)
+        """
+        with self._lock:
+            chunk_ids = [chunk_id for chunk_id in chunk_ids if chunk_id in self._slots]
+            if chunk_ids:
+                self._apply_remove(chunk_ids)
+                self._journal({"op": "remove", "ids": chunk_ids})
+    
+    def remove_document(self, doc_id: str):
+        """
+        Drop every chunk of a document
+        
+        Args:
+            doc_id: Document identifier
+        """
+        with self._lock:
+            self.remove([self._chunk_ids[slot] for slot in self._doc_slots.get(doc_id, [])])
+    
+    def clear(self):
+        """Drop every chunk and the files on disk"""
+        with self._lock:
+            self._reset()
+            if self.directory:
+                for path in (self.snapshot_path, self.journal_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+    
+    # Search
+    
+    def _saturate(self, tfs: np.ndarray, lengths: np.ndarray, average_length: float) -> np.ndarray:
+        """BM25 term-frequency component"""
+        return tfs * (self.k1 + 1) / (tfs + self.k1 * (1 - self.b + self.b * lengths / average_length))
+    
+    def _term_weights(self, term: str, average_length: float, limit: Optional[int]) -> Tuple[np.ndarray, np.ndarray, int]:
+        """Slots and tf weights of a term across both tiers, plus its document frequency"""
+        slots, weights, df = [], [], 0
+        row = self._vocab.get(term)
+        if row is not None:
+            start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+            df += end - start
+            # Snapshot postings are sorted by weight, so a cut keeps the strongest
+            if limit is not None:
+                end = min(end, start + limit)
+            slots.append(self._post_slots[start:end])
+            weights.append(self._post_weights[start:end])
+        
+        if term in self._delta:
+            delta = self._delta_arrays.get(term)
+            if delta is None:
+                delta_slots, delta_tfs = self._delta[term]
+                delta = (np.array(delta_slots, dtype=np.int32), np.array(delta_tfs, dtype=np.float32))
+                self._delta_arrays[term] = delta
+            df += len(delta[0])
+            slots.append(delta[0])
+            weights.append(self._saturate(delta[1], self._lengths[delta[0]], average_length))
+        
+        if len(slots) == 1:
+            return slots[0], weights[0], df
+        if not slots:
+            return self._post_slots[:0], self._post_weights[:0], 0
+        return np.concatenate(slots), np.concatenate(weights), df
+    
+    def search(self, query: str, top_k: int = 20, doc_id: Optional[str] = None) -> List[Tuple[str, float]]:
+        """
+        Rank chunks against a query with BM25
+        
+        Only the max_postings strongest postings of each term are scored
+        (all of them when filtering by document); for terms common enough
+        to hit that cap the skipped chunks contribute almost nothing.
+        
+        Args:
+            query: Query text
+            top_k: Number of results to return
+            doc_id: Optional document ID to filter by
+        
+        Returns:
+            List of (chunk id, score) pairs, best first
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            live = len(self._slots)
+            if not terms or not live:
+                return []
+            
+            slot_count = len(self._chunk_ids)
+            average_length = self._total_length / live
+            limit = None if doc_id is not None else self.max_postings
+            scores = np.zeros(slot_count, dtype=np.float32)
+            
+            for term in terms:
+                slots, weights, df = self._term_weights(term, average_length, limit)
+                if not df:
+                    continue
+                # Tombstoned postings still count towards df until compaction
+                df = min(df, live)
+                idf = math.log(1 + (live - df + 0.5) / (df + 0.5))
+                scores[slots] += idf * weights
+            
+            if doc_id is not None:
+                candidates = np.array(self._doc_slots.get(doc_id, []), dtype=np.int64)
+            else:
+                candidates = np.flatnonzero(scores)
+                candidates = candidates[self._alive[candidates]]
+            candidates = candidates[scores[candidates] > 0]
+            if len(candidates) > top_k:
+                best = np.argpartition(-scores[candidates], top_k - 1)[:top_k]
+                candidates = candidates[best]
+            ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+            return [(self._chunk_ids[slot], float(scores[slot])) for slot in ranked]
+    
+    # Persistence
+    
+    @staticmethod
+    def _pack(strings: List[str]) -> np.ndarray:
+        return np.frombuffer("\n".join(strings).encode("utf-8"), dtype=np.uint8)
+    
+    @staticmethod
+    def _unpack(packed: np.ndarray, count: int) -> List[str]:
+        return packed.tobytes().decode("utf-8").split("\n") if count else []
+    
+    def compact(self):
+        """Fold the delta and tombstones into a new snapshot and empty the journal"""
+        with self._lock:
+            slot_count = len(self._chunk_ids)
+            alive = self._alive[:slot_count]
+            remap = np.cumsum(alive, dtype=np.int64) - 1
+            
+            # Every posting as (term row, slot, tf), snapshot tier first
+            terms = list(self._vocab)
+            term_rows = [np.repeat(np.arange(len(terms), dtype=np.int64), np.diff(self._offsets))]
+            slots = [self._post_slots]
+            tfs = [self._post_tfs]
+            for term, (delta_slots, delta_tfs) in self._delta.items():
+                row = self._vocab.get(term)
+                if row is None:
+                    row = len(terms)
+                    terms.append(term)
+                term_rows.append(np.full(len(delta_slots), row, dtype=np.int64))
+                slots.append(np.array(delta_slots, dtype=np.int32))
+                tfs.append(np.array(delta_tfs, dtype=np.float32))
+            term_rows = np.concatenate(term_rows)
+            slots = np.concatenate(slots)
+            tfs = np.concatenate(tfs)
+            
+            keep = alive[slots]
+            term_rows, slots, tfs = term_rows[keep], remap[slots[keep]].astype(np.int32), tfs[keep]
+            kept_slots = np.flatnonzero(alive)
+            lengths = self._lengths[kept_slots].astype(np.float32)
+            
+            # Within each term, strongest postings first
+            average_length = float(lengths.mean()) if len(lengths) else 1.0
+            weights = self._saturate(tfs, lengths[slots], average_length).astype(np.float32)
+            order = np.lexsort((-weights, term_rows))
+            term_rows, slots, tfs, weights = term_rows[order], slots[order], tfs[order], weights[order]
+            
+            counts = np.bincount(term_rows, minlength=len(terms))
+            used = np.flatnonzero(counts)
+            offsets = np.concatenate([[0], np.cumsum(counts[used])]).astype(np.int64)
+            
+            chunk_ids = [self._chunk_ids[slot] for slot in kept_slots]
+            chunk_docs = [self._chunk_docs[slot] for slot in kept_slots]
+            vocab = [terms[row] for row in used]
+            
+            self._reset()
+            self._chunk_ids = chunk_ids
+            self._chunk_docs = chunk_docs
+            self._lengths = lengths
+            self._alive = np.ones(len(chunk_ids), dtype=bool)
+            self._slots = {chunk_id: slot for slot, chunk_id in enumerate(chunk_ids)}
+            for slot, doc_id in enumerate(chunk_docs):
+                self._doc_slots.setdefault(doc_id, []).append(slot)
+            self._total_length = float(lengths.sum())
+            self._vocab = {term: row for row, term in enumerate(vocab)}
+            self._offsets = offsets
+            self._post_slots = slots
+            self._post_tfs = tfs
+            self._post_weights = weights
+            
+            if self.directory:
+                temp_path = self.snapshot_path + ".tmp.npz"
+                np.savez(
+                    temp_path,
+                    chunk_ids=self._pack(chunk_ids),
+                    chunk_docs=self._pack(chunk_docs),
+                    vocab=self._pack(vocab),
+                    counts=np.array([len(chunk_ids), len(vocab)]),
+                    lengths=self._lengths,
+                    offsets=offsets,
+                    post_slots=slots,
+                    post_tfs=tfs,
+                    post_weights=weights
+                )
+                os.replace(temp_path, self.snapshot_path)
+                # Replaying a journal already in the snapshot is harmless (adds replace)
+                open(self.journal_path, "w").close()
+    
+    def _load(self):
+        """Read the snapshot and replay the journal"""
+        if os.path.exists(self.snapshot_path):
+            with np.load(self.snapshot_path) as data:
+                chunk_count, vocab_count = (int(n) for n in data["counts"])
+                self._chunk_ids = self._unpack(data["chunk_ids"], chunk_count)
+                self._chunk_docs = self._unpack(data["chunk_docs"], chunk_count)
+                self._lengths = data["lengths"]
+                self._alive = np.ones(chunk_count, dtype=bool)
+                self._vocab = {term: row for row, term in enumerate(self._unpack(data["vocab"], vocab_count))}
+                self._offsets = data["offsets"]
+                self._post_slots = data["post_slots"]
+                self._post_tfs = data["post_tfs"]
+                self._post_weights = data["post_weights"]
+            self._slots = {chunk_id: slot for slot, chunk_id in enumerate(self._chunk_ids)}
+            for slot, doc_id in enumerate(self._chunk_docs):
+                self._doc_slots.setdefault(doc_id, []).append(slot)
+            self._total_length = float(self._lengths.sum())
+        
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn last line from an interrupted write
+                        break
+                    if entry["op"] == "add":
+                        self._apply_add(entry["ids"], entry["docs"], entry["terms"])
+                    else:
+                        self._apply_remove(entry["ids"])
+                    self._journal_ops += 1
+    
+    def stats(self) -> Dict:
+        """Size of the index"""
+        with self._lock:
+            return {
+                "chunks": len(self._slots),
+                "slots": len(self._chunk_ids),
+                "terms": len(set(self._vocab) | set(self._delta)),
+                "postings": int(len(self._post_slots) + sum(len(s) for s, _ in self._delta.values())),
+                "journal_ops": self._journal_ops
+            }
@@ -0,0 +1,133 @@
+"""
+Process-wide registry of loaded Sentence Transformer models
+"""
+import gc
+import importlib.util
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Union
+import sentence_transformers
+from sentence_transformers import CrossEncoder, SentenceTransformer
+
+# Embedding runtimes: fp32 PyTorch, PyTorch with int8 dynamic quantization
+# of the Linear layers, and ONNX Runtime (fp32 or a pre-quantized int8 export)
+EMBEDDING_BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+# Quantized export shipped in the sentence-transformers model repositories
+DEFAULT_ONNX_INT8_FILE = "onnx/model_qint8_avx2.onnx"
+
+# SentenceTransformer(backend="onnx") first shipped in this release
+ONNX_MIN_SENTENCE_TRANSFORMERS = (3, 2)
+
+_models: Dict[str, Union[SentenceTransformer, CrossEncoder]] = {}
+_lock = threading.Lock()
+
+def _check_onnx_support():
+    """Raise ImportError naming what to install if the ONNX backends cannot load"""
+    version = tuple(int(part) for part in re.findall(r"\d+", sentence_transformers.__version__)[:2])
+    if version < ONNX_MIN_SENTENCE_TRANSFORMERS:
+        raise ImportError(
+            "ONNX embedding backends need sentence-transformers>=3.2.0, "
+            f"found {sentence_transformers.__version__}; upgrade it or set EMBEDDING_BACKEND=torch"
+        )
+    missing = [name for name in ("optimum", "onnxruntime") if importlib.util.find_spec(name) is None]
+    if missing:
+        raise ImportError(
+            f"ONNX embedding backends need {' and '.join(missing)}; "
+            'pip install "sentence-transformers[onnx]>=3.2.0" or set EMBEDDING_BACKEND=torch'
+        )
+
+def _load_sentence_transformer(model_name: str, backend: str, threads: Optional[int]) -> SentenceTransformer:
+    """Load a model on the requested runtime"""
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {backend}")
+    
+    if backend.startswith("onnx"):
+        _check_onnx_support()
+        model_kwargs = {"provider": "CPUExecutionProvider"}
+        file_name = os.getenv("EMBEDDING_ONNX_FILE") or (DEFAULT_ONNX_INT8_FILE if backend == "onnx-int8" else None)
+        if file_name:
+            model_kwargs["file_name"] = file_name
+        if threads:
+            import onnxruntime
+            session_options = onnxruntime.SessionOptions()
+            session_options.intra_op_num_threads = threads
+            model_kwargs["session_options"] = session_options
+        return SentenceTransformer(model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+    
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+    if backend == "torch":
+        return SentenceTransformer(model_name)
+    
+    import torch
+    model = SentenceTransformer(model_name, device="cpu")
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+def get_sentence_transformer(
+    model_name: str,
+    backend: str = "torch",
+    threads: Optional[int] = None
+) -> SentenceTransformer:
+    """
+    Get a model, loading it on first use
+    
+    Every caller in the process receives the same instance, so the weights
+    are held in memory once no matter how many components need them.
+    
+    Args:
+        model_name: Name of the Sentence Transformer model
+        backend: One of EMBEDDING_BACKENDS
+        threads: Intra-op threads for the runtime (None keeps its default)
+        
+    Returns:
+        Shared SentenceTransformer instance
+    """
+    key = model_name if backend == "torch" else f"{model_name}@{backend}"
+    with _lock:
+        model = _models.get(key)
+        if model is None:
+            print(f"Loading embedding model: {model_name} ({backend})")
+            model = _load_sentence_transformer(model_name, backend, threads)
+            _models[key] = model
+            print("Embedding model loaded successfully")
+        return model
+
+def get_cross_encoder(model_name: str) -> CrossEncoder:
+    """
+    Get a cross-encoder (query/passage scorer), loading it on first use
+    
+    Args:
+        model_name: Name of the cross-encoder model
+        
+    Returns:
+        Shared CrossEncoder instance
+    """
+    key = f"cross-encoder:{model_name}"
+    with _lock:
+        model = _models.get(key)
+        if model is None:
+            print(f"Loading reranking model: {model_name}")
+            model = CrossEncoder(model_name, device="cpu")
+            _models[key] = model
+            print("Reranking model loaded successfully")
+        return model
+
+def loaded_models() -> List[str]:
+    """Names of the models loaded in this process"""
+    with _lock:
+        return list(_models)
+
+def freeze_for_fork():
+    """
+    Prepare loaded models to be shared with forked worker processes
+    
+    Call after the models are loaded and before forking (e.g. when the app
+    is imported by gunicorn --preload). Moving the objects into the
+    permanent GC generation stops the collector from touching them in the
+    children, so their memory pages stay shared copy-on-write.
+    """
+    gc.collect()
+    gc.freeze()
@@ -0,0 +1,429 @@
+"""
+In-process vector backend: a memory-mapped numpy matrix plus a SQLite record table
+
+NumpyClient and NumpyCollection implement the part of the ChromaDB client
+and collection API that VectorStore uses (get_or_create_collection,
+delete_collection; add, get, query, update, delete, count), so either
+engine can sit behind VectorStore.
+"""
+import json
+import os
+import shutil
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+# Rows scored per matrix product; int8 blocks are converted to float32 and
+# stay cache-sized at this height
+_BLOCK_ROWS = 4096
+
+# Metadata keys kept in their own indexed columns
+_INDEXED_KEYS = ("doc_id", "chunk_hash")
+
+class NumpyCollection:
+    """Cosine-similarity collection stored as a row-per-chunk vector matrix"""
+    
+    def __init__(self, directory: str, dtype: str = "float32"):
+        """
+        Open or create a collection
+        
+        Vectors are L2-normalized on insert and appended to vectors.f32 (or,
+        for dtype "int8", to vectors.i8 with one float32 scale per row in
+        scales.f32), which is memory-mapped so the OS pages it in on demand. Texts and metadata live in SQLite,
+        with doc_id and chunk_hash indexed, so filtered lookups never scan
+        Python objects. Deleted rows are masked out and reclaimed by
+        compact(), which runs once they outnumber the live ones.
+        
+        Args:
+            directory: Collection directory
+            dtype: "float32" (exact) or "int8" (4x smaller, approximate scores)
+        """
+        if dtype not in ("float32", "int8"):
+            raise ValueError(f"Unsupported vector dtype: {dtype}")
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        
+        self.db = sqlite3.connect(os.path.join(directory, "records.sqlite3"), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS records (
+                row INTEGER PRIMARY KEY,
+                id TEXT UNIQUE NOT NULL,
+                doc_id TEXT,
+                chunk_hash TEXT,
+                document TEXT,
+                metadata TEXT
+            );
+            CREATE INDEX IF NOT EXISTS records_doc_id ON records (doc_id);
+            CREATE INDEX IF NOT EXISTS records_chunk_hash ON records (chunk_hash);
+        """)
+        settings = dict(self.db.execute("SELECT key, value FROM settings"))
+        # An existing collection keeps the dtype it was built with
+        self.dtype = settings.get("dtype", dtype)
+        self.dim = int(settings["dim"]) if "dim" in settings else None
+        self.n_rows = int(settings.get("n_rows", 0))
+        
+        self._path = os.path.join(directory, "vectors.i8" if self.dtype == "int8" else "vectors.f32")
+        self._scale_path = os.path.join(directory, "scales.f32")
+        self._matrix: Optional[np.memmap] = None
+        self._scales: Optional[np.memmap] = None
+        self._capacity = 0
+        self._alive = np.zeros(self.n_rows, dtype=bool)
+        rows = np.array([row for (row,) in self.db.execute("SELECT row FROM records")], dtype=np.int64)
+        self._alive[rows[rows < self.n_rows]] = True
+        if self.dim is not None:
+            self._map(self.n_rows)
+    
+    # Storage
+    
+    def _map(self, rows: int):
+        """Memory-map the vector file with room for at least rows rows"""
+        itemsize = np.dtype(self.dtype).itemsize
+        capacity = max(rows, 1024)
+        if os.path.exists(self._path):
+            capacity = max(capacity, os.path.getsize(self._path) // (self.dim * itemsize))
+        with open(self._path, "ab") as f:
+            f.truncate(capacity * self.dim * itemsize)
+        if self._matrix is not None:
+            self._matrix.flush()
+        self._matrix = np.memmap(self._path, dtype=self.dtype, mode="r+", shape=(capacity, self.dim))
+        if self.dtype == "int8":
+            with open(self._scale_path, "ab") as f:
+                f.truncate(capacity * 4)
+            if self._scales is not None:
+                self._scales.flush()
+            self._scales = np.memmap(self._scale_path, dtype=np.float32, mode="r+", shape=(capacity,))
+        self._capacity = capacity
+    
+    def _encode(self, embeddings) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Normalize (and quantize) embeddings for storage"""
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dim)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+        if self.dtype == "int8":
+            # Per-row scale: the largest component maps to 127
+            scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127
+            return np.rint(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+        return vectors, None
+    
+    def _write(self, rows, vectors: np.ndarray, scales: Optional[np.ndarray]):
+        self._matrix[rows] = vectors
+        self._matrix.flush()
+        if scales is not None:
+            self._scales[rows] = scales
+            self._scales.flush()
+    
+    def _decode(self, rows: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(self._matrix[rows], dtype=np.float32)
+        return vectors * self._scales[rows][:, None] if self.dtype == "int8" else vectors
+    
+    def _scores(self, rows: slice, queries: np.ndarray) -> np.ndarray:
+        """Cosine similarity of stored rows to normalized queries"""
+        scores = self._matrix[rows].astype(np.float32, copy=False) @ queries.T
+        if self.dtype == "int8":
+            scores *= self._scales[rows][:, None]
+        return scores
+    
+    def _save_settings(self):
+        self.db.executemany(
+            "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+            [("dtype", self.dtype), ("dim", str(self.dim)), ("n_rows", str(self.n_rows))]
+        )
+    
+    # Filtering
+    
+    @staticmethod
+    def _condition(key: str, value) -> Tuple[str, List]:
+        """SQL condition for one metadata filter term"""
+        column = key if key in _INDEXED_KEYS else f"json_extract(metadata, '$.{key}')"
+        if isinstance(value, dict):
+            operator, operand = next(iter(value.items()))
+            if operator == "$in":
+                return f"{column} IN ({','.join('?' * len(operand))})", list(operand)
+            if operator == "$nin":
+                return f"{column} NOT IN ({','.join('?' * len(operand))})", list(operand)
+            sql = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}.get(operator)
+            if sql is None:
+                raise ValueError(f"Unsupported filter operator: {operator}")
+            return f"{column} {sql} ?", [operand]
+        return f"{column} = ?", [value]
+    
+    def _where(self, ids: Optional[Sequence[str]], where: Optional[Dict]) -> Tuple[str, List]:
+        """SQL WHERE clause for an id list and a Chroma-style metadata filter"""
+        clauses, params = [], []
+        if ids is not None:
+            clauses.append(f"id IN ({','.join('?' * len(ids))})")
+            params.extend(ids)
+        terms = []
+        for key, value in (where or {}).items():
+            if key == "$and":
+                terms.extend(item for clause in value for item in clause.items())
+            else:
+                terms.append((key, value))
+        for key, value in terms:
+            clause, values = self._condition(key, value)
+            clauses.append(clause)
+            params.extend(values)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+    
+    # Collection API
+    
+    def count(self) -> int:
+        with self._lock:
+            return int(self._alive.sum())
+    
+    def add(self, ids: List[str], embeddings, documents: List[str], metadatas: Optional[List[Dict]] = None):
+        """Insert chunks; an id that already exists is replaced"""
+        if not ids:
+            return
+        metadatas = metadatas or [{} for _ in ids]
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(np.asarray(embeddings[0]).shape[-1])
+                self._map(len(ids))
+            vectors, scales = self._encode(embeddings)
+            
+            existing = self._rows_for(ids)
+            if existing:
+                self._delete_rows(existing)
+            
+            start = self.n_rows
+            end = start + len(ids)
+            if end > self._capacity:
+                self._map(max(end, self._capacity * 2))
+            self._write(slice(start, end), vectors, scales)
+            
+            self._alive = np.concatenate([self._alive, np.ones(len(ids), dtype=bool)])
+            self.n_rows = end
+            self.db.executemany(
+                "INSERT INTO records (row, id, doc_id, chunk_hash, document, metadata) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (start + i, chunk_id, meta.get("doc_id"), meta.get("chunk_hash"), document, json.dumps(meta))
+                    for i, (chunk_id, document, meta) in enumerate(zip(ids, documents, metadatas))
+                ]
+            )
+            self._save_settings()
+            self.db.commit()
+    
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict] = None,
+        include: Sequence[str] = ("documents", "metadatas"),
+        limit: Optional[int] = None,
+        offset: Optional[int] = None
+    ) -> Dict[str, Optional[List]]:
+        """Chunks matching ids and/or a metadata filter, in insertion order"""
+        clause, params = self._where(ids, where)
+        sql = f"SELECT row, id, document, metadata FROM records{clause} ORDER BY row"
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params += [-1 if limit is None else limit, offset or 0]
+        with self._lock:
+            records = self.db.execute(sql, params).fetchall()
+            rows = np.array([record[0] for record in records], dtype=np.int64)
+            embeddings = self._decode(rows) if "embeddings" in include and len(rows) else np.zeros((0, self.dim or 0))
+        return {
+            "ids": [record[1] for record in records],
+            "documents": [record[2] for record in records] if "documents" in include else None,
+            "metadatas": [json.loads(record[3]) for record in records] if "metadatas" in include else None,
+            "embeddings": embeddings if "embeddings" in include else None
+        }
+    
+    def query(
+        self,
+        query_embeddings,
+        n_results: int = 10,
+        where: Optional[Dict] = None,
+        include: Sequence[str] = ("documents", "metadatas", "distances")
+    ) -> Dict[str, List[List]]:
+        """Nearest chunks by cosine distance for each query embedding"""
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        with self._lock:
+            if self.dim is None or not self._alive.any():
+                for key in results:
+                    results[key] = [[] for _ in query_embeddings]
+                return results
+            
+            queries = np.asarray(query_embeddings, dtype=np.float32).reshape(-1, self.dim)
+            queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+            
+            if where:
+                clause, params = self._where(None, where)
+                rows = np.array(
+                    [row for (row,) in self.db.execute(f"SELECT row FROM records{clause}", params)],
+                    dtype=np.int64
+                )
+                rows.sort()
+                scores = self._scores(rows, queries) if len(rows) else np.zeros((0, len(queries)))
+            else:
+                rows = np.flatnonzero(self._alive)
+                scores = np.empty((self.n_rows, len(queries)), dtype=np.float32)
+                for begin in range(0, self.n_rows, _BLOCK_ROWS):
+                    end = min(begin + _BLOCK_ROWS, self.n_rows)
+                    scores[begin:end] = self._scores(slice(begin, end), queries)
+                scores = scores[rows]
+            
+            k = min(n_results, len(rows))
+            top: List[np.ndarray] = []
+            for column in scores.T:
+                best = np.argpartition(-column, k - 1)[:k] if 0 < k < len(column) else np.arange(k)
+                top.append(best[np.argsort(-column[best], kind="stable")])
+            
+            wanted = sorted({int(rows[i]) for best in top for i in best})
+            records = {}
+            for begin in range(0, len(wanted), 900):
+                batch = wanted[begin:begin + 900]
+                for row, chunk_id, document, metadata in self.db.execute(
+                    f"SELECT row, id, document, metadata FROM records WHERE row IN ({','.join('?' * len(batch))})",
+                    batch
+                ):
+                    records[row] = (chunk_id, document, metadata)
+        
+        for column, best in zip(scores.T, top):
+            hits = [(records[int(rows[i])], float(column[i])) for i in best]
+            results["ids"].append([record[0] for record, _ in hits])
+            results["documents"].append([record[1] for record, _ in hits])
+            results["metadatas"].append([json.loads(record[2]) for record, _ in hits])
+            results["distances"].append([1.0 - score for _, score in hits])
+        return results
+    
+    def update(
+        self,
+        ids: List[str],
+        metadatas: Optional[List[Dict]] = None,
+        documents: Optional[List[str]] = None,
+        embeddings=None
+    ):
+        """Replace the metadata, text or vector of existing chunks"""
+        with self._lock:
+            if metadatas is not None:
+                self.db.executemany(
+                    "UPDATE records SET doc_id = ?, chunk_hash = ?, metadata = ? WHERE id = ?",
+                    [(meta.get("doc_id"), meta.get("chunk_hash"), json.dumps(meta), chunk_id)
+                     for chunk_id, meta in zip(ids, metadatas)]
+                )
+            if documents is not None:
+                self.db.executemany(
+                    "UPDATE records SET document = ? WHERE id = ?",
+                    list(zip(documents, ids))
+                )
+            if embeddings is not None:
+                rows = dict(self._rows_with_ids(ids))
+                vectors, scales = self._encode(embeddings)
+                found = [i for i, chunk_id in enumerate(ids) if chunk_id in rows]
+                self._write(
+                    [rows[ids[i]] for i in found],
+                    vectors[found],
+                    scales[found] if scales is not None else None
+                )
+            self.db.commit()
+    
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None):
+        """Remove chunks by id and/or metadata filter"""
+        if ids is None and not where:
+            return
+        with self._lock:
+            clause, params = self._where(ids, where)
+            rows = [row for (row,) in self.db.execute(f"SELECT row FROM records{clause}", params)]
+            self._delete_rows(rows)
+            self.db.commit()
+            dead = self.n_rows - int(self._alive.sum())
+            if dead > 1000 and dead > self.n_rows // 2:
+                self.compact()
+    
+    def _rows_with_ids(self, ids: Sequence[str]) -> List[Tuple[str, int]]:
+        pairs = []
+        for begin in range(0, len(ids), 900):
+            batch = list(ids[begin:begin + 900])
+            pairs.extend(
+                (chunk_id, row) for chunk_id, row in self.db.execute(
+                    f"SELECT id, row FROM records WHERE id IN ({','.join('?' * len(batch))})", batch
+                )
+            )
+        return pairs
+    
+    def _rows_for(self, ids: Sequence[str]) -> List[int]:
+        return [row for _, row in self._rows_with_ids(ids)]
+    
+    def _delete_rows(self, rows: List[int]):
+        for begin in range(0, len(rows), 900):
+            batch = rows[begin:begin + 900]
+            self.db.execute(f"DELETE FROM records WHERE row IN ({','.join('?' * len(batch))})", batch)
+        self._alive[np.asarray(rows, dtype=np.int64)] = False
+    
+    def compact(self):
+        """Rewrite the vector file without deleted rows"""
+        with self._lock:
+            if self.dim is None:
+                return
+            live = np.flatnonzero(self._alive)
+            vectors = np.array(self._matrix[live])
+            scales = np.array(self._scales[live]) if self.dtype == "int8" else None
+            # Rows only move down, and in ascending order, so renumbering never collides
+            self.db.executemany(
+                "UPDATE records SET row = ? WHERE row = ?",
+                [(new, int(old)) for new, old in enumerate(live) if new != old]
+            )
+            self._matrix = self._scales = None
+            for path in (self._path, self._scale_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self.n_rows = len(live)
+            self._map(self.n_rows)
+            self._write(slice(0, self.n_rows), vectors, scales)
+            self._alive = np.ones(self.n_rows, dtype=bool)
+            self._save_settings()
+            self.db.commit()
+    
+    def close(self):
+        with self._lock:
+            for mapped in (self._matrix, self._scales):
+                if mapped is not None:
+                    mapped.flush()
+            self._matrix = self._scales = None
+            self.db.close()
+    
+    def stats(self) -> Dict:
+        """Size of the collection and its vector file"""
+        with self._lock:
+            return {
+                "dtype": self.dtype,
+                "dim": self.dim,
+                "rows": self.n_rows,
+                "live": int(self._alive.sum()),
+                "vector_bytes": os.path.getsize(self._path) if os.path.exists(self._path) else 0
+            }
+
+class NumpyClient:
+    """Chroma-style client for NumpyCollection directories"""
+    
+    def __init__(self, path: str, dtype: str = "float32"):
+        """
+        Initialize client
+        
+        Args:
+            path: Directory holding one subdirectory per collection
+            dtype: Vector storage type for new collections ("float32" or "int8")
+        """
+        self.path = path
+        self.dtype = dtype
+        self._collections: Dict[str, NumpyCollection] = {}
+        os.makedirs(path, exist_ok=True)
+    
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict] = None) -> NumpyCollection:
+        """Open a collection (always cosine distance; metadata is accepted for compatibility)"""
+        if name not in self._collections:
+            self._collections[name] = NumpyCollection(os.path.join(self.path, name), dtype=self.dtype)
+        return self._collections[name]
+    
+    def delete_collection(self, name: str):
+        """Delete a collection and its files"""
+        collection = self._collections.pop(name, None)
+        if collection is not None:
+            collection.close()
+        shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
@@ -0,0 +1,140 @@
+"""
+Bounded LRU cache of query embeddings
+"""
+import os
+import threading
+import unicodedata
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, Optional
+
+class QueryEmbeddingCache:
+    """Memoizes query embeddings in a preallocated float32 matrix"""
+    
+    def __init__(self, max_entries: int = 2048, persist_path: Optional[str] = None, model_name: str = ""):
+        """
+        Initialize query embedding cache
+        
+        Args:
+            max_entries: Embeddings kept before least recently used are evicted
+            persist_path: Optional .npz file the cache is loaded from and saved to
+            model_name: Model the embeddings belong to; a persisted cache for
+                another model is ignored
+        """
+        self.max_entries = max_entries
+        self.persist_path = persist_path
+        self.model_name = model_name
+        
+        self._matrix: Optional[np.ndarray] = None
+        self._slots: "OrderedDict[str, int]" = OrderedDict()
+        self._free_slots = list(range(max_entries - 1, -1, -1))
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+        
+        if persist_path and os.path.exists(persist_path):
+            self.load()
+    
+    @staticmethod
+    def normalize(text: str) -> str:
+        """
+        Cache key for a query: NFKC, casefolded, whitespace collapsed
+        
+        Casefolding is safe for the default all-mpnet-base-v2 model, whose
+        tokenizer lowercases its input anyway.
+        """
+        return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+    
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """
+        Look up the embedding of a query
+        
+        Args:
+            text: Query text
+            
+        Returns:
+            Copy of the cached embedding, or None on a miss
+        """
+        key = self.normalize(text)
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                self.misses += 1
+                return None
+            self._slots.move_to_end(key)
+            self.hits += 1
+            return self._matrix[slot].copy()
+    
+    def put(self, text: str, embedding: np.ndarray):
+        """
+        Store the embedding of a query
+        
+        Args:
+            text: Query text
+            embedding: Embedding vector
+        """
+        if self.max_entries <= 0:
+            return
+        key = self.normalize(text)
+        vector = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+            slot = self._slots.get(key)
+            if slot is None:
+                if not self._free_slots:
+                    # Evict the least recently used query
+                    _, evicted = self._slots.popitem(last=False)
+                    self._free_slots.append(evicted)
+                slot = self._free_slots.pop()
+            self._matrix[slot] = vector
+            self._slots[key] = slot
+            self._slots.move_to_end(key)
+    
+    def stats(self) -> Dict:
+        """Hit/miss counters and memory use"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._slots),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "matrix_bytes": self._matrix.nbytes if self._matrix is not None else 0,
+                "key_bytes": sum(len(key) for key in self._slots)
+            }
+    
+    def save(self):
+        """Write the cache to persist_path (most recently used last)"""
+        if not self.persist_path:
+            return
+        with self._lock:
+            if not self._slots:
+                return
+            keys = list(self._slots)
+            vectors = self._matrix[[self._slots[key] for key in keys]]
+        directory = os.path.dirname(self.persist_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Write then rename so a crash never leaves a truncated cache behind
+        # (one temp file per process: workers save at the same time on shutdown)
+        temp_path = f"{self.persist_path}.{os.getpid()}.tmp.npz"
+        np.savez(temp_path, keys=np.array(keys), vectors=vectors, model_name=np.array(self.model_name))
+        os.replace(temp_path, self.persist_path)
+    
+    def load(self):
+        """Load a cache written by save()"""
+        try:
+            with np.load(self.persist_path, allow_pickle=False) as data:
+                if str(data["model_name"]) != self.model_name:
+                    return
+                keys = data["keys"].tolist()
+                vectors = data["vectors"]
+        except Exception as e:
+            print(f"Warning: could not load query embedding cache: {e}")
+            return
+        # Keep the most recently used entries if the cache shrank
+        for key, vector in list(zip(keys, vectors))[-self.max_entries:]:
+            self.put(key, vector)
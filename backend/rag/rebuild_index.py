@@ -0,0 +1,105 @@
+"""
+Rebuild the vector collection from the on-disk embedding cache
+
+Recreates clarifyai_documents (with its HNSW and lexical indexes) from the stored chunk
+texts and metadata, taking every vector from the embedding cache instead
+of running the model. Useful after changing index settings or when the
+index files are damaged but the collection's documents are intact. With
+--source-backend it also moves the chunks between vector backends.
+
+Usage (from the backend directory):
+    python -m rag.rebuild_index
+    python -m rag.rebuild_index --populate        # copy existing vectors into the cache first
+    python -m rag.rebuild_index --allow-encode    # embed chunks missing from the cache
+    python -m rag.rebuild_index --source-backend chroma --backend numpy --populate
+"""
+import argparse
+import os
+import sys
+import time
+
+from .embedding_store import EmbeddingStore, cache_key
+from .vector_store import VectorStore
+from utils.hashing import hash_text
+
+MODEL_NAME = "sentence-transformers/all-mpnet-base-v2"
+
+def populate(vector_store: VectorStore, store: EmbeddingStore, batch_size: int) -> int:
+    """Copy the collection's current embeddings into the cache"""
+    copied = 0
+    offset = 0
+    while True:
+        results = vector_store.collection.get(
+            include=["documents", "embeddings"],
+            limit=batch_size,
+            offset=offset
+        )
+        if not results["ids"]:
+            return copied
+        store.put_many([hash_text(text) for text in results["documents"]], results["embeddings"])
+        copied += len(results["ids"])
+        offset += len(results["ids"])
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the vector collection from cached embeddings")
+    parser.add_argument("--persist-directory", default="./chroma_db", help="ChromaDB directory")
+    parser.add_argument("--cache-dir", default=os.getenv("EMBEDDING_CACHE_DIR") or "./embedding_cache",
+                        help="Embedding cache directory")
+    parser.add_argument("--model", default=MODEL_NAME, help="Model the cached embeddings belong to")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Chunks per read/write batch")
+    parser.add_argument("--populate", action="store_true", help="Copy the collection's embeddings into the cache first")
+    parser.add_argument("--allow-encode", action="store_true", help="Embed chunks that are not cached")
+    parser.add_argument("--backend", default=os.getenv("VECTOR_BACKEND") or "chroma", help="Vector backend to rebuild")
+    parser.add_argument("--source-backend", help="Backend to read chunks from (defaults to --backend)")
+    parser.add_argument("--embedding-backend", default=os.getenv("EMBEDDING_BACKEND") or "torch",
+                        help="Embedding runtime the cached vectors belong to")
+    args = parser.parse_args()
+    
+    start = time.perf_counter()
+    source = VectorStore(persist_directory=args.persist_directory, backend=args.source_backend or args.backend)
+    store = EmbeddingStore(args.cache_dir, cache_key(args.model, args.embedding_backend))
+    
+    if args.populate:
+        print(f"Copied {populate(source, store, args.batch_size)} embeddings into {store.directory}")
+    
+    # Read everything before dropping the collection
+    ids, documents, metadatas = [], [], []
+    for page in source.iter_chunks(args.batch_size):
+        ids.extend(page["ids"])
+        documents.extend(page["documents"])
+        metadatas.extend(page["metadatas"])
+    print(f"Read {len(ids)} chunks from {args.persist_directory}")
+    
+    hashes = [meta.get("chunk_hash") or hash_text(text) for text, meta in zip(documents, metadatas)]
+    vectors = store.get_many(hashes)
+    missing = [i for i, chunk_hash in enumerate(hashes) if chunk_hash not in vectors]
+    if missing:
+        if not args.allow_encode:
+            print(f"{len(missing)} chunks have no cached embedding; rerun with --populate or --allow-encode")
+            sys.exit(1)
+        from .embedder import Embedder
+        embedder = Embedder(args.model, embedding_cache_dir=args.cache_dir, backend=args.embedding_backend)
+        embedder.embed_batch([documents[i] for i in missing])
+        vectors = embedder.embedding_store.get_many(hashes)
+    
+    vector_store = source if source.backend == args.backend else VectorStore(args.persist_directory, backend=args.backend)
+    vector_store.reset()
+    for begin in range(0, len(ids), args.batch_size):
+        end = begin + args.batch_size
+        vector_store.collection.add(
+            ids=ids[begin:end],
+            embeddings=[vectors[h].tolist() for h in hashes[begin:end]],
+            documents=documents[begin:end],
+            metadatas=metadatas[begin:end]
+        )
+        vector_store.lexical_index.add(
+            ids[begin:end],
+            [meta.get("doc_id", "") for meta in metadatas[begin:end]],
+            documents[begin:end]
+        )
+    vector_store.lexical_index.compact()
+    
+    print(f"Rebuilt {len(ids)} chunks ({len(missing)} embedded) in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Cross-encoder reranking of retrieved chunks under a latency budget
+"""
+import os
+import threading
+import time
+from collections import deque
+import numpy as np
+from typing import Dict, List, Optional
+from .model_registry import get_cross_encoder
+
+class Reranker:
+    """Re-scores retrieval candidates with a cross-encoder"""
+    
+    def __init__(
+        self,
+        model_name: Optional[str] = None,
+        candidates: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        budget_ms: Optional[float] = None
+    ):
+        """
+        Initialize reranker
+        
+        Candidates are scored in small batches. Before each batch the
+        expected cost (from recent batches) is checked against what is left
+        of the budget; if the batch would overrun it, scoring stops. The
+        chunks scored so far are then ordered by score, ahead of the
+        unscored rest in retrieval order.
+        
+        Args:
+            model_name: Cross-encoder model (defaults to RERANK_MODEL or
+                cross-encoder/ms-marco-MiniLM-L-6-v2)
+            candidates: Chunks retrieved for reranking (defaults to RERANK_CANDIDATES or 20)
+            batch_size: Query/chunk pairs per forward pass (defaults to RERANK_BATCH_SIZE or 8)
+            budget_ms: Time allowed per request (defaults to RERANK_BUDGET_MS or 150)
+        """
+        self.model_name = model_name or os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+        self.candidates = candidates or int(os.getenv("RERANK_CANDIDATES", "20"))
+        self.batch_size = batch_size or int(os.getenv("RERANK_BATCH_SIZE", "8"))
+        self.budget_ms = budget_ms if budget_ms is not None else float(os.getenv("RERANK_BUDGET_MS", "150"))
+        self.model = get_cross_encoder(self.model_name)
+        
+        self._lock = threading.Lock()
+        # Exponential moving average of one pair's scoring cost
+        self._pair_ms: Optional[float] = None
+        self._latencies = deque(maxlen=1000)
+        self.requests = 0
+        self.pairs_scored = 0
+        self.fallbacks = 0
+    
+    def rerank(self, query: str, chunks: List[Dict], top_k: int) -> List[Dict]:
+        """
+        Order chunks by cross-encoder relevance to the query
+        
+        Args:
+            query: User query
+            chunks: Retrieved chunks, best first
+            top_k: Number of chunks to keep
+        
+        Returns:
+            The top_k chunks; scored ones carry a rerank_score and, if the
+            budget ran out, come before the unscored ones
+        """
+        if len(chunks) <= 1:
+            return chunks[:top_k]
+        
+        start = time.perf_counter()
+        deadline = start + self.budget_ms / 1000
+        scores: List[float] = []
+        
+        for begin in range(0, len(chunks), self.batch_size):
+            batch = chunks[begin:begin + self.batch_size]
+            if self._pair_ms is not None:
+                expected = time.perf_counter() + self._pair_ms * len(batch) / 1000
+                if expected > deadline:
+                    break
+            
+            batch_start = time.perf_counter()
+            batch_scores = self.model.predict(
+                [(query, chunk["text"]) for chunk in batch],
+                batch_size=len(batch),
+                show_progress_bar=False
+            )
+            pair_ms = (time.perf_counter() - batch_start) * 1000 / len(batch)
+            with self._lock:
+                self._pair_ms = pair_ms if self._pair_ms is None else 0.8 * self._pair_ms + 0.2 * pair_ms
+            scores.extend(float(score) for score in np.atleast_1d(batch_scores))
+        
+        complete = len(scores) == len(chunks)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.requests += 1
+            self.pairs_scored += len(scores)
+            self.fallbacks += 0 if complete else 1
+            self._latencies.append(elapsed_ms)
+        
+        # Retrieval put the likeliest chunks first, so a partly scored list
+        # still reorders the candidates that matter most
+        order = np.argsort(-np.array(scores), kind="stable")[:top_k] if scores else []
+        reranked = [{**chunks[i], "rerank_score": scores[i]} for i in order]
+        return reranked + chunks[len(scores):][:top_k - len(reranked)]
+    
+    def stats(self) -> Dict:
+        """Reranking cost and budget fallbacks"""
+        with self._lock:
+            latencies = np.array(self._latencies) if self._latencies else np.zeros(1)
+            return {
+                "model_name": self.model_name,
+                "candidates": self.candidates,
+                "budget_ms": self.budget_ms,
+                "requests": self.requests,
+                "pairs_scored": self.pairs_scored,
+                "fallbacks": self.fallbacks,
+                "fallback_rate": self.fallbacks / self.requests if self.requests else 0.0,
+                "pair_ms": self._pair_ms,
+                "latency_ms_p50": float(np.percentile(latencies, 50)),
+                "latency_ms_p95": float(np.percentile(latencies, 95))
+            }
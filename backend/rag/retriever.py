@@ -1,22 +1,45 @@
 """
 Retriever for RAG pipeline
 """
-from typing import List, Dict
+import os
+from typing import List, Dict, Optional
 from .vector_store import VectorStore
 from .embedder import Embedder
+from .reranker import Reranker
+from utils.metrics import metrics
 
 class Retriever:
     """Retrieves relevant chunks from vector store"""
     
-    def __init__(self, vector_store: VectorStore):
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        embedder: Optional[Embedder] = None,
+        hybrid: Optional[bool] = None,
+        candidates: Optional[int] = None,
+        rrf_k: Optional[int] = None,
+        reranker: Optional[Reranker] = None
+    ):
         """
         Initialize retriever
         
         Args:
             vector_store: VectorStore instance
+            embedder: Embedder to reuse (defaults to one backed by the shared model)
+            hybrid: Fuse BM25 matches with dense results (defaults to HYBRID_RETRIEVAL_ENABLED or true)
+            candidates: Results taken from each retriever before fusion
+                (defaults to HYBRID_CANDIDATES or 20)
+            rrf_k: Reciprocal rank fusion constant (defaults to HYBRID_RRF_K or 60)
+            reranker: Optional cross-encoder stage applied to a larger candidate set
         """
         self.vector_store = vector_store
-        self.embedder = Embedder()
+        self.embedder = embedder or Embedder()
+        if hybrid is None:
+            hybrid = os.getenv("HYBRID_RETRIEVAL_ENABLED", "true").lower() == "true"
+        self.hybrid = hybrid
+        self.candidates = candidates or int(os.getenv("HYBRID_CANDIDATES", "20"))
+        self.rrf_k = rrf_k or int(os.getenv("HYBRID_RRF_K", "60"))
+        self.reranker = reranker
     
     def retrieve(self, query: str, top_k: int = 4) -> List[Dict]:
         """
@@ -32,10 +55,121 @@ class Retriever:
         # Generate query embedding
         query_embedding = self.embedder.embed(query)
         
-        # Query vector store
-        results = self.vector_store.query(query_embedding, top_k=top_k)
+        return self.retrieve_by_embedding(query_embedding, top_k=top_k, query=query)
+    
+    def retrieve_many(self, queries: List[str], top_k: int = 4) -> List[List[Dict]]:
+        """
+        Retrieve relevant chunks for several queries at once
+        
+        All queries are embedded in one forward pass and searched with one
+        multi-vector collection query.
+        
+        Args:
+            queries: User queries
+            top_k: Number of chunks to retrieve per query
+            
+        Returns:
+            One list of relevant chunks per query
+        """
+        if not queries:
+            return []
+        query_embeddings = self.embedder.embed_queries(queries)
+        return self.retrieve_many_by_embedding(
+            [embedding.tolist() for embedding in query_embeddings], top_k=top_k, queries=queries
+        )
+    
+    def retrieve_by_embedding(
+        self,
+        query_embedding: List[float],
+        top_k: int = 4,
+        query: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Retrieve relevant chunks for an already embedded query
+        
+        Args:
+            query_embedding: Query embedding vector
+            top_k: Number of chunks to retrieve
+            query: Query text; when given, exact term matches (codes, names)
+                are fused with the dense results and the reranker, if any, reorders them
+            
+        Returns:
+            List of relevant chunks with metadata
+        """
+        return self.retrieve_many_by_embedding([query_embedding], top_k=top_k, queries=[query])[0]
+    
+    def retrieve_many_by_embedding(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = 4,
+        queries: Optional[List[Optional[str]]] = None
+    ) -> List[List[Dict]]:
+        """
+        Retrieve relevant chunks for already embedded queries
         
+        Args:
+            query_embeddings: Query embedding vectors
+            top_k: Number of chunks to retrieve per query
+            queries: Query texts, used as in retrieve_by_embedding (None entries skip
+                fusion and reranking)
+            
+        Returns:
+            One list of relevant chunks per query
+        """
+        if not query_embeddings:
+            return []
+        queries = queries or [None] * len(query_embeddings)
+        
+        # The reranker picks top_k from a larger pool
+        keep = max(top_k, self.reranker.candidates) if self.reranker and any(queries) else top_k
+        hybrid = self.hybrid and any(queries)
+        candidates = max(keep, self.candidates) if hybrid else keep
+        
+        with metrics.stage("vector_search"):
+            dense_results = self.vector_store.query_many(query_embeddings, top_k=candidates)
+        
+        results = []
+        for query, dense in zip(queries, dense_results):
+            if hybrid and query:
+                with metrics.stage("lexical_search"):
+                    lexical = self.vector_store.lexical_index.search(query, top_k=candidates)
+                    chunks = self.fuse(dense, lexical, keep)
+            else:
+                chunks = dense[:keep]
+            
+            if keep > top_k and query:
+                with metrics.stage("rerank"):
+                    chunks = self.reranker.rerank(query, chunks, top_k)
+            results.append(chunks[:top_k])
         return results
+    
+    def fuse(self, dense: List[Dict], lexical: List[tuple], top_k: int) -> List[Dict]:
+        """
+        Combine dense and lexical rankings with reciprocal rank fusion
+        
+        Args:
+            dense: Vector store results, best first
+            lexical: (chunk id, BM25 score) pairs, best first
+            top_k: Number of chunks to return
+            
+        Returns:
+            Fused chunks, each with an rrf_score
+        """
+        scores: Dict[str, float] = {}
+        for ranking in ([chunk["id"] for chunk in dense], [chunk_id for chunk_id, _ in lexical]):
+            for rank, chunk_id in enumerate(ranking):
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+        
+        best = sorted(scores, key=scores.get, reverse=True)[:top_k]
+        chunks = {chunk["id"]: chunk for chunk in dense}
+        # Lexical-only hits were not returned by the dense query
+        missing = [chunk_id for chunk_id in best if chunk_id not in chunks]
+        chunks.update({chunk["id"]: chunk for chunk in self.vector_store.get_chunks(missing)})
+        
+        return [
+            {**chunks[chunk_id], "rrf_score": scores[chunk_id]}
+            for chunk_id in best if chunk_id in chunks
+        ]
 
 
 
@@ -0,0 +1,155 @@
+"""
+Semantic answer cache keyed on query embeddings
+"""
+import os
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+class SemanticCache:
+    """Reuses answers for queries whose embeddings are near-identical"""
+    
+    def __init__(
+        self,
+        threshold: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        ttl_seconds: Optional[float] = None
+    ):
+        """
+        Initialize semantic cache
+        
+        Args:
+            threshold: Minimum cosine similarity for a hit (defaults to SEMANTIC_CACHE_THRESHOLD or 0.95)
+            max_entries: Entries kept before least recently used are evicted
+                (defaults to SEMANTIC_CACHE_MAX_ENTRIES or 1000)
+            ttl_seconds: Entry lifetime (defaults to SEMANTIC_CACHE_TTL_SECONDS or 3600)
+        """
+        self.threshold = threshold if threshold is not None else float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+        self.max_entries = max_entries or int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "3600"))
+        
+        # Normalized query embeddings live in one matrix; each entry owns a row
+        self._matrix: Optional[np.ndarray] = None
+        self._valid = np.zeros(self.max_entries, dtype=bool)
+        self._entries: "OrderedDict[int, Dict]" = OrderedDict()
+        self._free_slots = list(range(self.max_entries - 1, -1, -1))
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+    
+    def _remove(self, slot: int):
+        del self._entries[slot]
+        self._valid[slot] = False
+        self._free_slots.append(slot)
+    
+    def lookup(self, query_embedding) -> Optional[Dict]:
+        """
+        Find a cached answer for a similar query
+        
+        Args:
+            query_embedding: Embedding of the incoming query
+            
+        Returns:
+            Cached entry with 'answer', 'chunks' and 'similarity', or None on a miss
+        """
+        query = self._normalize(query_embedding)
+        with self._lock:
+            if self._entries:
+                similarities = self._matrix @ query
+                similarities[~self._valid] = -1.0
+                now = time.time()
+                # An expired best match must not hide a live one just below it
+                while self._entries:
+                    slot = int(np.argmax(similarities))
+                    entry = self._entries.get(slot)
+                    if not entry or similarities[slot] < self.threshold:
+                        break
+                    if now - entry["created_at"] <= self.ttl_seconds:
+                        self._entries.move_to_end(slot)
+                        self.hits += 1
+                        return {**entry, "similarity": float(similarities[slot])}
+                    self._remove(slot)
+                    self.evictions += 1
+                    similarities[slot] = -1.0
+            self.misses += 1
+            return None
+    
+    def store(self, query: str, query_embedding, answer: str, chunks: List[Dict]):
+        """
+        Cache an answer
+        
+        Args:
+            query: Query text
+            query_embedding: Embedding of the query
+            answer: Generated answer
+            chunks: Retrieved chunks the answer was built from
+        """
+        vector = self._normalize(query_embedding)
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+            if not self._free_slots:
+                # Evict the least recently used entry
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            
+            slot = self._free_slots.pop()
+            self._matrix[slot] = vector
+            self._valid[slot] = True
+            self._entries[slot] = {
+                "query": query,
+                "answer": answer,
+                "chunks": chunks,
+                "chunk_ids": [chunk.get("id") for chunk in chunks],
+                "doc_ids": {chunk.get("metadata", {}).get("doc_id") for chunk in chunks},
+                "created_at": time.time()
+            }
+    
+    def invalidate_document(self, doc_id: str):
+        """
+        Drop entries whose answers used chunks of a document
+        
+        Args:
+            doc_id: Document identifier
+        """
+        with self._lock:
+            for slot in [slot for slot, entry in self._entries.items() if doc_id in entry["doc_ids"]]:
+                self._remove(slot)
+                self.invalidations += 1
+    
+    def clear(self):
+        """Drop every entry (e.g. after new documents change what can be answered)"""
+        with self._lock:
+            self.invalidations += len(self._entries)
+            for slot in list(self._entries):
+                self._remove(slot)
+    
+    def stats(self) -> Dict:
+        """Hit/miss counters for tuning the threshold"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
+
+
+
@@ -0,0 +1,296 @@
+"""
+Map-reduce summarization of long documents with cached partial summaries
+"""
+import asyncio
+import json
+import os
+import re
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+from .context_packer import ContextPacker
+from utils.hashing import hash_text
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+SUMMARY_PROMPT = "Please provide a concise summary of the following document:\n\n{text}"
+
+SECTION_PROMPT = (
+    "Summarize the following section of a longer document. Keep the key facts, "
+    "names, numbers, dates and policy or form codes.\n\n{text}"
+)
+
+MERGE_PROMPT = (
+    "The following are summaries of consecutive sections of one document, in order. "
+    "Combine them into a single concise summary of the whole document.\n\n{text}"
+)
+
+class Summarizer:
+    """Summarizes chunk groups concurrently, then merges the partial summaries"""
+    
+    def __init__(
+        self,
+        generate: Callable[[str], Awaitable[Optional[str]]],
+        context_packer: ContextPacker,
+        group_tokens: Optional[int] = None,
+        max_parallel: Optional[int] = None,
+        cache_directory: Optional[str] = None,
+        max_cached_documents: Optional[int] = None
+    ):
+        """
+        Initialize summarizer
+        
+        The document text is rebuilt from its chunks and split into groups
+        of paragraphs. A group closes once it holds at least a quarter of
+        group_tokens and its last paragraph's hash hits a content-defined
+        boundary (or the next paragraph would overflow it). Chunk windows
+        shift after an edit, but paragraphs elsewhere do not, so only the
+        groups around the edit change. Group summaries are cached per
+        document under the hash of their text.
+        
+        Args:
+            generate: Async LLM call returning text or None (e.g. generate_with_fallback)
+            context_packer: Supplies the tokenizer and overlap matching
+            group_tokens: Token budget of one group (defaults to SUMMARY_GROUP_TOKENS or 3000)
+            max_parallel: LLM calls in flight across all summaries
+                (defaults to SUMMARY_MAX_PARALLEL or 4)
+            cache_directory: Where per-document caches are persisted
+                (defaults to SUMMARY_CACHE_DIR or ./summary_cache; empty keeps them in memory)
+            max_cached_documents: Per-document caches held in memory, least recently
+                used dropped first; persisted ones are reread from disk when needed
+                (defaults to SUMMARY_CACHE_MAX_DOCUMENTS or 256)
+        """
+        self.generate = generate
+        self.context_packer = context_packer
+        self.group_tokens = group_tokens or int(os.getenv("SUMMARY_GROUP_TOKENS", "3000"))
+        self.max_parallel = max_parallel or int(os.getenv("SUMMARY_MAX_PARALLEL", "4"))
+        if cache_directory is None:
+            cache_directory = os.getenv("SUMMARY_CACHE_DIR", "./summary_cache")
+        self.cache_directory = cache_directory or None
+        self.max_cached_documents = max_cached_documents or int(os.getenv("SUMMARY_CACHE_MAX_DOCUMENTS", "256"))
+        if self.cache_directory:
+            os.makedirs(self.cache_directory, exist_ok=True)
+        
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # Dropped once no summarize() call holds or waits on them
+        self._doc_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self._caches: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        
+        self.group_hits = 0
+        self.group_misses = 0
+        self.summary_hits = 0
+    
+    # Cache
+    
+    def _cache_path(self, doc_id: str) -> str:
+        return os.path.join(self.cache_directory, f"{hash_text(doc_id)[:32]}.json")
+    
+    def _load_cache(self, doc_id: str) -> Dict:
+        """Cached group and final summaries of a document"""
+        with self._lock:
+            cache = self._caches.get(doc_id)
+            if cache is None:
+                cache = {"groups": {}, "final": None}
+                if self.cache_directory and os.path.exists(self._cache_path(doc_id)):
+                    try:
+                        with open(self._cache_path(doc_id)) as f:
+                            cache = json.load(f)
+                    except (OSError, ValueError):
+                        pass
+                self._remember(doc_id, cache)
+            else:
+                self._caches.move_to_end(doc_id)
+            return cache
+    
+    def _save_cache(self, doc_id: str, cache: Dict):
+        with self._lock:
+            self._remember(doc_id, cache)
+            if self.cache_directory:
+                path = self._cache_path(doc_id)
+                with open(path + ".tmp", "w") as f:
+                    json.dump(cache, f)
+                os.replace(path + ".tmp", path)
+    
+    def _remember(self, doc_id: str, cache: Dict):
+        """Keep a document's cache in memory, dropping the least recently used beyond the limit"""
+        self._caches[doc_id] = cache
+        self._caches.move_to_end(doc_id)
+        while len(self._caches) > self.max_cached_documents:
+            self._caches.popitem(last=False)
+    
+    def invalidate(self, doc_id: str):
+        """Forget every cached summary of a document"""
+        with self._lock:
+            self._caches.pop(doc_id, None)
+            if self.cache_directory and os.path.exists(self._cache_path(doc_id)):
+                os.remove(self._cache_path(doc_id))
+    
+    # Grouping
+    
+    def document_text(self, chunks: List[Dict]) -> str:
+        """
+        Rebuild the document text from its chunks, keeping overlaps once
+        
+        Args:
+            chunks: Document chunks sorted by chunk_index
+        
+        Returns:
+            Document text
+        """
+        parts: List[str] = []
+        previous = None
+        for chunk in chunks:
+            text = chunk["text"]
+            if previous is not None:
+                prev_end = previous.get("metadata", {}).get("end_char")
+                start = chunk.get("metadata", {}).get("start_char")
+                if prev_end is not None and start is not None:
+                    # Offsets keep the original whitespace, paragraph breaks included
+                    if start < prev_end:
+                        text = text[prev_end - start:]
+                    else:
+                        parts.append("\n\n" if start - prev_end >= 2 else " ")
+                else:
+                    text = text[ContextPacker._overlap(previous, chunk):]
+                    parts.append(" ")
+            parts.append(text)
+            previous = chunk
+        return "".join(parts)
+    
+    def group_text(self, text: str) -> List[str]:
+        """
+        Split document text into content-defined groups of paragraphs
+        
+        Args:
+            text: Document text
+        
+        Returns:
+            Group texts in document order
+        """
+        count_tokens = self.context_packer.chunker._count_tokens
+        paragraphs = []
+        for paragraph in _PARAGRAPH_BREAK.split(text):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            tokens = count_tokens(paragraph)
+            if tokens > self.group_tokens:
+                # Oversized paragraph: split it into budget-sized pieces
+                step = max(1, len(paragraph) * self.group_tokens // tokens)
+                for begin in range(0, len(paragraph), step):
+                    piece = paragraph[begin:begin + step]
+                    paragraphs.append((piece, count_tokens(piece)))
+            else:
+                paragraphs.append((paragraph, tokens))
+        
+        groups: List[str] = []
+        current: List[str] = []
+        tokens = 0
+        for i, (paragraph, size) in enumerate(paragraphs):
+            current.append(paragraph)
+            tokens += size
+            next_size = paragraphs[i + 1][1] if i + 1 < len(paragraphs) else 0
+            boundary = int(hash_text(paragraph)[:8], 16) % 4 == 0
+            if (tokens >= self.group_tokens // 4 and boundary) or tokens + next_size > self.group_tokens:
+                groups.append("\n\n".join(current))
+                current, tokens = [], 0
+        if current:
+            groups.append("\n\n".join(current))
+        return groups
+    
+    # Summarization
+    
+    async def _call(self, prompt: str) -> Optional[str]:
+        """One LLM call under the shared parallelism limit"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_parallel)
+        async with self._semaphore:
+            return await self.generate(prompt)
+    
+    async def _merge(self, summaries: List[str]) -> Optional[str]:
+        """Reduce partial summaries, in rounds while they exceed one group"""
+        count_tokens = self.context_packer.chunker._count_tokens
+        while len(summaries) > 1:
+            rounds: List[List[str]] = [[]]
+            tokens = 0
+            for summary in summaries:
+                size = count_tokens(summary)
+                # At least two per round so every round shrinks the list
+                if len(rounds[-1]) >= 2 and tokens + size > self.group_tokens:
+                    rounds.append([])
+                    tokens = 0
+                rounds[-1].append(summary)
+                tokens += size
+            
+            merged = await asyncio.gather(*(
+                self._call(MERGE_PROMPT.format(text="\n\n".join(batch))) if len(batch) > 1
+                else asyncio.sleep(0, result=batch[0])
+                for batch in rounds
+            ))
+            if not all(merged):
+                return None
+            summaries = list(merged)
+        return summaries[0]
+    
+    async def summarize(self, doc_id: str, chunks: List[Dict]) -> Optional[str]:
+        """
+        Summarize a document
+        
+        Args:
+            doc_id: Document identifier (scope of the cache)
+            chunks: Document chunks with text and metadata, sorted by chunk_index
+        
+        Returns:
+            Summary text, or None if the LLM could not produce one
+        """
+        if not chunks:
+            return None
+        
+        lock = self._doc_locks.setdefault(doc_id, asyncio.Lock())
+        async with lock:
+            cache = self._load_cache(doc_id)
+            groups = self.group_text(self.document_text(chunks))
+            keys = [hash_text(group) for group in groups]
+            summary_key = hash_text("|".join(keys))
+            if cache.get("final") and cache["final"]["key"] == summary_key:
+                self.summary_hits += 1
+                return cache["final"]["summary"]
+            
+            if len(groups) == 1:
+                summary = await self._call(SUMMARY_PROMPT.format(text=groups[0]))
+                group_summaries = {}
+            else:
+                cached_groups = cache.get("groups", {})
+                missing = [i for i, key in enumerate(keys) if key not in cached_groups]
+                self.group_hits += len(keys) - len(missing)
+                self.group_misses += len(missing)
+                
+                # Map: only groups whose text changed go to the LLM
+                results = await asyncio.gather(*(
+                    self._call(SECTION_PROMPT.format(text=groups[i])) for i in missing
+                ))
+                # Keep what succeeded even if the document summary fails
+                group_summaries = {key: cached_groups[key] for key in keys if key in cached_groups}
+                group_summaries.update({keys[i]: result for i, result in zip(missing, results) if result})
+                
+                if len(group_summaries) < len(keys):
+                    summary = None
+                else:
+                    summary = await self._merge([group_summaries[key] for key in keys])
+            
+            final = {"key": summary_key, "summary": summary} if summary else None
+            self._save_cache(doc_id, {"groups": group_summaries, "final": final})
+            return summary
+    
+    def stats(self) -> Dict:
+        """Cache effectiveness of partial and final summaries"""
+        lookups = self.group_hits + self.group_misses
+        return {
+            "documents_cached": len(self._caches),
+            "summary_hits": self.summary_hits,
+            "group_hits": self.group_hits,
+            "group_misses": self.group_misses,
+            "group_hit_rate": self.group_hits / lookups if lookups else 0.0
+        }
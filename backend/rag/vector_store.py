@@ -1,42 +1,248 @@
 """
-Vector store using ChromaDB
+Vector store using ChromaDB or the in-process numpy backend
 """
-import chromadb
-from chromadb.config import Settings
-from typing import List, Dict, Optional
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
 import os
+import threading
+from .lexical_index import LexicalIndex
+from utils.locks import FileLock
+
+COLLECTION_NAME = "clarifyai_documents"
 
 class VectorStore:
     """Manages vector storage using ChromaDB"""
     
-    def __init__(self, persist_directory: str = "./chroma_db"):
+    def __init__(
+        self,
+        persist_directory: str = "./chroma_db",
+        backend: Optional[str] = None,
+        dtype: Optional[str] = None,
+        multiprocess: bool = False
+    ):
         """
-        Initialize ChromaDB vector store
+        Initialize vector store
+        
+        Both backends expose the same client/collection API (the subset of
+        ChromaDB's used here), so the rest of the store is engine-agnostic.
+        
+        With multiprocess=True several worker processes can share the
+        directory. Changes are made under an exclusive file lock, after
+        catching up with other workers, and bump a generation counter on
+        disk; refresh() reopens the collection and lexical index when the
+        counter moved, so every worker searches the same chunks.
         
         Args:
-            persist_directory: Directory to persist ChromaDB data
+            persist_directory: Directory to persist vector data
+            backend: "chroma" or "numpy" (defaults to VECTOR_BACKEND or chroma)
+            dtype: Vector type for the numpy backend, "float32" or "int8"
+                (defaults to VECTOR_DTYPE or float32)
+            multiprocess: Coordinate with other processes using the same directory
         """
         self.persist_directory = persist_directory
         os.makedirs(persist_directory, exist_ok=True)
+        self.backend = backend or os.getenv("VECTOR_BACKEND", "chroma")
+        if self.backend not in ("numpy", "chroma"):
+            raise ValueError(f"Unknown vector backend: {self.backend}")
+        self.dtype = dtype or os.getenv("VECTOR_DTYPE", "float32")
         
-        # Initialize ChromaDB client
-        self.client = chromadb.PersistentClient(
-            path=persist_directory,
-            settings=Settings(anonymized_telemetry=False)
-        )
+        self._write_lock = threading.RLock()
+        self._write_depth = 0
+        self._file_lock = FileLock(os.path.join(persist_directory, "write.lock")) if multiprocess else None
+        self._generation_path = os.path.join(persist_directory, "generation")
+        self._generation = self._read_generation()
+        self.reloads = 0
+        # Chroma systems replaced by a reload, stopped once no read uses them
+        self._readers = 0
+        self._readers_lock = threading.Lock()
+        self._retired: List = []
+        
+        self._open()
+        
+        # BM25 index over the same chunks, rebuilt if it drifted from the collection
+        if len(self.lexical_index) != self.collection.count():
+            self.rebuild_lexical_index()
+    
+    def _open(self, reopen: bool = False, retire: bool = True):
+        """
+        Open the client, collection and lexical index from disk
+        
+        Args:
+            reopen: Replace handles opened before
+            retire: Stop the replaced Chroma system once no read uses it
+                (False after fork, where it belongs to the parent process)
+        """
+        previous = self.client if reopen else None
+        if self.backend == "numpy":
+            from .numpy_backend import NumpyClient
+            self.client = NumpyClient(os.path.join(self.persist_directory, "numpy_index"), dtype=self.dtype)
+        else:
+            import chromadb
+            from chromadb.config import Settings
+            if previous is not None:
+                # Clients share one cached system per path, which only knows
+                # its own writes; clear the cache so the new client loads from disk
+                previous.clear_system_cache()
+            self.client = chromadb.PersistentClient(
+                path=self.persist_directory,
+                settings=Settings(anonymized_telemetry=False)
+            )
         
         # Get or create collection
-        self.collection = self.client.get_or_create_collection(
-            name="clarifyai_documents",
+        self.collection = self._open_collection()
+        self.lexical_index = LexicalIndex(os.path.join(self.persist_directory, "lexical_index"))
+        
+        if previous is not None and retire and self.backend == "chroma":
+            # In-flight reads keep using the old system until they finish
+            with self._readers_lock:
+                self._retired.append(previous)
+                if not self._readers:
+                    self._stop_retired()
+    
+    def _stop_retired(self):
+        """Stop replaced Chroma systems (called with _readers_lock held and no reads running)"""
+        for client in self._retired:
+            system = getattr(client, "_system", None)
+            if system is not None:
+                system.stop()
+        self._retired.clear()
+    
+    @contextmanager
+    def _reading(self):
+        """Mark a read of the collection, so a reload does not stop the system under it"""
+        with self._readers_lock:
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._readers_lock:
+                self._readers -= 1
+                if not self._readers and self._retired:
+                    self._stop_retired()
+    
+    # Cross-process coordination
+    
+    def _read_generation(self) -> int:
+        try:
+            with open(self._generation_path) as f:
+                return int(f.read() or 0)
+        except (OSError, ValueError):
+            return 0
+    
+    def _reload(self, generation: int) -> bool:
+        """Reopen from disk if another process changed the store"""
+        if generation == self._generation:
+            return False
+        self._open(reopen=True)
+        self._generation = generation
+        self.reloads += 1
+        return True
+    
+    @contextmanager
+    def _writing(self):
+        """Serialize changes across threads and, in multiprocess mode, processes"""
+        with self._write_lock:
+            self._write_depth += 1
+            try:
+                if self._file_lock is None or self._write_depth > 1:
+                    yield
+                    return
+                with self._file_lock.exclusive():
+                    # Writing from a stale view would overwrite other workers' changes
+                    self._reload(self._read_generation())
+                    try:
+                        yield
+                    finally:
+                        self._generation += 1
+                        with open(self._generation_path + f".{os.getpid()}.tmp", "w") as f:
+                            f.write(str(self._generation))
+                        os.replace(self._generation_path + f".{os.getpid()}.tmp", self._generation_path)
+            finally:
+                self._write_depth -= 1
+    
+    def is_stale(self) -> bool:
+        """Whether another process changed the store since this one last looked"""
+        return self._file_lock is not None and self._read_generation() != self._generation
+    
+    def refresh(self) -> bool:
+        """
+        Catch up with changes made by other processes
+        
+        Returns:
+            True if the collection and lexical index were reopened
+        """
+        if not self.is_stale():
+            return False
+        with self._write_lock, self._file_lock.shared():
+            return self._reload(self._read_generation())
+    
+    def reopen(self):
+        """Open fresh handles, e.g. in a worker forked from a preloading parent"""
+        with self._write_lock:
+            self._open(reopen=True, retire=False)
+            self._generation = self._read_generation()
+    
+    def _open_collection(self):
+        """Get or create the documents collection"""
+        return self.client.get_or_create_collection(
+            name=COLLECTION_NAME,
             metadata={"hnsw:space": "cosine"}
         )
     
+    def iter_chunks(self, batch_size: int = 1000) -> Iterator[Dict[str, List]]:
+        """
+        Page through every stored chunk without its embedding
+        
+        Args:
+            batch_size: Chunks per page
+            
+        Yields:
+            Dictionaries with ids, documents and metadatas lists
+        """
+        offset = 0
+        while True:
+            with self._reading():
+                results = self.collection.get(
+                    include=["documents", "metadatas"],
+                    limit=batch_size,
+                    offset=offset
+                )
+            if not results["ids"]:
+                return
+            yield results
+            offset += len(results["ids"])
+    
+    def reset(self):
+        """Drop the collection and its indexes, then recreate it empty"""
+        with self._writing():
+            self.client.delete_collection(COLLECTION_NAME)
+            self.collection = self._open_collection()
+            self.lexical_index.clear()
+    
+    def rebuild_lexical_index(self, batch_size: int = 1000):
+        """
+        Re-index every stored chunk in the lexical index
+        
+        Args:
+            batch_size: Chunks read per page
+        """
+        with self._writing():
+            self.lexical_index.clear()
+            for page in self.iter_chunks(batch_size):
+                self.lexical_index.add(
+                    page["ids"],
+                    [meta.get("doc_id", "") for meta in page["metadatas"]],
+                    page["documents"]
+                )
+            self.lexical_index.compact()
+    
     def add_documents(
         self,
         doc_id: str,
         chunks: List[str],
         embeddings: List[List[float]],
-        metadata: List[Dict]
+        metadata: List[Dict],
+        ids: Optional[List[str]] = None
     ):
         """
         Add documents to vector store
@@ -46,20 +252,111 @@ class VectorStore:
             chunks: List of text chunks
             embeddings: List of embedding vectors
             metadata: List of metadata dictionaries
+            ids: Chunk identifiers (defaults to "{doc_id}_chunk_{i}")
         """
-        ids = [f"{doc_id}_chunk_{i}" for i in range(len(chunks))]
+        with self._writing():
+            if ids is None:
+                ids = [f"{doc_id}_chunk_{i}" for i in range(len(chunks))]
+            
+            # Add metadata with doc_id
+            enriched_metadata = [
+                {**meta, "doc_id": doc_id} for meta in metadata
+            ]
+            
+            self.collection.add(
+                ids=ids,
+                embeddings=embeddings,
+                documents=chunks,
+                metadatas=enriched_metadata
+            )
+            self.lexical_index.add(ids, [doc_id] * len(ids), chunks)
+    
+    def get_document_chunk_ids(self, doc_id: str) -> List[str]:
+        """
+        Get the identifiers of all chunks stored for a document
         
-        # Add metadata with doc_id
-        enriched_metadata = [
-            {**meta, "doc_id": doc_id} for meta in metadata
-        ]
+        Args:
+            doc_id: Document identifier
+            
+        Returns:
+            List of chunk identifiers
+        """
+        with self._reading():
+            results = self.collection.get(where={"doc_id": doc_id}, include=[])
+        return results["ids"] or []
+    
+    def get_embeddings_by_hash(self, chunk_hashes: List[str], batch_size: int = 500) -> Dict[str, List[float]]:
+        """
+        Find stored embeddings for chunks with the given content hashes
         
-        self.collection.add(
-            ids=ids,
-            embeddings=embeddings,
-            documents=chunks,
-            metadatas=enriched_metadata
-        )
+        Args:
+            chunk_hashes: Chunk text fingerprints
+            batch_size: Hashes per lookup
+            
+        Returns:
+            Mapping of chunk hash to embedding for every hash already stored
+        """
+        found = {}
+        unique_hashes = list(dict.fromkeys(chunk_hashes))
+        for start in range(0, len(unique_hashes), batch_size):
+            with self._reading():
+                results = self.collection.get(
+                    where={"chunk_hash": {"$in": unique_hashes[start:start + batch_size]}},
+                    include=["embeddings", "metadatas"]
+                )
+            for embedding, meta in zip(results["embeddings"], results["metadatas"]):
+                found[meta["chunk_hash"]] = [float(x) for x in embedding]
+        return found
+    
+    def sync_document(
+        self,
+        doc_id: str,
+        ids: List[str],
+        chunks: List[str],
+        metadata: List[Dict],
+        new_embeddings: Dict[str, List[float]]
+    ) -> Dict[str, int]:
+        """
+        Make the stored chunks of a document match a new chunk list
+        
+        Chunks whose ids are already stored keep their embeddings and only
+        get their metadata refreshed; stored chunks that are no longer
+        present are deleted.
+        
+        Args:
+            doc_id: Document identifier
+            ids: Chunk identifiers in document order
+            chunks: Chunk texts
+            metadata: Chunk metadata dictionaries
+            new_embeddings: Embeddings for ids not stored yet
+            
+        Returns:
+            Counts of added, updated and removed chunks
+        """
+        with self._writing():
+            existing = set(self.get_document_chunk_ids(doc_id))
+            added = [i for i, chunk_id in enumerate(ids) if chunk_id not in existing]
+            kept = [i for i, chunk_id in enumerate(ids) if chunk_id in existing]
+            removed = list(existing - set(ids))
+            
+            if added:
+                self.add_documents(
+                    doc_id=doc_id,
+                    chunks=[chunks[i] for i in added],
+                    embeddings=[new_embeddings[ids[i]] for i in added],
+                    metadata=[metadata[i] for i in added],
+                    ids=[ids[i] for i in added]
+                )
+            if kept:
+                self.collection.update(
+                    ids=[ids[i] for i in kept],
+                    metadatas=[{**metadata[i], "doc_id": doc_id} for i in kept]
+                )
+            if removed:
+                self.collection.delete(ids=removed)
+                self.lexical_index.remove(removed)
+            
+            return {"added": len(added), "updated": len(kept), "removed": len(removed)}
     
     def query(
         self,
@@ -76,28 +373,72 @@ class VectorStore:
             doc_id: Optional document ID to filter by
             
         Returns:
-            List of results with text, metadata, and distance
+            List of results with id, text, metadata, and distance
+        """
+        return self.query_many([query_embedding], top_k=top_k, doc_id=doc_id)[0]
+    
+    def query_many(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = 4,
+        doc_id: Optional[str] = None
+    ) -> List[List[Dict]]:
+        """
+        Query the vector store for several embeddings in one call
+        
+        Args:
+            query_embeddings: Query embedding vectors
+            top_k: Number of results to return per query
+            doc_id: Optional document ID to filter by
+            
+        Returns:
+            One list of results (id, text, metadata, distance) per query
         """
         where = {"doc_id": doc_id} if doc_id else None
         
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=top_k,
-            where=where
-        )
+        with self._reading():
+            results = self.collection.query(
+                query_embeddings=query_embeddings,
+                n_results=top_k,
+                where=where
+            )
         
         # Format results
         formatted_results = []
-        if results["ids"] and len(results["ids"][0]) > 0:
-            for i in range(len(results["ids"][0])):
-                formatted_results.append({
-                    "text": results["documents"][0][i],
-                    "metadata": results["metadatas"][0][i],
-                    "distance": results["distances"][0][i] if "distances" in results else None
-                })
+        for q in range(len(query_embeddings)):
+            formatted = []
+            if results["ids"] and len(results["ids"]) > q:
+                for i in range(len(results["ids"][q])):
+                    formatted.append({
+                        "id": results["ids"][q][i],
+                        "text": results["documents"][q][i],
+                        "metadata": results["metadatas"][q][i],
+                        "distance": results["distances"][q][i] if "distances" in results else None
+                    })
+            formatted_results.append(formatted)
         
         return formatted_results
     
+    def get_chunks(self, ids: List[str]) -> List[Dict]:
+        """
+        Fetch chunks by identifier
+        
+        Args:
+            ids: Chunk identifiers
+            
+        Returns:
+            Chunks in the order of ids (missing ones skipped), shaped like query results
+        """
+        if not ids:
+            return []
+        with self._reading():
+            results = self.collection.get(ids=ids, include=["documents", "metadatas"])
+        found = {
+            chunk_id: {"id": chunk_id, "text": text, "metadata": meta, "distance": None}
+            for chunk_id, text, meta in zip(results["ids"], results["documents"], results["metadatas"])
+        }
+        return [found[chunk_id] for chunk_id in ids if chunk_id in found]
+    
     def delete_document(self, doc_id: str):
         """
         Delete all chunks for a document
@@ -105,13 +446,15 @@ class VectorStore:
         Args:
             doc_id: Document identifier
         """
-        # Get all IDs for this document
-        results = self.collection.get(
-            where={"doc_id": doc_id}
-        )
-        
-        if results["ids"]:
-            self.collection.delete(ids=results["ids"])
+        with self._writing():
+            # Get all IDs for this document
+            results = self.collection.get(
+                where={"doc_id": doc_id}
+            )
+            
+            if results["ids"]:
+                self.collection.delete(ids=results["ids"])
+            self.lexical_index.remove_document(doc_id)
     
     def get_document_chunks(self, doc_id: str) -> List[str]:
         """
@@ -123,13 +466,36 @@ class VectorStore:
         Returns:
             List of chunk texts
         """
-        results = self.collection.get(
-            where={"doc_id": doc_id}
-        )
+        with self._reading():
+            results = self.collection.get(
+                where={"doc_id": doc_id}
+            )
         
         if results["documents"]:
             return results["documents"]
         return []
+    
+    def get_document_chunk_records(self, doc_id: str) -> List[Dict]:
+        """
+        Get all chunks for a document in document order
+        
+        Args:
+            doc_id: Document identifier
+            
+        Returns:
+            List of chunks with id, text and metadata, sorted by chunk_index
+        """
+        with self._reading():
+            results = self.collection.get(
+                where={"doc_id": doc_id},
+                include=["documents", "metadatas"]
+            )
+        records = [
+            {"id": chunk_id, "text": text, "metadata": meta}
+            for chunk_id, text, meta in zip(results["ids"], results["documents"] or [], results["metadatas"] or [])
+        ]
+        records.sort(key=lambda record: record["metadata"].get("chunk_index", 0))
+        return records
 
 
 
@@ -0,0 +1,65 @@
+import time
+
+from rag import reranker as reranker_module
+from rag.reranker import Reranker
+
+class SlowModel:
+    """Scores a chunk by its "relevance" field, slowly enough to exhaust a tiny budget"""
+    
+    def __init__(self, relevance):
+        self.relevance = relevance
+        self.calls = 0
+    
+    def predict(self, pairs, batch_size, show_progress_bar):
+        self.calls += 1
+        time.sleep(0.02)
+        return [self.relevance[text] for _, text in pairs]
+
+def make_reranker(monkeypatch, relevance, **kwargs):
+    model = SlowModel(relevance)
+    monkeypatch.setattr(reranker_module, "get_cross_encoder", lambda name: model)
+    return Reranker(model_name="fake", **kwargs), model
+
+def test_full_budget_orders_by_score(monkeypatch):
+    relevance = {"a": 0.1, "b": 0.9, "c": 0.5}
+    reranker, _ = make_reranker(monkeypatch, relevance, batch_size=2, budget_ms=10_000)
+    chunks = [{"text": text} for text in "abc"]
+    
+    result = reranker.rerank("query", chunks, top_k=2)
+    
+    assert [chunk["text"] for chunk in result] == ["b", "c"]
+    assert result[0]["rerank_score"] == 0.9
+    assert reranker.stats()["fallbacks"] == 0
+
+def test_exhausted_budget_reorders_scored_prefix(monkeypatch):
+    relevance = {"a": 0.1, "b": 0.9, "c": 0.5, "d": 0.8, "e": 0.7}
+    reranker, model = make_reranker(monkeypatch, relevance, batch_size=2, budget_ms=1)
+    chunks = [{"text": text} for text in "abcde"]
+    
+    result = reranker.rerank("query", chunks, top_k=4)
+    
+    # Only the first batch fits: it is ordered by score, the rest keep retrieval order
+    assert model.calls == 1
+    assert [chunk["text"] for chunk in result] == ["b", "a", "c", "d"]
+    assert [chunk.get("rerank_score") for chunk in result] == [0.9, 0.1, None, None]
+    assert reranker.stats()["fallbacks"] == 1
+
+def test_exhausted_budget_truncates_to_top_k(monkeypatch):
+    relevance = {"a": 0.1, "b": 0.9, "c": 0.5, "d": 0.8}
+    reranker, _ = make_reranker(monkeypatch, relevance, batch_size=3, budget_ms=1)
+    chunks = [{"text": text} for text in "abcd"]
+    
+    result = reranker.rerank("query", chunks, top_k=2)
+    
+    assert [chunk["text"] for chunk in result] == ["b", "c"]
+
+def test_zero_budget_is_kept(monkeypatch):
+    monkeypatch.setenv("RERANK_BUDGET_MS", "150")
+    relevance = {"a": 0.1, "b": 0.9, "c": 0.5}
+    reranker, model = make_reranker(monkeypatch, relevance, batch_size=1, budget_ms=0)
+    
+    assert reranker.budget_ms == 0
+    # The first batch calibrates the cost estimate; nothing after it fits
+    result = reranker.rerank("query", [{"text": text} for text in "abc"], top_k=3)
+    assert model.calls == 1
+    assert [chunk["text"] for chunk in result] == ["a", "b", "c"]
@@ -0,0 +1,33 @@
+import time
+
+from rag.semantic_cache import SemanticCache
+
+def test_zero_threshold_is_kept(monkeypatch):
+    monkeypatch.setenv("SEMANTIC_CACHE_THRESHOLD", "0.95")
+    cache = SemanticCache(threshold=0.0, ttl_seconds=0.0)
+    
+    assert cache.threshold == 0.0
+    assert cache.ttl_seconds == 0.0
+
+def test_hit_on_similar_query():
+    cache = SemanticCache(threshold=0.9, max_entries=4, ttl_seconds=60)
+    cache.store("q", [1.0, 0.0], "answer", [])
+    
+    entry = cache.lookup([0.99, 0.05])
+    
+    assert entry["answer"] == "answer"
+    assert cache.lookup([0.0, 1.0]) is None
+
+def test_expired_best_match_falls_back_to_live_entry():
+    cache = SemanticCache(threshold=0.9, max_entries=4, ttl_seconds=60)
+    cache.store("old", [1.0, 0.0], "stale", [])
+    cache.store("new", [0.98, 0.2], "fresh", [])
+    # Age the exact match past the TTL; the live entry is the next best
+    first_slot = next(iter(cache._entries))
+    cache._entries[first_slot]["created_at"] = time.time() - 120
+    
+    entry = cache.lookup([1.0, 0.0])
+    
+    assert entry["answer"] == "fresh"
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["evictions"] == 1
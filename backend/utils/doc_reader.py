@@ -1,33 +1,90 @@
 """
 DOCX text extraction utility
 """
+import io
 from docx import Document
-from typing import Optional
+from docx.table import Table
+from typing import BinaryIO, Dict, Iterator, List, Tuple, Union
+
+# Blocks are separated by a blank line so paragraph breaks survive chunking
+BLOCK_SEPARATOR = "\n\n"
 
 class DOCXReader:
     """Utility for reading DOCX files"""
     
     @staticmethod
-    def extract_text(file_path: str) -> str:
+    def _heading_level(paragraph) -> int:
+        """Outline level of a heading paragraph, or 0 for body text"""
+        style = paragraph.style.name if paragraph.style is not None else ""
+        if style == "Title":
+            return 1
+        if style.startswith("Heading"):
+            level = style.split()[-1]
+            return int(level) if level.isdigit() else 1
+        return 0
+    
+    @staticmethod
+    def _table_text(table: Table) -> str:
+        """One line per row, cells separated by " | " (merged cells once)"""
+        rows: List[str] = []
+        for row in table.rows:
+            cells, seen = [], set()
+            for cell in row.cells:
+                if id(cell._tc) in seen:
+                    continue
+                seen.add(id(cell._tc))
+                cells.append(" ".join(cell.text.split()))
+            if any(cells):
+                rows.append(" | ".join(cells))
+        return "\n".join(rows)
+    
+    @staticmethod
+    def iter_blocks(source: Union[str, bytes, BinaryIO]) -> Iterator[Tuple[str, Dict]]:
         """
-        Extract text from DOCX file
+        Extract paragraphs, headings and tables in document order
         
         Args:
-            file_path: Path to DOCX file
+            source: Path, bytes or binary stream of the DOCX file
             
-        Returns:
-            Extracted text
+        Yields:
+            Tuples of (block text, metadata) where metadata holds the
+            "section" path of enclosing headings (e.g. "Leave > Sick leave")
+            and the "heading_level" of the innermost one (0 before any heading)
         """
         try:
-            doc = Document(file_path)
-            text = ""
-            
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
+            if isinstance(source, (bytes, bytearray, memoryview)):
+                source = io.BytesIO(source)
+            doc = Document(source)
+            headings: List[Tuple[int, str]] = []
             
-            return text.strip()
+            for block in doc.iter_inner_content():
+                if isinstance(block, Table):
+                    text = DOCXReader._table_text(block)
+                else:
+                    text = block.text.strip()
+                    level = DOCXReader._heading_level(block)
+                    if level and text:
+                        while headings and headings[-1][0] >= level:
+                            headings.pop()
+                        headings.append((level, text))
+                if not text:
+                    continue
+                yield text, {
+                    "section": " > ".join(title for _, title in headings),
+                    "heading_level": headings[-1][0] if headings else 0
+                }
         except Exception as e:
             raise Exception(f"Error reading DOCX: {str(e)}")
-
-
-
+    
+    @staticmethod
+    def extract_text(source: Union[str, bytes, BinaryIO]) -> str:
+        """
+        Extract text from DOCX file
+        
+        Args:
+            source: Path, bytes or binary stream of the DOCX file
+            
+        Returns:
+            Extracted text
+        """
+        return BLOCK_SEPARATOR.join(text for text, _ in DOCXReader.iter_blocks(source))
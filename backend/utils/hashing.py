@@ -0,0 +1,31 @@
+"""
+Content fingerprints for uploads and chunks
+"""
+import hashlib
+
+def hash_bytes(data: bytes) -> str:
+    """
+    SHA-256 fingerprint of raw bytes
+    
+    Args:
+        data: File contents
+        
+    Returns:
+        Hex digest
+    """
+    return hashlib.sha256(data).hexdigest()
+
+def hash_text(text: str) -> str:
+    """
+    SHA-256 fingerprint of a text chunk
+    
+    Args:
+        text: Chunk text
+        
+    Returns:
+        Hex digest
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+
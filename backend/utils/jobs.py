@@ -0,0 +1,197 @@
+"""
+In-memory registry of background jobs and their per-stage progress
+"""
+import json
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+class JobManager:
+    """Tracks background jobs so clients can poll their status"""
+    
+    def __init__(self, max_finished_jobs: int = 500, db_path: Optional[str] = None, stale_after: float = 600):
+        """
+        Initialize job manager
+        
+        With db_path, every change is also written to a jobs table there, so
+        a job can be polled (and a duplicate upload detected) through any
+        worker process, not just the one running it.
+        
+        Args:
+            max_finished_jobs: Completed/failed jobs kept for polling before the oldest are dropped
+            db_path: SQLite database shared with other processes (None keeps jobs in memory only)
+            stale_after: Seconds without progress after which another process's
+                queued/running job is assumed dead
+        """
+        self.max_finished_jobs = max_finished_jobs
+        self.stale_after = stale_after
+        self._jobs: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.db_path = db_path
+        self.db = None
+        if db_path:
+            from .storage import connect
+            self.db = connect(db_path)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "job_id TEXT PRIMARY KEY, status TEXT NOT NULL, updated_at TEXT NOT NULL, data TEXT NOT NULL)"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, updated_at)")
+            self.db.commit()
+    
+    def _persist(self, job: Dict):
+        """Write a job to the shared table (caller holds the lock)"""
+        if self.db is None:
+            return
+        with self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, status, updated_at, data) VALUES (?, ?, ?, ?)",
+                (job["job_id"], job["status"], job["updated_at"], json.dumps(job))
+            )
+    
+    def reopen(self):
+        """Open a new connection, e.g. in a worker forked from the process that opened this one"""
+        if self.db_path:
+            from .storage import connect
+            with self._lock:
+                self.db = connect(self.db_path)
+    
+    def create(self, stages: List[str], **info) -> str:
+        """
+        Register a new queued job
+        
+        Args:
+            stages: Ordered stage names
+            **info: Extra fields reported with the job (filename, doc_id, ...)
+            
+        Returns:
+            Job identifier
+        """
+        job_id = str(uuid.uuid4())
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "status": "queued",
+                "stages": {stage: {"status": "pending", "progress": 0.0} for stage in stages},
+                "error": None,
+                "result": None,
+                "created_at": now,
+                "updated_at": now,
+                **info
+            }
+            self._persist(self._jobs[job_id])
+        return job_id
+    
+    def update_stage(self, job_id: str, stage: str, status: str = "running", progress: Optional[float] = None):
+        """
+        Record progress of one stage
+        
+        Args:
+            job_id: Job identifier
+            stage: Stage name
+            status: pending, running or completed
+            progress: Fraction of the stage done (0.0-1.0)
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job:
+                return
+            job["status"] = "running"
+            job["stages"][stage]["status"] = status
+            if progress is not None:
+                job["stages"][stage]["progress"] = round(progress, 3)
+            elif status == "completed":
+                job["stages"][stage]["progress"] = 1.0
+            job["updated_at"] = datetime.now().isoformat()
+            self._persist(job)
+    
+    def complete(self, job_id: str, result: Dict):
+        """Mark a job as completed with its result"""
+        self._finish(job_id, "completed", result=result)
+    
+    def fail(self, job_id: str, error: str):
+        """Mark a job as failed"""
+        self._finish(job_id, "failed", error=error)
+    
+    def _finish(self, job_id: str, status: str, result: Optional[Dict] = None, error: Optional[str] = None):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job:
+                return
+            job["status"] = status
+            job["result"] = result
+            job["error"] = error
+            if status == "failed":
+                for stage in job["stages"].values():
+                    if stage["status"] == "running":
+                        stage["status"] = "failed"
+            job["updated_at"] = datetime.now().isoformat()
+            self._persist(job)
+            self._prune()
+    
+    def _prune(self):
+        """Drop the oldest finished jobs beyond max_finished_jobs"""
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in ("completed", "failed")]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self._jobs[job_id]
+        if self.db is not None:
+            with self.db:
+                self.db.execute(
+                    "DELETE FROM jobs WHERE status IN ('completed', 'failed') AND job_id NOT IN ("
+                    "SELECT job_id FROM jobs WHERE status IN ('completed', 'failed') "
+                    "ORDER BY updated_at DESC LIMIT ?)",
+                    (self.max_finished_jobs,)
+                )
+    
+    def get(self, job_id: str) -> Optional[Dict]:
+        """
+        Get a snapshot of a job
+        
+        Args:
+            job_id: Job identifier
+            
+        Returns:
+            Job dictionary, or None if unknown
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                return {**job, "stages": {name: dict(stage) for name, stage in job["stages"].items()}}
+            if self.db is not None:
+                # Run by another worker
+                row = self.db.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+                if row:
+                    return json.loads(row[0])
+        return None
+    
+    def find_active(self, **match) -> Optional[Dict]:
+        """
+        Find a queued or running job whose fields match
+        
+        Args:
+            **match: Field values to compare (e.g. content_hash="...")
+            
+        Returns:
+            Job dictionary, or None
+        """
+        with self._lock:
+            for job in self._jobs.values():
+                if job["status"] in ("queued", "running") and all(job.get(k) == v for k, v in match.items()):
+                    return {**job, "stages": {name: dict(stage) for name, stage in job["stages"].items()}}
+            if self.db is not None:
+                cutoff = (datetime.now() - timedelta(seconds=self.stale_after)).isoformat()
+                for (data,) in self.db.execute(
+                    "SELECT data FROM jobs WHERE status IN ('queued', 'running') AND updated_at > ?", (cutoff,)
+                ):
+                    job = json.loads(data)
+                    if job["job_id"] not in self._jobs and all(job.get(k) == v for k, v in match.items()):
+                        return job
+        return None
+    
+    def active_count(self) -> int:
+        """Number of queued or running jobs"""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job["status"] in ("queued", "running"))
@@ -0,0 +1,66 @@
+"""
+Advisory file locks for state shared by several worker processes
+"""
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+class FileLock:
+    """Shared/exclusive lock on a lock file, held across processes"""
+    
+    def __init__(self, path: str):
+        """
+        Initialize lock
+        
+        Every acquisition opens its own descriptor, so threads of one
+        process exclude each other the same way processes do; a thread
+        must not re-acquire a lock it already holds. On Windows shared
+        acquisitions are exclusive.
+        
+        Args:
+            path: Lock file (created if missing)
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+    
+    @contextmanager
+    def _acquire(self, exclusive: bool):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            else:
+                # LK_LOCK gives up after ten seconds; keep waiting
+                while True:
+                    try:
+                        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        time.sleep(0.05)
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                try:
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+                except OSError:
+                    pass
+            os.close(fd)
+    
+    def shared(self):
+        """Context manager held while reading"""
+        return self._acquire(exclusive=False)
+    
+    def exclusive(self):
+        """Context manager held while writing"""
+        return self._acquire(exclusive=True)
@@ -0,0 +1,284 @@
+"""
+Process-wide latency histograms, counters and gauges in Prometheus text format
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+# Seconds; stages range from sub-millisecond cache lookups to multi-second LLM calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_METRIC = "clarifyai_stage_duration_seconds"
+
+HELP = {
+    STAGE_METRIC: "Time spent in one stage of request handling or ingestion",
+    "clarifyai_http_request_duration_seconds": "HTTP request latency by route",
+    "clarifyai_embedded_texts_total": "Texts run through the embedding model",
+    "clarifyai_llm_requests_total": "LLM calls by provider and outcome",
+    "clarifyai_llm_tokens_total": "LLM tokens by provider and kind (prompt, completion)",
+    "clarifyai_context_tokens_total": "Tokens of retrieved context packed into prompts",
+    "clarifyai_context_chunks_total": "Chunks packed into prompts",
+    "clarifyai_ingested_chunks_total": "Chunks of ingested documents by source (embedded, reused, unchanged)",
+}
+
+_NOOP = nullcontext()
+
+# Stage durations (ms) of the request being handled, when timing headers are on
+_trace: ContextVar[Optional[Dict[str, float]]] = ContextVar("metrics_trace", default=None)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+def _format_number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class _Stage:
+    """Times a block into the stage histogram and the request trace"""
+    
+    __slots__ = ("metrics", "name", "labels", "start")
+    
+    def __init__(self, metrics: "Metrics", name: str, labels: Dict[str, str]):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.metrics.observe_stage(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+class Metrics:
+    """Registry of histograms, counters and scrape-time gauges"""
+    
+    def __init__(self, enabled: Optional[bool] = None, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Initialize registry
+        
+        When disabled, stage() returns a shared no-op context manager and
+        observe/inc return immediately, so instrumented code pays about one
+        attribute check per call. Stage timings still reach the request
+        trace if one was started (timing headers work either way).
+        
+        Args:
+            enabled: Record metrics (defaults to METRICS_ENABLED or true)
+            buckets: Histogram upper bounds in seconds
+        """
+        if enabled is None:
+            enabled = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # name -> labels -> [bucket counts..., +Inf count], sum
+        self._histograms: Dict[str, Dict[Labels, Tuple[List[int], List[float]]]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._collectors: Dict[str, Tuple[str, Callable, Optional[str], str]] = {}
+    
+    # Recording
+    
+    def stage(self, name: str, **labels):
+        """
+        Context manager timing one stage
+        
+        Args:
+            name: Stage name (the "stage" label)
+            **labels: Extra labels, e.g. provider="groq"
+        """
+        if not self.enabled and _trace.get() is None:
+            return _NOOP
+        return _Stage(self, name, labels)
+    
+    def observe_stage(self, name: str, seconds: float, **labels):
+        """Record a stage duration measured elsewhere"""
+        trace = _trace.get()
+        if trace is not None:
+            trace[name] = trace.get(name, 0.0) + seconds * 1000
+        if self.enabled:
+            self.observe(STAGE_METRIC, seconds, stage=name, **labels)
+    
+    def observe(self, name: str, seconds: float, **labels):
+        """Add a value to a histogram"""
+        if not self.enabled:
+            return
+        key = _labels(labels)
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            entry = series.get(key)
+            if entry is None:
+                entry = series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += seconds
+    
+    def inc(self, name: str, value: float = 1.0, **labels):
+        """Add to a counter"""
+        if not self.enabled or not value:
+            return
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+    
+    def collect(
+        self,
+        name: str,
+        help_text: str,
+        read: Callable[[], Union[float, Dict[str, float]]],
+        label: Optional[str] = None,
+        kind: str = "gauge"
+    ):
+        """
+        Register a value read at scrape time
+        
+        Used for figures components already keep (queue depths, cache
+        hits), so the request path does no extra bookkeeping for them.
+        
+        Args:
+            name: Metric name
+            help_text: HELP line
+            read: Returns the value, or a mapping of label value to value
+            label: Label name for a mapping
+            kind: Prometheus type, "gauge" or "counter"
+        """
+        self._collectors[name] = (help_text, read, label, kind)
+    
+    # Request traces
+    
+    def start_trace(self):
+        """Collect stage timings of the current request; returns a token for end_trace"""
+        return _trace.set({})
+    
+    def end_trace(self, token) -> Dict[str, float]:
+        """Stage durations in milliseconds recorded since start_trace"""
+        trace = _trace.get() or {}
+        _trace.reset(token)
+        return trace
+    
+    @staticmethod
+    def server_timing(trace: Dict[str, float], total_ms: Optional[float] = None) -> str:
+        """Server-Timing header value for a trace"""
+        entries = [f"{name};dur={ms:.2f}" for name, ms in trace.items()]
+        if total_ms is not None:
+            entries.append(f"total;dur={total_ms:.2f}")
+        return ", ".join(entries)
+    
+    # Exposition
+    
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines: List[str] = []
+        with self._lock:
+            histograms = {
+                name: {key: (list(counts), total[0]) for key, (counts, total) in series.items()}
+                for name, series in self._histograms.items()
+            }
+            counters = {name: dict(series) for name, series in self._counters.items()}
+        
+        for name in sorted(histograms):
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, (counts, total) in sorted(histograms[name].items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else _format_number(bound)
+                    lines.append(f"{name}_bucket{_format_labels(key, ('le', le))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(key)} {_format_number(total)}")
+                lines.append(f"{name}_count{_format_labels(key)} {cumulative}")
+        
+        for name in sorted(counters):
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(counters[name].items()):
+                lines.append(f"{name}{_format_labels(key)} {_format_number(value)}")
+        
+        for name in sorted(self._collectors):
+            help_text, read, label, kind = self._collectors[name]
+            try:
+                value = read()
+            except Exception:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if isinstance(value, dict):
+                for label_value, item in sorted(value.items()):
+                    lines.append(f"{name}{_format_labels(((label, str(label_value)),))} {_format_number(item or 0)}")
+            else:
+                lines.append(f"{name} {_format_number(value or 0)}")
+        return "\n".join(lines) + "\n"
+
+# Shared by every module of the process
+metrics = Metrics()
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request by route
+    
+    Wraps send instead of the request/response objects, so streamed
+    responses pass through untouched and no extra task is started.
+    """
+    
+    def __init__(self, app, registry: Metrics = metrics, timing_headers: bool = False):
+        """
+        Initialize middleware
+        
+        Args:
+            app: ASGI application to wrap
+            registry: Metrics registry to record into
+            timing_headers: Report the request's stage timings in a Server-Timing header
+        """
+        self.app = app
+        self.registry = registry
+        self.timing_headers = timing_headers
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        token = self.registry.start_trace() if self.timing_headers else None
+        start = time.perf_counter()
+        status = 500
+        
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if token is not None:
+                    # Stages finished so far; a streamed body's are not in yet
+                    value = self.registry.server_timing(_trace.get() or {}, (time.perf_counter() - start) * 1000)
+                    headers = [*message.get("headers", []), (b"server-timing", value.encode("latin-1"))]
+                    message = {**message, "headers": headers}
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            if token is not None:
+                self.registry.end_trace(token)
+            # The router records the matched route in the shared scope
+            route = scope.get("route")
+            self.registry.observe(
+                "clarifyai_http_request_duration_seconds",
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=status
+            )
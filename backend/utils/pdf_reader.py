@@ -1,33 +1,73 @@
 """
 PDF text extraction utility
 """
+import io
 from pypdf import PdfReader
-from typing import Optional
+from typing import BinaryIO, Iterator, Optional, Tuple, Union
+
+# A file path, the file's bytes, or a binary stream
+PDFSource = Union[str, bytes, BinaryIO]
 
 class PDFReader:
     """Utility for reading PDF files"""
     
     @staticmethod
-    def extract_text(file_path: str) -> str:
+    def _open(source: PDFSource) -> PdfReader:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = io.BytesIO(source)
+        return PdfReader(source)
+    
+    @staticmethod
+    def page_count(source: PDFSource) -> int:
         """
-        Extract text from PDF file
+        Count the pages of a PDF file
         
         Args:
-            file_path: Path to PDF file
+            source: Path, bytes or binary stream of the PDF
             
         Returns:
-            Extracted text
+            Number of pages
         """
         try:
-            reader = PdfReader(file_path)
-            text = ""
-            
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
+            return len(PDFReader._open(source).pages)
+        except Exception as e:
+            raise Exception(f"Error reading PDF: {str(e)}")
+    
+    @staticmethod
+    def iter_pages(source: PDFSource, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+        """
+        Extract text page by page
+        
+        Only one page's text is held at a time, so callers can process a
+        large document without building the whole text first.
+        
+        Args:
+            source: Path, bytes or binary stream of the PDF
+            start: Index of the first page to read
+            end: Index after the last page to read (defaults to the last page)
             
-            return text.strip()
+        Yields:
+            Tuples of (1-based page number, page text) for pages with text
+        """
+        try:
+            reader = PDFReader._open(source)
+            end = len(reader.pages) if end is None else min(end, len(reader.pages))
+            for index in range(start, end):
+                text = (reader.pages[index].extract_text() or "").strip()
+                if text:
+                    yield index + 1, text
         except Exception as e:
             raise Exception(f"Error reading PDF: {str(e)}")
-
-
-
+    
+    @staticmethod
+    def extract_text(source: PDFSource) -> str:
+        """
+        Extract text from PDF file
+        
+        Args:
+            source: Path, bytes or binary stream of the PDF
+            
+        Returns:
+            Extracted text
+        """
+        return "\n".join(text for _, text in PDFReader.iter_pages(source))
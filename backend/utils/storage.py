@@ -0,0 +1,320 @@
+"""
+SQLite-backed storage of document records and chat history
+"""
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+def connect(path: str) -> sqlite3.Connection:
+    """
+    Open a database shared by every worker process
+    
+    WAL lets readers run alongside one writer, and busy_timeout makes a
+    writer wait for another process's transaction instead of failing.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.execute("PRAGMA busy_timeout=10000")
+    return db
+
+class DocumentStore:
+    """Uploaded document records, indexed by doc_id, content hash, filename and uploader"""
+    
+    def __init__(self, path: Optional[str] = None):
+        """
+        Open or create the documents table
+        
+        Args:
+            path: SQLite database file (defaults to APP_DB_PATH or ./app_data.sqlite3)
+        """
+        self.path = path or os.getenv("APP_DB_PATH", "./app_data.sqlite3")
+        self._lock = threading.Lock()
+        self.db = connect(self.path)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_id TEXT PRIMARY KEY,
+                filename TEXT NOT NULL,
+                upload_date TEXT NOT NULL,
+                chunk_count INTEGER NOT NULL,
+                content_hash TEXT,
+                username TEXT,
+                summary TEXT
+            );
+            CREATE INDEX IF NOT EXISTS documents_content_hash ON documents (content_hash);
+            CREATE INDEX IF NOT EXISTS documents_filename ON documents (filename);
+            CREATE INDEX IF NOT EXISTS documents_username ON documents (username);
+        """)
+    
+    _COLUMNS = "doc_id, filename, upload_date, chunk_count, content_hash, username, summary"
+    
+    @staticmethod
+    def _record(row) -> Dict:
+        doc = dict(zip(("doc_id", "filename", "upload_date", "chunk_count", "content_hash", "username"), row))
+        if row[6]:
+            doc["summary"] = json.loads(row[6])
+        return doc
+    
+    def _find(self, where: str, params) -> Optional[Dict]:
+        with self._lock:
+            row = self.db.execute(
+                f"SELECT {self._COLUMNS} FROM documents WHERE {where} ORDER BY rowid LIMIT 1", params
+            ).fetchone()
+        return self._record(row) if row else None
+    
+    def get(self, doc_id: str) -> Optional[Dict]:
+        """Document record, or None"""
+        return self._find("doc_id = ?", (doc_id,))
+    
+    def find_by_hash(self, content_hash: str) -> Optional[Dict]:
+        """Document with exactly this content, or None"""
+        return self._find("content_hash = ?", (content_hash,))
+    
+    def put(self, doc: Dict):
+        """
+        Insert or replace a document record
+        
+        A revision keeps the document's place in the listing; its summary
+        is cleared, since it described the previous content.
+        
+        Args:
+            doc: Record with doc_id, filename, upload_date, chunk_count,
+                content_hash and username
+        """
+        with self._lock, self.db:
+            self.db.execute(
+                f"""INSERT INTO documents ({self._COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (doc_id) DO UPDATE SET
+                    filename = excluded.filename, upload_date = excluded.upload_date,
+                    chunk_count = excluded.chunk_count, content_hash = excluded.content_hash,
+                    username = excluded.username, summary = excluded.summary""",
+                (
+                    doc["doc_id"], doc["filename"], doc["upload_date"], doc["chunk_count"],
+                    doc.get("content_hash"), doc.get("username"),
+                    json.dumps(doc["summary"]) if doc.get("summary") else None
+                )
+            )
+    
+    def set_summary(self, doc_id: str, content_hash: str, summary: Dict) -> bool:
+        """
+        Store a summary if the document still has the content it describes
+        
+        Args:
+            doc_id: Document identifier
+            content_hash: Content the summary was generated from
+            summary: Summary entry (status, text, ...)
+        
+        Returns:
+            False if the document was deleted or revised in the meantime
+        """
+        with self._lock, self.db:
+            cursor = self.db.execute(
+                "UPDATE documents SET summary = ? WHERE doc_id = ? AND content_hash = ?",
+                (json.dumps(summary), doc_id, content_hash)
+            )
+        return cursor.rowcount > 0
+    
+    def delete(self, doc_id: str) -> bool:
+        """Remove a document record; False if it did not exist"""
+        with self._lock, self.db:
+            cursor = self.db.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+        return cursor.rowcount > 0
+    
+    def list(self, limit: Optional[int] = None, offset: int = 0, username: Optional[str] = None) -> List[Dict]:
+        """
+        Document records in upload order
+        
+        Args:
+            limit: Most records returned (None for all)
+            offset: Records skipped
+            username: Only documents uploaded by this user
+        
+        Returns:
+            Document records
+        """
+        where, params = ("WHERE username = ?", [username]) if username else ("", [])
+        with self._lock:
+            rows = self.db.execute(
+                f"SELECT {self._COLUMNS} FROM documents {where} ORDER BY rowid LIMIT ? OFFSET ?",
+                params + [-1 if limit is None else limit, offset]
+            ).fetchall()
+        return [self._record(row) for row in rows]
+    
+    def count(self) -> int:
+        with self._lock:
+            return self.db.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+    
+    def reopen(self):
+        """Open a new connection, e.g. in a worker forked from the process that opened this one"""
+        with self._lock:
+            self.db = connect(self.path)
+    
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+class ChatHistoryStore:
+    """Per-user question/answer log with a retention policy"""
+    
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        retention_days: Optional[int] = None,
+        max_entries_per_user: Optional[int] = None,
+        compact_every: Optional[int] = None
+    ):
+        """
+        Open or create the history table
+        
+        Entries keep the ids of the chunks their answer was built from, not
+        the chunk text, which is looked up again when history is read.
+        Entries older than retention_days, and beyond the newest
+        max_entries_per_user of each user, are deleted by compact(), which
+        runs on open and after every compact_every appends.
+        
+        Args:
+            path: SQLite database file (defaults to APP_DB_PATH or ./app_data.sqlite3)
+            retention_days: Age at which entries are dropped
+                (defaults to HISTORY_RETENTION_DAYS or 90; 0 keeps them)
+            max_entries_per_user: Entries kept per user
+                (defaults to HISTORY_MAX_ENTRIES_PER_USER or 1000; 0 keeps all)
+            compact_every: Appends between compactions (defaults to HISTORY_COMPACT_EVERY or 500)
+        """
+        self.path = path or os.getenv("APP_DB_PATH", "./app_data.sqlite3")
+        if retention_days is None:
+            retention_days = int(os.getenv("HISTORY_RETENTION_DAYS", "90"))
+        if max_entries_per_user is None:
+            max_entries_per_user = int(os.getenv("HISTORY_MAX_ENTRIES_PER_USER", "1000"))
+        self.retention_days = retention_days
+        self.max_entries_per_user = max_entries_per_user
+        self.compact_every = compact_every or int(os.getenv("HISTORY_COMPACT_EVERY", "500"))
+        
+        self._lock = threading.Lock()
+        self._appends = 0
+        self.compacted = 0
+        self.db = connect(self.path)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS chat_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT NOT NULL,
+                query TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                chunk_ids TEXT NOT NULL,
+                sources TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS chat_history_user ON chat_history (username, id);
+            CREATE INDEX IF NOT EXISTS chat_history_timestamp ON chat_history (timestamp);
+        """)
+        self.compact()
+    
+    def append(self, username: str, query: str, answer: str, chunk_ids: List[str], sources: List[str]):
+        """
+        Record a question/answer pair
+        
+        Args:
+            username: User who asked
+            query: Question
+            answer: Answer given
+            chunk_ids: Identifiers of the chunks used as context
+            sources: Source filename of each chunk
+        """
+        with self._lock:
+            with self.db:
+                self.db.execute(
+                    "INSERT INTO chat_history (username, query, answer, timestamp, chunk_ids, sources) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (username, query, answer, datetime.now().isoformat(), json.dumps(chunk_ids), json.dumps(sources))
+                )
+            self._appends += 1
+            due = self._appends % self.compact_every == 0
+        if due:
+            self.compact()
+    
+    def list(self, username: str, limit: int = 100, offset: int = 0) -> List[Dict]:
+        """
+        A page of a user's history, oldest first
+        
+        Args:
+            username: User whose history is read
+            limit: Most entries returned
+            offset: Newest entries skipped (offset=0 ends with the latest entry)
+        
+        Returns:
+            Entries with query, answer, timestamp, chunk_ids and sources
+        """
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT query, answer, timestamp, chunk_ids, sources FROM chat_history "
+                "WHERE username = ? ORDER BY id DESC LIMIT ? OFFSET ?",
+                (username, limit, offset)
+            ).fetchall()
+        return [
+            {
+                "query": query,
+                "answer": answer,
+                "timestamp": timestamp,
+                "chunk_ids": json.loads(chunk_ids),
+                "sources": json.loads(sources)
+            }
+            for query, answer, timestamp, chunk_ids, sources in reversed(rows)
+        ]
+    
+    def count(self, username: Optional[str] = None) -> int:
+        """Entries stored for a user, or for everyone"""
+        with self._lock:
+            if username is None:
+                return self.db.execute("SELECT COUNT(*) FROM chat_history").fetchone()[0]
+            return self.db.execute("SELECT COUNT(*) FROM chat_history WHERE username = ?", (username,)).fetchone()[0]
+    
+    def compact(self) -> int:
+        """
+        Apply the retention policy
+        
+        Returns:
+            Number of entries deleted
+        """
+        deleted = 0
+        with self._lock, self.db:
+            if self.retention_days > 0:
+                cutoff = (datetime.now() - timedelta(days=self.retention_days)).isoformat()
+                deleted += self.db.execute("DELETE FROM chat_history WHERE timestamp < ?", (cutoff,)).rowcount
+            if self.max_entries_per_user > 0:
+                users = [
+                    username for (username,) in self.db.execute(
+                        "SELECT username FROM chat_history GROUP BY username HAVING COUNT(*) > ?",
+                        (self.max_entries_per_user,)
+                    )
+                ]
+                for username in users:
+                    deleted += self.db.execute(
+                        "DELETE FROM chat_history WHERE username = ? AND id <= ("
+                        "SELECT id FROM chat_history WHERE username = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                        (username, username, self.max_entries_per_user)
+                    ).rowcount
+            self.compacted += deleted
+        return deleted
+    
+    def stats(self) -> Dict:
+        """Stored entries and retention settings"""
+        return {
+            "entries": self.count(),
+            "retention_days": self.retention_days,
+            "max_entries_per_user": self.max_entries_per_user,
+            "compacted": self.compacted
+        }
+    
+    def reopen(self):
+        """Open a new connection, e.g. in a worker forked from the process that opened this one"""
+        with self._lock:
+            self.db = connect(self.path)
+    
+    def close(self):
+        with self._lock:
+            self.db.close()
@@ -0,0 +1,78 @@
+"""
+Bounded, memory-capped reading of uploaded files
+"""
+import hashlib
+import os
+import tempfile
+from typing import BinaryIO, Optional, Tuple
+
+from utils.metrics import metrics
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the configured size limit"""
+
+class UploadReader:
+    """Reads uploads in fixed-size chunks into a spooled buffer"""
+    
+    def __init__(
+        self,
+        max_bytes: Optional[int] = None,
+        chunk_bytes: Optional[int] = None,
+        spool_bytes: Optional[int] = None
+    ):
+        """
+        Initialize upload reader
+        
+        The upload is copied chunk by chunk into a SpooledTemporaryFile and
+        hashed on the way. Small files stay in memory; larger ones roll over
+        to an anonymous temporary file that the OS removes as soon as it is
+        closed (or the process dies), so nothing is left in the working
+        directory when a request fails.
+        
+        Args:
+            max_bytes: Largest accepted upload (defaults to UPLOAD_MAX_BYTES or 50 MB)
+            chunk_bytes: Bytes read per step (defaults to UPLOAD_CHUNK_BYTES or 1 MB)
+            spool_bytes: Bytes kept in memory before spilling to disk
+                (defaults to UPLOAD_SPOOL_BYTES or 8 MB)
+        """
+        self.max_bytes = max_bytes or int(os.getenv("UPLOAD_MAX_BYTES", str(50 * 1024 * 1024)))
+        self.chunk_bytes = chunk_bytes or int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+        self.spool_bytes = spool_bytes or int(os.getenv("UPLOAD_SPOOL_BYTES", str(8 * 1024 * 1024)))
+    
+    async def read(self, file) -> Tuple[BinaryIO, str, int]:
+        """
+        Copy an upload into a spooled buffer
+        
+        Args:
+            file: FastAPI UploadFile
+        
+        Returns:
+            Tuple of (buffer positioned at the start, SHA-256 hex digest, size in bytes);
+            the caller owns the buffer and must close it
+        
+        Raises:
+            UploadTooLarge: If the upload is larger than max_bytes
+        """
+        if file.size is not None and file.size > self.max_bytes:
+            raise UploadTooLarge(f"File exceeds the {self.max_bytes} byte upload limit")
+        
+        buffer = tempfile.SpooledTemporaryFile(max_size=self.spool_bytes)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with metrics.stage("upload_read"):
+                while True:
+                    chunk = await file.read(self.chunk_bytes)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise UploadTooLarge(f"File exceeds the {self.max_bytes} byte upload limit")
+                    digest.update(chunk)
+                    buffer.write(chunk)
+        except BaseException:
+            buffer.close()
+            raise
+        
+        buffer.seek(0)
+        return buffer, digest.hexdigest(), size
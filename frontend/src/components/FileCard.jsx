@@ -14,7 +14,11 @@ export default function FileCard({ document, onDelete, onSummarize, deleting })
           </div>
           <div className="flex-1">
             <h3 className="font-bold text-white truncate">{document.filename}</h3>
-            <p className="text-sm text-white/60">{document.chunk_count} chunks</p>
+            <p className="text-sm text-white/60">
+              {document.chunk_count} chunks
+              {document.summary_status === 'ready' && ' · summary ready'}
+              {document.summary_status === 'pending' && ' · summarizing…'}
+            </p>
           </div>
         </div>
       </div>
@@ -7,10 +7,13 @@ import FileCard from '../components/FileCard'
 import { Trash2, FileText, Loader2 } from 'lucide-react'
 
 const API_BASE = 'http://localhost:8000'
+const PAGE_SIZE = 100
 
 export default function Documents({ user }) {
   const [documents, setDocuments] = useState([])
+  const [total, setTotal] = useState(0)
   const [loading, setLoading] = useState(true)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [deleting, setDeleting] = useState(null)
   const navigate = useNavigate()
 
@@ -18,14 +21,17 @@ export default function Documents({ user }) {
     loadDocuments()
   }, [])
 
-  const loadDocuments = async () => {
+  // The list is paged in upload order; X-Total-Count says how many exist
+  const loadDocuments = async (offset = 0) => {
     try {
       const response = await axios.get(`${API_BASE}/list_docs`, {
+        params: { limit: PAGE_SIZE, offset },
         headers: {
           Authorization: `Bearer ${user.token}`
         }
       })
-      setDocuments(response.data)
+      setDocuments(previous => offset ? [...previous, ...response.data] : response.data)
+      setTotal(Number(response.headers['x-total-count'] ?? offset + response.data.length))
     } catch (err) {
       console.error('Failed to load documents:', err)
     } finally {
@@ -33,6 +39,12 @@ export default function Documents({ user }) {
     }
   }
 
+  const loadMore = async () => {
+    setLoadingMore(true)
+    await loadDocuments(documents.length)
+    setLoadingMore(false)
+  }
+
   const handleDelete = async (docId) => {
     if (!confirm('Are you sure you want to delete this document?')) return
 
@@ -44,6 +56,7 @@ export default function Documents({ user }) {
         }
       })
       setDocuments(documents.filter(doc => doc.doc_id !== docId))
+      setTotal(count => count - 1)
     } catch (err) {
       alert('Failed to delete document')
     } finally {
@@ -53,16 +66,24 @@ export default function Documents({ user }) {
 
   const handleSummarize = async (docId) => {
     try {
-      const response = await axios.post(
-        `${API_BASE}/summarize`,
-        { doc_id: docId },
-        {
-          headers: {
-            Authorization: `Bearer ${user.token}`
+      // Summaries are generated after upload; poll while one is pending
+      for (let attempt = 0; attempt < 60; attempt++) {
+        const response = await axios.post(
+          `${API_BASE}/summarize`,
+          { doc_id: docId },
+          {
+            headers: {
+              Authorization: `Bearer ${user.token}`
+            }
           }
+        )
+        if (response.data.status === 'ready') {
+          alert(`Summary:\n\n${response.data.summary}`)
+          return
         }
-      )
-      alert(`Summary:\n\n${response.data.summary}`)
+        await new Promise(resolve => setTimeout(resolve, 2000))
+      }
+      alert('Summary is still being generated. Please try again shortly.')
     } catch (err) {
       alert('Failed to generate summary')
     }
@@ -88,7 +109,7 @@ export default function Documents({ user }) {
         >
           <div>
             <h1 className="text-4xl font-bold mb-2">Documents</h1>
-            <p className="text-white/60">{documents.length} document(s) uploaded</p>
+            <p className="text-white/60">{total} document(s) uploaded</p>
           </div>
           <motion.button
             whileHover={{ scale: 1.05 }}
@@ -137,6 +158,21 @@ export default function Documents({ user }) {
             ))}
           </div>
         )}
+
+        {documents.length < total && (
+          <div className="mt-8 flex justify-center">
+            <motion.button
+              whileHover={{ scale: 1.05 }}
+              whileTap={{ scale: 0.95 }}
+              onClick={loadMore}
+              disabled={loadingMore}
+              className="px-6 py-3 glass rounded-xl hover:bg-white/10 transition flex items-center gap-2 disabled:opacity-50"
+            >
+              {loadingMore && <Loader2 className="animate-spin" size={18} />}
+              Load more ({total - documents.length} remaining)
+            </motion.button>
+          </div>
+        )}
       </div>
     </div>
   )
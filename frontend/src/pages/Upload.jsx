@@ -26,6 +26,18 @@ export default function Upload({ user }) {
     }
   }
 
+  const waitForJob = async (jobId) => {
+    while (true) {
+      const response = await axios.get(`${API_BASE}/jobs/${jobId}`, {
+        headers: { Authorization: `Bearer ${user.token}` }
+      })
+      if (response.data.status === 'completed' || response.data.status === 'failed') {
+        return response.data
+      }
+      await new Promise(resolve => setTimeout(resolve, 1000))
+    }
+  }
+
   const handleUpload = async () => {
     if (!file) {
       setStatus({ type: 'error', message: 'Please select a file' })
@@ -50,10 +62,21 @@ export default function Upload({ user }) {
         }
       )
 
-      setStatus({
-        type: 'success',
-        message: `Document uploaded successfully! ${response.data.chunk_count} chunks created.`
-      })
+      if (response.data.duplicate) {
+        setStatus({ type: 'success', message: `${response.data.message}.` })
+      } else {
+        // Processing runs in the background; poll the job until it finishes
+        const job = await waitForJob(response.data.job_id)
+        if (job.status === 'failed') {
+          setStatus({ type: 'error', message: job.error || 'Processing failed' })
+          return
+        }
+
+        setStatus({
+          type: 'success',
+          message: `Document uploaded successfully! ${job.result.chunk_count} chunks created.`
+        })
+      }
       
       setFile(null)
       